@@ -0,0 +1,53 @@
+﻿"""
+条件请求 (ETag / If-None-Match)
+基于数据集版本签发 ETag，命中时直接返回 304，不执行查询
+"""
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response, status
+
+from app.services.versions import dataset_versions
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀，支持逗号分隔的多个值和 *"""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    args: Dict[str, Any],
+    cities: Optional[Iterable[str]] = None,
+) -> Optional[Response]:
+    """
+    为当前请求签发 ETag，并处理 If-None-Match
+    
+    Args:
+        request: 当前请求 (路径作为 ETag 的一部分)
+        response: 路由的响应对象，用于写入 ETag 头
+        args: 规范化后的请求参数
+        cities: 结果只依赖的城市 (取按城市版本)；为空时取全局版本
+    
+    Returns:
+        客户端缓存仍然有效时返回 304 响应，否则返回 None，由路由继续正常处理
+    """
+    etag = dataset_versions.etag(f"{request.method} {request.url.path}", args, cities)
+    if etag is None:
+        return None
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return None
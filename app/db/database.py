@@ -2,6 +2,8 @@
 数据库连接配置
 使用 SQLAlchemy 2.0+ 异步引擎
 """
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
@@ -47,6 +49,45 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def _ensure_columns(sync_conn):
+    """
+    补建缺失的列
+    create_all 不会修改已存在的表，模型中新增的可空列 (如 weather_monthly_rollup.sketch) 在此补上
+    """
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _ensure_indexes(sync_conn):
+    """
+    补建缺失的索引
+    create_all 只会为新建的表创建索引，已存在的表需逐个检查补建 (如 idx_city_key_date)
+    
+    唯一索引 (如 uq_city_date) 在表中已有重复数据时无法创建：在保存点内尝试，失败时跳过并提示先执行去重迁移，
+    不阻止应用启动
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if not index.unique:
+                index.create(sync_conn, checkfirst=True)
+                continue
+            try:
+                with sync_conn.begin_nested():
+                    index.create(sync_conn, checkfirst=True)
+            except IntegrityError:
+                print(
+                    f"⚠️  {table.name} 存在重复数据，未能创建唯一索引 {index.name}，"
+                    f"请先运行 python scripts/dedupe_weather_data.py"
+                )
+
+
 async def init_db():
     """
     初始化数据库表
@@ -54,3 +95,5 @@ async def init_db():
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_ensure_columns)
+        await conn.run_sync(_ensure_indexes)
@@ -6,8 +6,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.db.database import init_db
+from app.db.database import AsyncSessionLocal, init_db
+from app.services.climatology import ensure_climatology
+from app.services.conditions import ensure_condition_flags
+from app.services.rollup import ensure_rollup
+from app.services.summary import ensure_summary
+from app.services.changes import change_listener
+from app.services.versions import dataset_versions
+from app.services.wind import ensure_wind_columns
+from app.services.weather_cache import weather_cache
 from app.routers import auth, admin, weather, agent, mcp, mcp_data_agent, mcp_analysis_agent
+from mcp_tools.analysis_agent import start_forecast_pool, stop_forecast_pool
 
 
 @asynccontextmanager
@@ -21,10 +30,42 @@ async def lifespan(app: FastAPI):
     await init_db()
     print("✅ 数据库初始化完成")
     
+    # 汇总表 / 月度预聚合表 / 常年值表为空时 (首次部署) 从现有数据全量构建一次；
+    # 新增 condition_flags / 风向风力列之前导入的记录在此回填
+    async with AsyncSessionLocal() as db:
+        if await ensure_summary(db):
+            await db.commit()
+            print("✅ 数据集汇总表已重建")
+        if await ensure_rollup(db):
+            await db.commit()
+            print("✅ 月度预聚合表已重建")
+        if await ensure_climatology(db):
+            await db.commit()
+            print("✅ 逐日常年值表已重建")
+        if await ensure_condition_flags(db):
+            print("✅ 天气状况分类已回填")
+        if await ensure_wind_columns(db):
+            print("✅ 风向风力列已回填")
+    
+    # 数据集版本：用于 ETag 条件请求，随变更通知刷新
+    await dataset_versions.start()
+    
+    if settings.WEATHER_CACHE_ENABLED:
+        print("📦 正在加载天气数据列式缓存...")
+        await weather_cache.start()
+        print("✅ 列式缓存加载完成")
+    
+    # 批量预测进程池：整个生命周期复用，工作进程不必每次重新启动
+    start_forecast_pool()
+    
     yield
     
     # 关闭时执行
     print("👋 应用正在关闭...")
+    await weather_cache.stop()
+    await dataset_versions.stop()
+    await change_listener.stop()
+    stop_forecast_pool()
 
 
 # 创建 FastAPI 应用实例
@@ -49,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[weather.NEXT_CURSOR_HEADER, "ETag"],  # 允许前端读取分页游标和 ETag
 )
 
 
@@ -2,7 +2,8 @@
 数据库 ORM 模型
 定义用户、API Key、系统配置表、天气数据表
 """
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Float, Date, Index
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Boolean, ForeignKey, DateTime, Text, Float, Date, Index, JSON, and_
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -109,6 +110,9 @@ class WeatherData(Base):
     # 天气状况描述 (如 "晴 / 多云")
     weather_condition = Column(String(100), nullable=False)
     
+    # 天气状况类别位掩码 (rain/snow/sunny/cloudy/storm/fog，见 app/services/conditions.py)，写入时解析
+    condition_flags = Column(SmallInteger, nullable=True)
+    
     # 最低温度 (摄氏度)
     temp_min = Column(Float, nullable=False)
     
@@ -121,13 +125,181 @@ class WeatherData(Base):
     # 风力风向描述
     wind_info = Column(String(200), nullable=False)
     
+    # 由 wind_info 解析的白天/夜间风向编码 (0 无持续风向，1..8 北风起顺时针) 与风力等级 (范围取上限)，
+    # 见 app/services/wind.py，写入时解析
+    wind_dir_day = Column(SmallInteger, nullable=True)
+    wind_force_day = Column(SmallInteger, nullable=True)
+    wind_dir_night = Column(SmallInteger, nullable=True)
+    wind_force_night = Column(SmallInteger, nullable=True)
+    
     # 数据导入时间
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    # 复合索引：city + date (用于快速查询特定城市的历史数据)
+    # 唯一索引：city + date (每个城市每天只有一条记录，CSV 增量导入按它 upsert；也用于按城市精确查询)
+    # 表达式索引：lower(city) + date + id，与 city_key 查询条件一致，保证按城市查询走索引；
+    # 末尾的 id 使 (date, id) 游标翻页可以直接按索引顺序扫描
+    # 部分索引：只包含解析列仍为空的行 (回填完成后为空或很小)，启动时的回填检查走索引而非全表扫描
     __table_args__ = (
-        Index('idx_city_date', 'city', 'date'),
+        Index('uq_city_date', 'city', 'date', unique=True),
+        Index('idx_city_key_date', func.lower(city), date, id),
+        Index('idx_condition_flags_pending', id, postgresql_where=condition_flags.is_(None)),
+        Index(
+            'idx_wind_pending',
+            id,
+            postgresql_where=and_(
+                wind_dir_day.is_(None),
+                wind_force_day.is_(None),
+                wind_dir_night.is_(None),
+                wind_force_night.is_(None),
+            ),
+        ),
     )
     
+    @staticmethod
+    def normalize_city_key(city: str) -> str:
+        """将查询参数规范化为城市键 (去首尾空格 + 小写)，在 Python 侧完成而非 SQL 侧"""
+        return (city or "").strip().lower()
+    
+    @hybrid_property
+    def city_key(self) -> str:
+        """城市键：实例上为小写城市名，查询中展开为 lower(city) 以命中 idx_city_key_date"""
+        return (self.city or "").lower()
+    
+    @city_key.expression
+    def city_key(cls):
+        return func.lower(cls.city)
+    
     def __repr__(self):
         return f"<WeatherData(city={self.city}, date={self.date}, temp={self.temp_min}~{self.temp_max}℃)>"
+
+
+class WeatherCitySummary(Base):
+    """天气数据汇总表 - 按城市维护记录数和日期范围，随写入同事务更新"""
+    __tablename__ = "weather_city_summary"
+    
+    # 城市名称 (与 weather_data.city 一致)
+    city = Column(String(50), primary_key=True)
+    
+    # 该城市的记录数
+    row_count = Column(Integer, nullable=False, default=0)
+    
+    # 该城市数据的日期范围
+    min_date = Column(Date, nullable=True)
+    max_date = Column(Date, nullable=True)
+    
+    # 最近更新时间
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<WeatherCitySummary(city={self.city}, rows={self.row_count}, range={self.min_date}~{self.max_date})>"
+
+
+class WeatherMonthlyRollup(Base):
+    """天气数据月度预聚合表 - 按 (城市, 年, 月, 指标) 保存可合并的聚合量，随写入同事务重算"""
+    __tablename__ = "weather_monthly_rollup"
+    
+    # 城市名称 (与 weather_data.city 一致)
+    city = Column(String(50), primary_key=True)
+    
+    # 年、月
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    
+    # 指标名称 (temp_min / temp_max)
+    metric = Column(String(20), primary_key=True)
+    
+    # 可合并的聚合量：条数、和、平方和、最小值、最大值
+    # 多个月份合并后可精确得到 count / min / max / mean / stddev
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0)
+    sum_sq = Column(Float, nullable=False, default=0)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+    
+    # 分位数草图：按 0.1℃ 分桶的稀疏直方图 {"b": [桶], "c": [条数]}，可直接相加合并 (见 app/services/quantiles.py)
+    sketch = Column(JSON, nullable=True)
+    
+    # 表达式索引：与 weather_data 的 city_key 查询方式一致
+    __table_args__ = (
+        Index('idx_rollup_city_key', func.lower(city), metric, year, month),
+    )
+    
+    def __repr__(self):
+        return f"<WeatherMonthlyRollup(city={self.city}, {self.year}-{self.month:02d}, {self.metric}, n={self.count})>"
+
+
+class WeatherClimatology(Base):
+    """逐日气候平均值表 - 按 (城市, 指标, 日序) 保存全部历史的聚合量及平滑后的常年均值、标准差，随写入同事务重算"""
+    __tablename__ = "weather_climatology"
+    
+    # 城市名称 (与 weather_data.city 一致)
+    city = Column(String(50), primary_key=True)
+    
+    # 指标名称 (temp_min / temp_max)
+    metric = Column(String(20), primary_key=True)
+    
+    # 日序 1..366：按闰年日历编号，2 月 29 日固定为 60，平年 3 月 1 日起与闰年同号
+    day = Column(Integer, primary_key=True)
+    
+    # 该日序在全部历史中的可合并聚合量
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0)
+    sum_sq = Column(Float, nullable=False, default=0)
+    
+    # 平滑后的常年均值与标准差 (前后若干天跨年循环合并)
+    mean = Column(Float, nullable=True)
+    std = Column(Float, nullable=True)
+    
+    def __repr__(self):
+        return f"<WeatherClimatology(city={self.city}, {self.metric}, day={self.day}, mean={self.mean})>"
+
+
+class WeatherForecast(Base):
+    """天气预测结果表 - 批量预测任务按 (城市, 指标, 运行日期) 写入，每个预测日一行"""
+    __tablename__ = "weather_forecasts"
+    
+    # 城市名称 (与 weather_data.city 一致)
+    city = Column(String(50), primary_key=True)
+    
+    # 指标名称 (temp_min / temp_max)
+    metric = Column(String(20), primary_key=True)
+    
+    # 预测任务运行日期
+    run_date = Column(Date, primary_key=True)
+    
+    # 预测目标日期及预测值
+    target_date = Column(Date, primary_key=True)
+    value = Column(Float, nullable=False)
+    
+    # 预测方法 (seasonal_trend_harmonics / simple_linear_trend)
+    method = Column(String(40), nullable=False)
+    
+    # 拟合所用数据的最后日期
+    last_observed = Column(Date, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # 表达式索引：与 weather_data 的 city_key 查询方式一致，按运行日期取最新一批
+    __table_args__ = (
+        Index('idx_forecast_city_key', func.lower(city), metric, run_date),
+    )
+    
+    def __repr__(self):
+        return f"<WeatherForecast(city={self.city}, {self.metric}, run={self.run_date}, {self.target_date}={self.value})>"
+
+
+class DatasetVersion(Base):
+    """数据集版本表 - 全局及按城市单调递增的版本号，每次写入天气数据时同事务递增"""
+    __tablename__ = "dataset_versions"
+    
+    # 版本范围："*" 表示全局，否则为城市名称
+    scope = Column(String(50), primary_key=True)
+    
+    # 版本号 (只增不减)
+    version = Column(BigInteger, nullable=False, default=0)
+    
+    # 最近更新时间
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<DatasetVersion(scope={self.scope}, version={self.version})>"
@@ -4,6 +4,8 @@ Provides a structured list of available Data/Analysis Agent tools.
 """
 from fastapi import APIRouter
 
+from mcp_tools.coalesce import coalesce_stats
+
 router = APIRouter(prefix="/mcp", tags=["MCP"])
 
 TOOLS = {
@@ -56,10 +58,10 @@ TOOLS = {
     "analysis": [
         {
             "name": "analysis.describe_timeseries",
-            "description": "时间序列基础统计（均值/极值/标准差）",
+            "description": "时间序列基础统计（均值/极值/标准差）；metric=all 时一次返回 temp_min/temp_max/日较差及 p5/p25/median/p75/p95",
             "params": {
                 "city": "string",
-                "metric": "temp_min|temp_max",
+                "metric": "temp_min|temp_max|all",
                 "start_date": "YYYY-MM-DD",
                 "end_date": "YYYY-MM-DD"
             }
@@ -77,24 +79,26 @@ TOOLS = {
         },
         {
             "name": "analysis.compare_cities",
-            "description": "多城市同一指标对比",
+            "description": "多城市同一指标对比；可按月/季/年返回城市 × 时间段矩阵",
             "params": {
                 "cities": "string array",
                 "metric": "temp_min|temp_max",
                 "start_date": "YYYY-MM-DD",
-                "end_date": "YYYY-MM-DD"
+                "end_date": "YYYY-MM-DD",
+                "period": "month|season|year，可选"
             }
         },
         {
             "name": "analysis.extreme_event_stats",
-            "description": "极端事件统计（如高温天数）",
+            "description": "极端事件统计（如高温天数），含最长连续天数及热浪/寒潮过程起止日期",
             "params": {
                 "city": "string",
                 "metric": "temp_max|temp_min",
                 "threshold": "float",
                 "comparison": ">|<|>=|<=",
                 "start_date": "YYYY-MM-DD",
-                "end_date": "YYYY-MM-DD"
+                "end_date": "YYYY-MM-DD",
+                "min_streak_days": "int，可选，默认3 (计为一次过程的最少连续天数)"
             }
         },
         {
@@ -105,13 +109,106 @@ TOOLS = {
                 "chart_type": "line|bar|stack"
             }
         },
+        {
+            "name": "analysis.condition_stats",
+            "description": "天气状况统计：按年/季/月统计雨、雪、晴、多云/阴、雷暴、雾霾天数（基于写入时解析的类别位掩码）",
+            "params": {
+                "city": "string",
+                "start_date": "YYYY-MM-DD",
+                "end_date": "YYYY-MM-DD",
+                "period": "year|season|month，可选，默认year"
+            }
+        },
+        {
+            "name": "analysis.wind_stats",
+            "description": "风力统计：按年/季/月统计风力≥min_force 的天数、最大/平均风力，及白天风向分布（基于写入时解析的风向风力列）",
+            "params": {
+                "city": "string",
+                "start_date": "YYYY-MM-DD",
+                "end_date": "YYYY-MM-DD",
+                "period": "year|season|month，可选，默认month",
+                "min_force": "int，0-17，可选，默认5"
+            }
+        },
+        {
+            "name": "analysis.rolling_stats",
+            "description": "滑动窗口统计：逐日的移动平均、滚动最小/最大值（默认 7/30/365 天窗口）",
+            "params": {
+                "city": "string",
+                "metric": "temp_max|temp_min",
+                "start_date": "YYYY-MM-DD",
+                "end_date": "YYYY-MM-DD",
+                "windows": "list[int]，可选，默认[7,30,365]"
+            }
+        },
+        {
+            "name": "analysis.correlation_matrix",
+            "description": "多城市相关系数矩阵：按共同日期对齐逐日序列，可选去季节（距平）",
+            "params": {
+                "cities": "list[string]",
+                "metric": "temp_max|temp_min",
+                "start_date": "YYYY-MM-DD",
+                "end_date": "YYYY-MM-DD",
+                "method": "pearson|spearman，可选，默认pearson",
+                "deseasonalize": "bool，可选"
+            }
+        },
+        {
+            "name": "analysis.cluster_cities",
+            "description": "城市气候聚类：按月均最低/最高温、温度波动和日较差对城市做 k-means 或层次聚类，结果按数据集版本缓存",
+            "params": {
+                "k": "int，2-10，可选，默认3",
+                "method": "kmeans|hierarchical，可选，默认kmeans",
+                "cities": "list[string]，可选，默认全部城市"
+            }
+        },
+        {
+            "name": "analysis.percentiles",
+            "description": "分位数：合并月度分位数草图计算任意区间的分位数，可按月份筛选（如历年夏季）",
+            "params": {
+                "city": "string",
+                "metric": "temp_max|temp_min",
+                "start_date": "YYYY-MM-DD",
+                "end_date": "YYYY-MM-DD",
+                "percentiles": "list[float]，0-100，可选，默认[5,25,50,75,95]",
+                "months": "list[int]，1-12，可选"
+            }
+        },
+        {
+            "name": "analysis.anomalies",
+            "description": "距平：逐日相对常年值（按日序预先计算、平滑）的偏差与标准化距平",
+            "params": {
+                "city": "string",
+                "metric": "temp_max|temp_min",
+                "start_date": "YYYY-MM-DD",
+                "end_date": "YYYY-MM-DD"
+            }
+        },
         {
             "name": "analysis.simple_forecast",
-            "description": "简单预测占位（后续实现）",
+            "description": "温度预测：季节模型（趋势 + 年周期谐波 + 残差自回归），按城市缓存拟合参数",
             "params": {
                 "city": "string",
                 "metric": "temp_max|temp_min",
-                "horizon_days": "int"
+                "horizon_days": "int",
+                "method": "seasonal|linear，可选，默认seasonal"
+            }
+        },
+        {
+            "name": "analysis.forecast_all",
+            "description": "批量预测所有城市与指标（进程池并行拟合），结果写入预测表",
+            "params": {
+                "metrics": "list[temp_max|temp_min]，可选，默认全部",
+                "horizon_days": "int",
+                "workers": "int，可选，并行进程数 (1..CPU 核数)"
+            }
+        },
+        {
+            "name": "analysis.get_forecast",
+            "description": "读取最新一批预先计算的预测（由 analysis.forecast_all 生成）",
+            "params": {
+                "city": "string",
+                "metric": "temp_max|temp_min"
             }
         }
     ]
@@ -121,3 +218,9 @@ TOOLS = {
 @router.get("/tools")
 async def list_tools():
     return {"tools": TOOLS}
+
+
+@router.get("/coalescing")
+async def list_coalescing_stats():
+    """Per-tool single-flight counters: calls, executions, and coalesced calls."""
+    return {"tools": coalesce_stats()}
@@ -6,23 +6,48 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter
-from fastapi import HTTPException
-from pydantic import BaseModel
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel, Field
 
+from app.core.conditional import conditional_response
+from mcp_tools.data_agent import _normalize_city_name
 from mcp_tools.analysis_agent import (
+    FORECAST_MAX_WORKERS,
+    tool_anomalies,
+    tool_cluster_cities,
     tool_compare_cities,
+    tool_condition_stats,
+    tool_correlation_matrix,
     tool_describe_timeseries,
     tool_extreme_event_stats,
+    tool_forecast_all,
+    tool_get_forecast,
     tool_group_by_period,
+    tool_percentiles,
+    tool_rolling_stats,
     tool_simple_forecast,
+    tool_wind_stats,
 )
 
 router = APIRouter(prefix="/mcp/analysis", tags=["mcp-analysis-agent"])
 
 VALID_METRIC = {"temp_min", "temp_max"}
+VALID_CLUSTER_METHOD = {"kmeans", "hierarchical"}
 VALID_COMPARISON = {">", "<", ">=", "<=", "gt", "lt", "gte", "lte", "ge", "le", "greater", "less", "greater_equal", "less_equal"}
 
 
+def _not_modified(request: Request, response: Response, body: BaseModel) -> Optional[Response]:
+    """ETag from the dataset versions of the requested cities plus the normalized body."""
+    args = body.model_dump()
+    if "city" in args:
+        args["city"] = _normalize_city_name(args["city"])
+        cities = [args["city"]]
+    else:
+        args["cities"] = [_normalize_city_name(c) for c in args["cities"]]
+        cities = args["cities"]
+    return conditional_response(request, response, args, cities)
+
+
 class DescribeRequest(BaseModel):
     city: str
     metric: str
@@ -30,6 +55,19 @@ class DescribeRequest(BaseModel):
     end_date: str
 
 
+class MetricStats(BaseModel):
+    count: int
+    min: float | None = None
+    max: float | None = None
+    mean: float | None = None
+    stddev: float | None = None
+    p5: float | None = None
+    p25: float | None = None
+    median: float | None = None
+    p75: float | None = None
+    p95: float | None = None
+
+
 class DescribeResult(BaseModel):
     ok: bool
     city: str
@@ -41,6 +79,8 @@ class DescribeResult(BaseModel):
     max: float | None = None
     mean: float | None = None
     stddev: float | None = None
+    # metric="all": temp_min / temp_max / temp_range with percentiles
+    metrics: Dict[str, MetricStats] | None = None
     error: Optional[str] = None
 
 
@@ -76,6 +116,7 @@ class CompareRequest(BaseModel):
     metric: str
     start_date: str
     end_date: str
+    period: Optional[str] = None
 
 
 class CompareItem(BaseModel):
@@ -86,12 +127,24 @@ class CompareItem(BaseModel):
     mean: float | None = None
 
 
+class CompareMatrixRow(BaseModel):
+    city: str
+    count: List[int]
+    min: List[float | None]
+    max: List[float | None]
+    mean: List[float | None]
+
+
 class CompareResult(BaseModel):
     ok: bool
     metric: str
     start_date: str
     end_date: str
     results: List[CompareItem] = []
+    # period set: one row per city, one column per period (null where no data)
+    period: Optional[str] = None
+    periods: List[str] = []
+    matrix: List[CompareMatrixRow] = []
     error: Optional[str] = None
 
 
@@ -102,6 +155,13 @@ class ExtremeRequest(BaseModel):
     comparison: str
     start_date: str
     end_date: str
+    min_streak_days: int = Field(default=3, ge=1)
+
+
+class Spell(BaseModel):
+    start: str
+    end: str
+    days: int
 
 
 class ExtremeResult(BaseModel):
@@ -113,6 +173,209 @@ class ExtremeResult(BaseModel):
     start_date: str
     end_date: str
     event_days: int | None = None
+    longest_streak: int | None = None
+    min_streak_days: int | None = None
+    spell_count: int | None = None
+    spells: List[Spell] = []
+    error: Optional[str] = None
+
+
+class ConditionStatsRequest(BaseModel):
+    city: str
+    start_date: str
+    end_date: str
+    period: str = "year"
+
+
+class ConditionCounts(BaseModel):
+    days: int = 0
+    rain: int = 0
+    snow: int = 0
+    sunny: int = 0
+    cloudy: int = 0
+    storm: int = 0
+    fog: int = 0
+
+
+class ConditionPeriod(ConditionCounts):
+    period: str
+
+
+class ConditionStatsResult(BaseModel):
+    ok: bool
+    city: str | None = None
+    period: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    categories: List[str] = []
+    totals: ConditionCounts | None = None
+    series: List[ConditionPeriod] = []
+    error: Optional[str] = None
+
+
+class WindStatsRequest(BaseModel):
+    city: str
+    start_date: str
+    end_date: str
+    period: str = "month"
+    min_force: int = Field(default=5, ge=0, le=17)
+
+
+class WindPeriod(BaseModel):
+    period: str
+    days: int = 0
+    windy_days: int = 0
+    max_force: int | None = None
+    mean_force: float | None = None
+
+
+class WindTotals(BaseModel):
+    days: int = 0
+    windy_days: int = 0
+    max_force: int | None = None
+    mean_force: float | None = None
+    # daytime direction -> days: calm / N / NE / E / SE / S / SW / W / NW
+    directions: Dict[str, int] = {}
+
+
+class WindStatsResult(BaseModel):
+    ok: bool
+    city: str | None = None
+    period: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    min_force: int | None = None
+    totals: WindTotals | None = None
+    series: List[WindPeriod] = []
+    error: Optional[str] = None
+
+
+class RollingRequest(BaseModel):
+    city: str
+    metric: str
+    start_date: str
+    end_date: str
+    windows: Optional[List[int]] = None
+
+
+class RollingResult(BaseModel):
+    ok: bool
+    city: str | None = None
+    metric: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    windows: List[int] = []
+    count: int = 0
+    # date, the metric value, and mean_<w> / min_<w> / max_<w> per window
+    items: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+
+
+class CorrelationRequest(BaseModel):
+    cities: List[str]
+    metric: str
+    start_date: str
+    end_date: str
+    method: str = "pearson"
+    deseasonalize: bool = False
+
+
+class CorrelationResult(BaseModel):
+    ok: bool
+    cities: List[str] = []
+    metric: str | None = None
+    method: str | None = None
+    deseasonalized: bool | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    aligned_days: int = 0
+    matrix: List[List[float | None]] = []
+    error: Optional[str] = None
+
+
+class ClusterRequest(BaseModel):
+    k: int = Field(default=3, ge=2)
+    method: str = "kmeans"
+    cities: Optional[List[str]] = None
+
+
+class ClusterProfile(BaseModel):
+    temp_min_normals: List[float] = []
+    temp_max_normals: List[float] = []
+    temp_min_std: float | None = None
+    temp_max_std: float | None = None
+    diurnal_range: float | None = None
+
+
+class Cluster(BaseModel):
+    cluster: int
+    size: int
+    cities: List[str]
+    profile: ClusterProfile
+
+
+class ClusterResult(BaseModel):
+    ok: bool
+    method: str | None = None
+    k: int | None = None
+    dataset_version: int | None = None
+    cached: bool | None = None
+    # ordered from the coldest to the warmest mean temp_max
+    clusters: List[Cluster] = []
+    assignments: Dict[str, int] = {}
+    inertia: float | None = None
+    skipped: List[str] = []
+    error: Optional[str] = None
+
+
+class PercentileRequest(BaseModel):
+    city: str
+    metric: str
+    start_date: str
+    end_date: str
+    percentiles: Optional[List[float]] = None
+    months: Optional[List[int]] = None
+
+
+class PercentileResult(BaseModel):
+    ok: bool
+    city: str | None = None
+    metric: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    months: Optional[List[int]] = None
+    count: int = 0
+    percentiles: Dict[str, float | None] = {}
+    error_bound: float | None = None
+    error: Optional[str] = None
+
+
+class AnomalyRequest(BaseModel):
+    city: str
+    metric: str
+    start_date: str
+    end_date: str
+
+
+class AnomalyPoint(BaseModel):
+    date: str
+    temp_min: float | None = None
+    temp_max: float | None = None
+    normal: float | None = None
+    std: float | None = None
+    anomaly: float | None = None
+    zscore: float | None = None
+
+
+class AnomalyResult(BaseModel):
+    ok: bool
+    city: str | None = None
+    metric: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    count: int = 0
+    mean_anomaly: float | None = None
+    items: List[AnomalyPoint] = []
     error: Optional[str] = None
 
 
@@ -120,6 +383,7 @@ class ForecastRequest(BaseModel):
     city: str
     metric: str
     horizon_days: int = 7
+    method: str = "seasonal"
 
 
 class ForecastPoint(BaseModel):
@@ -134,42 +398,174 @@ class ForecastResult(BaseModel):
     metric: str
     horizon_days: int
     method: str | None = None
+    fit: str | None = None
     forecast: List[ForecastPoint] = []
     error: Optional[str] = None
 
 
+class ForecastAllRequest(BaseModel):
+    metrics: Optional[List[str]] = None
+    horizon_days: int = 7
+    workers: Optional[int] = Field(default=None, ge=1, le=FORECAST_MAX_WORKERS)
+
+
+class ForecastAllResult(BaseModel):
+    ok: bool
+    run_date: str | None = None
+    horizon_days: int | None = None
+    metrics: List[str] = []
+    cities: int = 0
+    forecasts: int = 0
+    fit: Dict[str, int] = {}
+    error: Optional[str] = None
+
+
+class GetForecastRequest(BaseModel):
+    city: str
+    metric: str
+
+
+class StoredForecastResult(ForecastResult):
+    horizon_days: int = 0
+    run_date: str | None = None
+    last_observed: str | None = None
+
+
 @router.post("/describe_timeseries", response_model=DescribeResult)
-async def analysis_describe_timeseries(body: DescribeRequest):
-    if body.metric not in VALID_METRIC:
-        raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+async def analysis_describe_timeseries(body: DescribeRequest, request: Request, response: Response):
+    if body.metric not in VALID_METRIC and body.metric != "all":
+        raise HTTPException(status_code=400, detail="metric must be temp_min, temp_max or all")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
     return await tool_describe_timeseries(body.city, body.metric, body.start_date, body.end_date)
 
 
 @router.post("/group_by_period", response_model=GroupByResult)
-async def analysis_group_by_period(body: GroupByRequest):
+async def analysis_group_by_period(body: GroupByRequest, request: Request, response: Response):
     if body.metric not in VALID_METRIC:
         raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
     return await tool_group_by_period(body.city, body.metric, body.period, body.start_date, body.end_date)
 
 
 @router.post("/compare_cities", response_model=CompareResult)
-async def analysis_compare_cities(body: CompareRequest):
+async def analysis_compare_cities(body: CompareRequest, request: Request, response: Response):
     if body.metric not in VALID_METRIC:
         raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
-    return await tool_compare_cities(body.cities, body.metric, body.start_date, body.end_date)
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_compare_cities(body.cities, body.metric, body.start_date, body.end_date, body.period)
 
 
 @router.post("/extreme_event_stats", response_model=ExtremeResult)
-async def analysis_extreme_event_stats(body: ExtremeRequest):
+async def analysis_extreme_event_stats(body: ExtremeRequest, request: Request, response: Response):
     if body.metric not in VALID_METRIC:
         raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
     if body.comparison not in VALID_COMPARISON:
         raise HTTPException(status_code=400, detail="comparison must be one of >,<,>=,<=,gt,lt,gte,lte,greater,less,greater_equal,less_equal")
-    return await tool_extreme_event_stats(body.city, body.metric, body.threshold, body.comparison, body.start_date, body.end_date)
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_extreme_event_stats(
+        body.city, body.metric, body.threshold, body.comparison, body.start_date, body.end_date, body.min_streak_days
+    )
+
+
+@router.post("/condition_stats", response_model=ConditionStatsResult)
+async def analysis_condition_stats(body: ConditionStatsRequest, request: Request, response: Response):
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_condition_stats(body.city, body.start_date, body.end_date, body.period)
+
+
+@router.post("/wind_stats", response_model=WindStatsResult)
+async def analysis_wind_stats(body: WindStatsRequest, request: Request, response: Response):
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_wind_stats(body.city, body.start_date, body.end_date, body.period, body.min_force)
+
+
+@router.post("/rolling_stats", response_model=RollingResult)
+async def analysis_rolling_stats(body: RollingRequest, request: Request, response: Response):
+    if body.metric not in VALID_METRIC:
+        raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_rolling_stats(body.city, body.metric, body.start_date, body.end_date, body.windows)
+
+
+@router.post("/correlation_matrix", response_model=CorrelationResult)
+async def analysis_correlation_matrix(body: CorrelationRequest, request: Request, response: Response):
+    if body.metric not in VALID_METRIC:
+        raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_correlation_matrix(
+        body.cities, body.metric, body.start_date, body.end_date, body.method, body.deseasonalize
+    )
+
+
+@router.post("/cluster_cities", response_model=ClusterResult)
+async def analysis_cluster_cities(body: ClusterRequest, request: Request, response: Response):
+    if body.method not in VALID_CLUSTER_METHOD:
+        raise HTTPException(status_code=400, detail="method must be kmeans or hierarchical")
+    # features span every city, so the ETag follows the global dataset version
+    args = body.model_dump()
+    if body.cities:
+        args["cities"] = [_normalize_city_name(c) for c in body.cities]
+    cached = conditional_response(request, response, args)
+    if cached is not None:
+        return cached
+    return await tool_cluster_cities(body.k, body.method, body.cities)
+
+
+@router.post("/percentiles", response_model=PercentileResult)
+async def analysis_percentiles(body: PercentileRequest, request: Request, response: Response):
+    if body.metric not in VALID_METRIC:
+        raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_percentiles(body.city, body.metric, body.start_date, body.end_date, body.percentiles, body.months)
+
+
+@router.post("/anomalies", response_model=AnomalyResult)
+async def analysis_anomalies(body: AnomalyRequest, request: Request, response: Response):
+    if body.metric not in VALID_METRIC:
+        raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_anomalies(body.city, body.metric, body.start_date, body.end_date)
 
 
 @router.post("/simple_forecast", response_model=ForecastResult)
-async def analysis_simple_forecast(body: ForecastRequest):
+async def analysis_simple_forecast(body: ForecastRequest, request: Request, response: Response):
+    if body.metric not in VALID_METRIC:
+        raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
+    return await tool_simple_forecast(body.city, body.metric, body.horizon_days, body.method)
+
+
+@router.post("/forecast_all", response_model=ForecastAllResult)
+async def analysis_forecast_all(body: ForecastAllRequest):
+    if body.metrics and any(m not in VALID_METRIC for m in body.metrics):
+        raise HTTPException(status_code=400, detail="metrics must be temp_min and/or temp_max")
+    return await tool_forecast_all(body.metrics, body.horizon_days, body.workers)
+
+
+@router.post("/get_forecast", response_model=StoredForecastResult)
+async def analysis_get_forecast(body: GetForecastRequest):
     if body.metric not in VALID_METRIC:
         raise HTTPException(status_code=400, detail="metric must be temp_min or temp_max")
-    return await tool_simple_forecast(body.city, body.metric, body.horizon_days)
+    return await tool_get_forecast(body.city, body.metric)
@@ -6,10 +6,12 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from pydantic import BaseModel
 
+from app.core.conditional import conditional_response
 from mcp_tools.data_agent import (
+    _normalize_city_name,
     tool_check_coverage,
     tool_custom_query,
     tool_get_dataset_overview,
@@ -20,6 +22,19 @@ from mcp_tools.data_agent import (
 router = APIRouter(prefix="/mcp", tags=["mcp-data-agent"])
 
 
+# ---------- Conditional requests ----------
+
+
+def _not_modified(request: Request, response: Response, body: BaseModel) -> Optional[Response]:
+    """ETag from the dataset version (per city when filtered) plus the normalized body."""
+    args = body.model_dump()
+    cities = None
+    if args.get("city"):
+        args["city"] = _normalize_city_name(args["city"])
+        cities = [args["city"]]
+    return conditional_response(request, response, args, cities)
+
+
 # ---------- Models ----------
 
 
@@ -106,7 +121,10 @@ class UpdateCityRangeResult(BaseModel):
 
 
 @router.post("/data.get_range", response_model=GetRangeResult)
-async def mcp_data_get_range(body: GetRangeRequest):
+async def mcp_data_get_range(body: GetRangeRequest, request: Request, response: Response):
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
     result = await tool_get_range(
         city=body.city,
         start_date=body.start_date,
@@ -117,13 +135,19 @@ async def mcp_data_get_range(body: GetRangeRequest):
 
 
 @router.post("/data.get_dataset_overview", response_model=DatasetOverviewResult)
-async def mcp_data_get_dataset_overview(body: DatasetOverviewRequest):
+async def mcp_data_get_dataset_overview(body: DatasetOverviewRequest, request: Request, response: Response):
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
     result = await tool_get_dataset_overview()
     return result
 
 
 @router.post("/data.check_coverage", response_model=CoverageResult)
-async def mcp_data_check_coverage(body: CoverageRequest):
+async def mcp_data_check_coverage(body: CoverageRequest, request: Request, response: Response):
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
     result = await tool_check_coverage(
         city=body.city,
         start_date=body.start_date,
@@ -133,7 +157,10 @@ async def mcp_data_check_coverage(body: CoverageRequest):
 
 
 @router.post("/data.custom_query", response_model=CustomQueryResult)
-async def mcp_data_custom_query(body: CustomQueryRequest):
+async def mcp_data_custom_query(body: CustomQueryRequest, request: Request, response: Response):
+    cached = _not_modified(request, response, body)
+    if cached is not None:
+        return cached
     result = await tool_custom_query(
         fields=body.fields or [],
         city=body.city,
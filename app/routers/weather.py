@@ -2,18 +2,145 @@
 天气数据查询路由
 需要 API Key 认证
 """
-from fastapi import APIRouter, Depends, Query
-from typing import List, Tuple
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Tuple
+from datetime import date, datetime
+import base64
+import binascii
+import csv
+import io
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.db.database import get_db
+from sqlalchemy import select, literal, tuple_, union_all
+from app.core.conditional import conditional_response
+from app.db.database import AsyncSessionLocal, get_db
 from app.models.models import WeatherData
-from app.schemas.schemas import WeatherDataResponse
+from app.services.summary import get_dataset_summary
+from app.schemas.schemas import WeatherBatchRequest, WeatherDataResponse
 
 
 router = APIRouter(prefix="/weather", tags=["天气数据"])
 
+# 下一页游标通过响应头返回，保持响应体仍为记录列表
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# 导出字段 (与 /weather/data 返回字段一致)
+EXPORT_FIELDS = ["city", "date", "weather_condition", "temp_min", "temp_max", "wind_info"]
+
+# /weather/data 查询列：只投影需要返回的字段 (外加游标用的 id)，
+# 结果直接是行元组，不构建 ORM 实例、不进入 identity map
+DATA_COLUMNS = (
+    WeatherData.id,
+    WeatherData.city,
+    WeatherData.date,
+    WeatherData.weather_condition,
+    WeatherData.temp_min,
+    WeatherData.temp_max,
+    WeatherData.wind_info,
+)
+
+# 服务端游标每次从数据库拉取的行数
+EXPORT_BATCH_SIZE = 1000
+
+
+def apply_weather_filters(query, city: Optional[str], start_date: Optional[str], end_date: Optional[str]):
+    """
+    为查询追加城市和日期范围筛选条件
+    
+    城市键在 Python 侧规范化以命中 idx_city_key_date；无法解析的日期参数直接忽略
+    """
+    if city:
+        city_key = WeatherData.normalize_city_key(city)
+        if city_key:
+            query = query.where(WeatherData.city_key == city_key)
+    
+    if start_date:
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            query = query.where(WeatherData.date >= start)
+        except ValueError:
+            pass
+    
+    if end_date:
+        try:
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+            query = query.where(WeatherData.date <= end)
+        except ValueError:
+            pass
+    
+    return query
+
+
+def encode_cursor(record_date: date, record_id: int) -> str:
+    """将 (date, id) 编码为不透明的分页游标"""
+    raw = f"{record_date.isoformat()}|{record_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """
+    解析分页游标
+    
+    Raises:
+        HTTPException: 游标格式无效
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        date_part, id_part = raw.split("|", 1)
+        return datetime.strptime(date_part, "%Y-%m-%d").date(), int(id_part)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="分页游标无效"
+        )
+
+
+def build_data_query(query, city: Optional[str], start_date: Optional[str], end_date: Optional[str], cursor: Optional[str], limit: int):
+    """
+    构建 /weather/data 的分页查询 (按城市、日期范围筛选，按 (date, id) 倒序)
+    
+    多取一条用于判断是否还有下一页
+    """
+    query = apply_weather_filters(query, city, start_date, end_date)
+    
+    # 游标翻页：只取 (date, id) 严格小于上一页最后一条的记录
+    # 行比较可直接作为 idx_city_key_date (lower(city), date, id) 上的索引范围条件
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(WeatherData.date, WeatherData.id) < tuple_(cursor_date, cursor_id))
+    
+    return query.order_by(WeatherData.date.desc(), WeatherData.id.desc()).limit(limit + 1)
+
+
+def format_data_page(rows, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    将 DATA_COLUMNS 行元组格式化为返回记录
+    
+    Returns:
+        (记录列表, 下一页游标)；没有下一页时游标为 None
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date, last.id)
+    
+    # 按列位置解包行元组 (DATA_COLUMNS 之前可能有额外的前置列)
+    data = [
+        {
+            "city": city,
+            "date": d.isoformat(),
+            "weather_condition": condition,
+            "temp_min": t_min,
+            "temp_max": t_max,
+            "wind_info": wind
+        }
+        for *_, _id, city, d, condition, t_min, t_max, wind in rows
+    ]
+    return data, next_cursor
+
 
 @router.get("")
 @router.get("/data")
@@ -22,6 +149,8 @@ async def get_weather_data(
     start_date: str = Query(None, description="开始日期 YYYY-MM-DD"),
     end_date: str = Query(None, description="结束日期 YYYY-MM-DD"),
     limit: int = Query(100, ge=1, le=1000, description="返回条数"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    response: Response = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -35,6 +164,12 @@ async def get_weather_data(
     - **start_date**: 可选，开始日期 (YYYY-MM-DD)
     - **end_date**: 可选，结束日期 (YYYY-MM-DD)
     - **limit**: 返回条数 (1-1000)
+    - **cursor**: 可选，分页游标 (上一页响应头 `X-Next-Cursor` 的值)
+    
+    **分页：**
+    结果按 (date, id) 倒序排列。若还有下一页，响应头 `X-Next-Cursor` 会给出游标，
+    带上 `cursor` 再次请求即可继续翻页；每页都是 (city, date) 索引上的一次范围扫描，
+    翻页深度不影响查询代价 (不使用 OFFSET)。
     
     **返回示例：**
     ```json
@@ -50,86 +185,183 @@ async def get_weather_data(
     ]
     ```
     """
-    # 构建查询
-    query = select(WeatherData)
-
-    # 按城市筛选（忽略大小写并去除首尾空格）
-    if city:
-        city_norm = city.strip()
-        if city_norm:
-            query = query.where(func.lower(WeatherData.city) == func.lower(city_norm))
+    query = build_data_query(select(*DATA_COLUMNS), city, start_date, end_date, cursor, limit)
     
-    # 按日期范围筛选
-    if start_date:
-        try:
-            start = datetime.strptime(start_date, "%Y-%m-%d").date()
-            query = query.where(WeatherData.date >= start)
-        except ValueError:
-            pass
+    # 执行查询
+    result = await db.execute(query)
+    rows = result.all()
     
-    if end_date:
-        try:
-            end = datetime.strptime(end_date, "%Y-%m-%d").date()
-            query = query.where(WeatherData.date <= end)
-        except ValueError:
-            pass
+    data, next_cursor = format_data_page(rows, limit)
+    if next_cursor and response is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    return data
+
+
+@router.post("/batch")
+async def get_weather_batch(
+    body: WeatherBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量查询天气数据 (需要 API Key)
     
-    # 排序和限制
-    query = query.order_by(WeatherData.date.desc()).limit(limit)
+    一次请求携带多组查询条件 (最多 50 组)，每组参数与 `/weather/data` 相同：
+    `city`、`start_date`、`end_date`、`limit`、`cursor`。
     
-    # 执行查询
-    result = await db.execute(query)
-    weather_records = result.scalars().all()
+    所有查询合并为一条 UNION ALL 语句执行 (每个分支各自排序和限制条数，
+    仍是 idx_city_key_date 上的独立范围扫描)，只需一次认证、一个会话和一次往返。
     
-    # 格式化返回数据
-    data = [
+    **返回：** 与请求顺序一致的结果列表，每项包含该组的记录和下一页游标：
+    ```json
+    [
         {
-            "city": record.city,
-            "date": record.date.strftime("%Y-%m-%d"),
-            "weather_condition": record.weather_condition,
-            "temp_min": record.temp_min,
-            "temp_max": record.temp_max,
-            "wind_info": record.wind_info
+            "city": "昆明",
+            "start_date": "2016-01-01",
+            "end_date": "2016-01-31",
+            "count": 31,
+            "items": [...],
+            "next_cursor": null
         }
-        for record in weather_records
     ]
+    ```
+    """
+    # 每个分支带上查询序号，用于把结果行分回各组
+    branches = [
+        build_data_query(
+            select(literal(i).label("spec"), *DATA_COLUMNS),
+            spec.city, spec.start_date, spec.end_date, spec.cursor, spec.limit,
+        )
+        for i, spec in enumerate(body.queries)
+    ]
+    query = branches[0] if len(branches) == 1 else union_all(*branches)
     
-    return data
+    result = await db.execute(query)
+    grouped: List[list] = [[] for _ in body.queries]
+    for row in result.all():
+        grouped[row.spec].append(row)
+    
+    results = []
+    for spec, rows in zip(body.queries, grouped):
+        # UNION ALL 不保证各分支间的输出顺序，分支内顺序需重新排定
+        rows.sort(key=lambda r: (r.date, r.id), reverse=True)
+        items, next_cursor = format_data_page(rows, spec.limit)
+        results.append({
+            "city": spec.city,
+            "start_date": spec.start_date,
+            "end_date": spec.end_date,
+            "count": len(items),
+            "items": items,
+            "next_cursor": next_cursor,
+        })
+    
+    return results
+
+
+async def _stream_export(query, fmt: str) -> AsyncIterator[bytes]:
+    """
+    通过服务端游标逐批读取并序列化导出数据
+    
+    会话在生成器内部创建，生命周期与响应流一致；客户端断开时生成器被关闭，游标随会话释放
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue().encode("utf-8")
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    (city, d.isoformat(), condition, t_min, t_max, wind)
+                    for city, d, condition, t_min, t_max, wind in rows
+                )
+                chunk = buffer.getvalue()
+            else:
+                chunk = "".join(
+                    json.dumps(
+                        {
+                            "city": city,
+                            "date": d.isoformat(),
+                            "weather_condition": condition,
+                            "temp_min": t_min,
+                            "temp_max": t_max,
+                            "wind_info": wind,
+                        },
+                        ensure_ascii=False,
+                    ) + "\n"
+                    for city, d, condition, t_min, t_max, wind in rows
+                )
+            yield chunk.encode("utf-8")
+
+
+@router.get("/export")
+async def export_weather_data(
+    city: str = Query(None, description="城市名称"),
+    start_date: str = Query(None, description="开始日期 YYYY-MM-DD"),
+    end_date: str = Query(None, description="结束日期 YYYY-MM-DD"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="导出格式: ndjson / csv"),
+):
+    """
+    流式导出天气数据 (需要 API Key)
+    
+    **查询参数：**
+    - **city**: 可选，城市名称；不传则导出全部城市
+    - **start_date**: 可选，开始日期 (YYYY-MM-DD)
+    - **end_date**: 可选，结束日期 (YYYY-MM-DD)
+    - **format**: `ndjson` (每行一个 JSON 对象) 或 `csv` (带表头)
+    
+    数据通过服务端游标按批读取 (每批 1000 行) 并边读边发送，不会在内存中物化整个结果集，
+    全量导出也能以恒定内存运行并立即开始返回数据。按 (city, date) 顺序输出。
+    """
+    columns = [getattr(WeatherData, f) for f in EXPORT_FIELDS]
+    query = apply_weather_filters(select(*columns), city, start_date, end_date)
+    query = query.order_by(WeatherData.city, WeatherData.date)
+    
+    if format == "csv":
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+    filename = f"weather_export.{format}"
+    
+    return StreamingResponse(
+        _stream_export(query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.get("/stats")
 async def get_weather_stats(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
     """
     获取天气数据统计信息
     
     返回数据总量、支持的城市列表、日期范围等
-    """
-    # 查询总记录数
-    count_query = select(func.count(WeatherData.id))
-    count_result = await db.execute(count_query)
-    total_records = count_result.scalar()
+    数据来自按城市维护的汇总表 (weather_city_summary)，不扫描 weather_data
     
-    # 查询城市列表
-    cities_query = select(WeatherData.city).distinct()
-    cities_result = await db.execute(cities_query)
-    cities = [city for city in cities_result.scalars().all()]
+    响应带 ETag (随数据集版本变化)；请求头 If-None-Match 匹配时直接返回 304
+    """
+    cached = conditional_response(request, response, {})
+    if cached is not None:
+        return cached
     
-    # 查询日期范围
-    date_query = select(
-        func.min(WeatherData.date).label('min_date'),
-        func.max(WeatherData.date).label('max_date')
-    )
-    date_result = await db.execute(date_query)
-    date_range = date_result.one_or_none()
+    summary = await get_dataset_summary(db)
+    cities = summary["cities"]
     
     return {
-        "total_records": total_records,
+        "total_records": summary["total_records"],
         "cities_count": len(cities),
         "cities": cities[:20] if cities else [],  # 返回前20个城市
         "date_range": {
-            "start": date_range[0].strftime("%Y-%m-%d") if date_range and date_range[0] else None,
-            "end": date_range[1].strftime("%Y-%m-%d") if date_range and date_range[1] else None
+            "start": summary["start"].strftime("%Y-%m-%d") if summary["start"] else None,
+            "end": summary["end"].strftime("%Y-%m-%d") if summary["end"] else None
         }
     }
@@ -3,7 +3,7 @@ Pydantic 数据验证模型
 用于 API 请求/响应的数据验证和序列化
 """
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -125,6 +125,12 @@ class WeatherQuery(BaseModel):
     start_date: Optional[str] = Field(None, description="开始日期 YYYY-MM-DD")
     end_date: Optional[str] = Field(None, description="结束日期 YYYY-MM-DD")
     limit: int = Field(default=100, ge=1, le=1000, description="返回条数")
+    cursor: Optional[str] = Field(None, description="分页游标")
+
+
+class WeatherBatchRequest(BaseModel):
+    """批量天气数据查询"""
+    queries: List[WeatherQuery] = Field(..., min_length=1, max_length=50, description="查询条件列表")
 
 
 class WeatherDataResponse(BaseModel):
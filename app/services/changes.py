@@ -0,0 +1,196 @@
+﻿"""
+天气数据变更通知与数据集版本
+写入方在事务内递增数据集版本并发送 NOTIFY (提交后才投递，回滚则一并丢弃)，
+API 进程持有一个 LISTEN 连接接收通知，用于失效进程内缓存、刷新版本号；
+这样独立进程运行的 CSV 导入脚本也能通知到 API 服务。监听连接断开期间订阅方停止签发 ETag、
+停用缓存，重连后整体重新加载
+"""
+import asyncio
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.db.database import engine
+from app.models.models import DatasetVersion
+
+
+# NOTIFY 频道名
+WEATHER_CHANGED_CHANNEL = "weather_data_changed"
+
+# 通知负载：城市名；ALL_CITIES 表示整表变更 (如清空重导)，同时也是全局版本的 scope
+ALL_CITIES = "*"
+
+# 监听连接探活间隔 / 探活超时 (秒)
+LISTENER_HEALTH_CHECK_INTERVAL = 30.0
+LISTENER_HEALTH_CHECK_TIMEOUT = 5.0
+
+# 监听连接断开后的重连退避 (秒)，每次失败翻倍直至上限
+LISTENER_RECONNECT_MIN_DELAY = 1.0
+LISTENER_RECONNECT_MAX_DELAY = 60.0
+
+
+async def _bump_versions(db: AsyncSession, cities: List[str]) -> None:
+    """递增全局版本及各城市版本 (按 scope 排序加锁，避免并发写入死锁)"""
+    table = DatasetVersion.__table__
+    if ALL_CITIES in cities:
+        # 整表变更：所有已知城市的版本都递增
+        await db.execute(
+            update(table)
+            .where(table.c.scope != ALL_CITIES)
+            .values(version=table.c.version + 1, updated_at=func.now())
+        )
+    scopes = sorted({ALL_CITIES, *cities})
+    stmt = insert(table).values([{"scope": scope, "version": 1} for scope in scopes])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.scope],
+        set_={"version": table.c.version + 1, "updated_at": func.now()},
+    )
+    await db.execute(stmt)
+
+
+async def notify_cities_changed(db: AsyncSession, cities: Iterable[str]) -> None:
+    """
+    登记城市数据变更：递增数据集版本，并为每个城市发送一条变更通知
+    
+    与写入处于同一事务，由调用方提交
+    """
+    cities = sorted({c for c in cities if c})
+    if not cities:
+        return
+    await _bump_versions(db, cities)
+    for city in cities:
+        await db.execute(select(func.pg_notify(WEATHER_CHANGED_CHANNEL, city)))
+
+
+class ChangeListener:
+    """
+    监听 weather_data_changed 通知
+    
+    占用连接池中的一个连接执行 LISTEN，收到通知时以城市名依次调用已订阅的回调。
+    后台任务监视该连接 (连接终止回调 + 定期 SELECT 1 探活)：连接断开时调用断开回调
+    (订阅方据此停止使用可能过期的版本号与缓存)，随后按指数退避重连；
+    重连成功后以 ALL_CITIES 调用回调，断开期间漏掉的通知视同整表变更
+    """
+    
+    def __init__(self):
+        self._callbacks: List[Callable[[str], Awaitable[None]]] = []
+        self._lost_callbacks: List[Callable[[], None]] = []
+        self._conn: Optional[AsyncConnection] = None
+        self._driver_conn = None
+        self._lost: Optional[asyncio.Event] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._tasks = set()
+    
+    def subscribe(self, callback: Callable[[str], Awaitable[None]], on_lost: Optional[Callable[[], None]] = None) -> None:
+        """订阅变更通知；on_lost 在监听连接断开时调用"""
+        if callback not in self._callbacks:
+            self._callbacks.append(callback)
+        if on_lost is not None and on_lost not in self._lost_callbacks:
+            self._lost_callbacks.append(on_lost)
+    
+    def unsubscribe(self, callback: Callable[[str], Awaitable[None]], on_lost: Optional[Callable[[], None]] = None) -> None:
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+        if on_lost in self._lost_callbacks:
+            self._lost_callbacks.remove(on_lost)
+    
+    async def _dispatch(self, payload: str) -> None:
+        for callback in list(self._callbacks):
+            await callback(payload)
+    
+    def _on_notify(self, connection, pid, channel, payload):
+        task = asyncio.get_running_loop().create_task(self._dispatch(payload))
+        # 持有任务引用直到完成，避免被垃圾回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def _on_terminate(self, connection):
+        if self._lost is not None:
+            self._lost.set()
+    
+    async def _connect(self) -> None:
+        self._lost = asyncio.Event()
+        self._conn = await engine.connect()
+        raw = await self._conn.get_raw_connection()
+        self._driver_conn = raw.driver_connection
+        self._driver_conn.add_termination_listener(self._on_terminate)
+        await self._driver_conn.add_listener(WEATHER_CHANGED_CHANNEL, self._on_notify)
+    
+    async def _disconnect(self, invalidate: bool = False) -> None:
+        """释放监听连接；invalidate 或连接已断开时作废而不归还连接池"""
+        driver_conn, conn = self._driver_conn, self._conn
+        self._driver_conn = self._conn = None
+        if driver_conn is not None and not driver_conn.is_closed():
+            try:
+                await driver_conn.remove_listener(WEATHER_CHANGED_CHANNEL, self._on_notify)
+            except Exception:
+                pass
+        if conn is not None:
+            try:
+                if invalidate or driver_conn is None or driver_conn.is_closed():
+                    await conn.invalidate()
+                else:
+                    await conn.close()
+            except Exception:
+                pass
+    
+    async def _watch(self) -> None:
+        """等待连接终止回调，或每 LISTENER_HEALTH_CHECK_INTERVAL 秒探活一次；连接失效时返回"""
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), LISTENER_HEALTH_CHECK_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(self._driver_conn.fetchval("SELECT 1"), LISTENER_HEALTH_CHECK_TIMEOUT)
+            except Exception:
+                return
+    
+    async def _supervise(self) -> None:
+        delay = LISTENER_RECONNECT_MIN_DELAY
+        while True:
+            await self._watch()
+            print("⚠️  变更通知监听连接已断开，暂停 ETag 与列式缓存，正在重连...")
+            for on_lost in list(self._lost_callbacks):
+                on_lost()
+            await self._disconnect(invalidate=True)
+            while True:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LISTENER_RECONNECT_MAX_DELAY)
+                try:
+                    await self._connect()
+                    break
+                except Exception as e:
+                    await self._disconnect(invalidate=True)
+                    print(f"⚠️  变更通知监听重连失败 ({e})，{delay:.0f}s 后重试")
+            print("✅ 变更通知监听已重连，重新加载数据集版本与列式缓存")
+            try:
+                await self._dispatch(ALL_CITIES)
+                delay = LISTENER_RECONNECT_MIN_DELAY
+            except Exception as e:
+                # 重新加载失败时按断开处理，退避后重连再试
+                print(f"⚠️  重连后重新加载失败: {e}")
+                self._lost.set()
+    
+    async def start(self) -> None:
+        if self._supervisor is not None:
+            return
+        await self._connect()
+        self._supervisor = asyncio.get_running_loop().create_task(self._supervise())
+    
+    async def stop(self) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
+        await self._disconnect()
+
+
+# 全局监听器实例 (应用生命周期内启动)
+change_listener = ChangeListener()
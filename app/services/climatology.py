@@ -0,0 +1,191 @@
+﻿"""
+逐日气候平均值 (climatology) 维护
+按 (城市, 指标, 日序) 保存全部历史的可合并聚合量 (count / sum / sum_sq)，
+常年均值与标准差取前后 SMOOTH_HALF_WINDOW 天 (跨年循环) 合并后的结果，
+写入后只重算涉及的日序，再按城市重新平滑
+"""
+import math
+from datetime import date
+from typing import Dict, Iterable, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, bindparam, case, cast, delete, extract, func, literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import WeatherClimatology, WeatherData
+from app.services.rollup import ROLLUP_METRICS
+
+
+# 计算常年值的指标 (与月度预聚合一致)
+CLIMATOLOGY_METRICS = ROLLUP_METRICS
+
+# 日序数量 (按闰年日历编号)
+DAY_SLOTS = 366
+
+# 平滑窗口：前后各 7 天，共 15 天
+SMOOTH_HALF_WINDOW = 7
+
+# 闰年各月 1 日之前的天数，日序 = 偏移 + 日
+_MONTH_OFFSETS = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+
+
+def day_slot(d: date) -> int:
+    """日期对应的日序 1..366 (2 月 29 日为 60，平年 3 月 1 日为 61)"""
+    return _MONTH_OFFSETS[d.month - 1] + d.day
+
+
+def day_slots(days: np.ndarray) -> np.ndarray:
+    """day_slot 的向量化版本，days 为 datetime64[D] 数组"""
+    month_start = days.astype("datetime64[M]")
+    months = month_start.astype(np.int64) % 12
+    return np.asarray(_MONTH_OFFSETS)[months] + (days - month_start.astype("datetime64[D]")).astype(np.int64) + 1
+
+
+def day_slot_expr(column):
+    """day_slot 的 SQL 表达式，只用 extract / CASE，与具体数据库无关"""
+    month = cast(extract("month", column), Integer)
+    day = cast(extract("day", column), Integer)
+    return case({m + 1: offset for m, offset in enumerate(_MONTH_OFFSETS)}, value=month) + day
+
+
+def _climatology_insert(*conditions):
+    """按条件从逐日数据重算各日序聚合量 (所有指标) 的 INSERT ... SELECT，mean / std 留待平滑"""
+    slot = day_slot_expr(WeatherData.date)
+    selects = []
+    for metric in CLIMATOLOGY_METRICS:
+        col = getattr(WeatherData, metric)
+        selects.append(
+            select(
+                WeatherData.city,
+                literal(metric).label("metric"),
+                slot.label("day"),
+                func.count(col).label("count"),
+                func.coalesce(func.sum(col), 0).label("sum"),
+                func.coalesce(func.sum(col * col), 0).label("sum_sq"),
+            )
+            .where(col.isnot(None), *conditions)
+            .group_by(WeatherData.city, slot)
+        )
+    return WeatherClimatology.__table__.insert().from_select(
+        ["city", "metric", "day", "count", "sum", "sum_sq"], union_all(*selects)
+    )
+
+
+def _smoothed(counts: np.ndarray, sums: np.ndarray, sums_sq: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按日序排列的聚合量 (下标 0 为日序 1) 做循环窗口合并，返回均值与样本标准差 (无数据处为 NaN)"""
+    width = 2 * SMOOTH_HALF_WINDOW + 1
+    pooled = []
+    for values in (counts, sums, sums_sq):
+        padded = np.concatenate((values[-SMOOTH_HALF_WINDOW:], values, values[:SMOOTH_HALF_WINDOW]))
+        acc = np.concatenate(([0.0], np.cumsum(padded)))
+        pooled.append(acc[width:] - acc[:-width])
+    n, s, ss = pooled
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s / n
+        var = (ss - s * s / n) / (n - 1)
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+async def _smooth_cities(db: AsyncSession, cities: Iterable[str]) -> None:
+    """由聚合量重算城市所有日序的平滑均值与标准差"""
+    table = WeatherClimatology.__table__
+    for city in sorted(set(cities)):
+        rows = (
+            await db.execute(
+                select(table.c.metric, table.c.day, table.c.count, table.c.sum, table.c.sum_sq).where(table.c.city == city)
+            )
+        ).all()
+        if not rows:
+            continue
+        params = []
+        for metric in CLIMATOLOGY_METRICS:
+            grid = np.zeros((3, DAY_SLOTS))
+            days = [r.day for r in rows if r.metric == metric]
+            if not days:
+                continue
+            for r in rows:
+                if r.metric == metric:
+                    grid[:, r.day - 1] = (r.count, r.sum, r.sum_sq)
+            mean, std = _smoothed(*grid)
+            for day in days:
+                m, sd = float(mean[day - 1]), float(std[day - 1])
+                params.append({
+                    "b_city": city,
+                    "b_metric": metric,
+                    "b_day": day,
+                    "mean": m,
+                    "std": sd if not math.isnan(sd) else None,
+                })
+        await db.execute(
+            update(table)
+            .where(table.c.city == bindparam("b_city"), table.c.metric == bindparam("b_metric"), table.c.day == bindparam("b_day"))
+            .values(mean=bindparam("mean"), std=bindparam("std")),
+            params,
+        )
+
+
+async def _refresh_slots(db: AsyncSession, city: str, slots: Set[int]) -> None:
+    """重算某城市指定日序的聚合量"""
+    table = WeatherClimatology.__table__
+    if len(slots) == DAY_SLOTS:
+        await db.execute(delete(table).where(table.c.city == city))
+        await db.execute(_climatology_insert(WeatherData.city == city))
+        return
+    await db.execute(delete(table).where(table.c.city == city, table.c.day.in_(sorted(slots))))
+    await db.execute(
+        _climatology_insert(WeatherData.city == city, day_slot_expr(WeatherData.date).in_(sorted(slots)))
+    )
+
+
+async def refresh_climatology(db: AsyncSession, rows: Iterable[Tuple[str, date]]) -> None:
+    """
+    重算写入涉及的日序并重新平滑对应城市 (插入或删除后调用)
+    
+    与写入处于同一事务，由调用方提交
+    
+    Args:
+        rows: 变更记录的 (city, date) 序列
+    """
+    slots: Dict[str, Set[int]] = {}
+    for city, d in rows:
+        slots.setdefault(city, set()).add(day_slot(d))
+    for city in sorted(slots):
+        await _refresh_slots(db, city, slots[city])
+    await _smooth_cities(db, slots)
+
+
+async def refresh_climatology_range(db: AsyncSession, city: str, start: date, end: date) -> None:
+    """重算某城市日期区间覆盖的日序 (如按区间替换数据后)，由调用方提交"""
+    if start > end:
+        start, end = end, start
+    if (end - start).days + 1 >= DAY_SLOTS:
+        slots = set(range(1, DAY_SLOTS + 1))
+    else:
+        slots = {day_slot(date.fromordinal(o)) for o in range(start.toordinal(), end.toordinal() + 1)}
+    await _refresh_slots(db, city, slots)
+    await _smooth_cities(db, [city])
+
+
+async def rebuild_climatology(db: AsyncSession) -> None:
+    """全量重建常年值表 (首次部署或整表清空后使用)，由调用方提交"""
+    await db.execute(delete(WeatherClimatology.__table__))
+    await db.execute(_climatology_insert())
+    cities = (await db.execute(select(WeatherClimatology.city).distinct())).scalars().all()
+    await _smooth_cities(db, cities)
+
+
+async def ensure_climatology(db: AsyncSession) -> bool:
+    """
+    常年值表为空而天气数据非空时执行一次全量重建 (应用启动时调用)
+    
+    Returns:
+        是否执行了重建
+    """
+    has_climatology = (await db.execute(select(WeatherClimatology.city).limit(1))).first()
+    if has_climatology:
+        return False
+    has_data = (await db.execute(select(WeatherData.id).limit(1))).first()
+    if not has_data:
+        return False
+    await rebuild_climatology(db)
+    return True
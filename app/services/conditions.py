@@ -0,0 +1,97 @@
+﻿"""
+天气状况分类
+weather_condition 为自由文本 (如 "小到中雨 / 阵雨")，写入时 (CSV 导入、爬虫更新) 解析为位掩码 condition_flags，
+按类别统计 (如某城市每年雨天数) 时在城市索引扫描内做整数位运算，不再拉取原文做字符串匹配
+"""
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import SmallInteger, String, column, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import WeatherData
+
+
+# 类别 -> 位；一天可同时属于多个类别 (如 "雷阵雨" 为 rain | storm)
+CONDITION_FLAGS: Dict[str, int] = {
+    "rain": 1,
+    "snow": 2,
+    "sunny": 4,
+    "cloudy": 8,
+    "storm": 16,
+    "fog": 32,
+}
+
+# 回填时每批处理的 id 跨度，每批单独提交
+BACKFILL_BATCH_SIZE = 50_000
+
+# 类别 -> 命中任一关键字即置位
+_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "rain": ("雨",),
+    "snow": ("雪",),
+    "sunny": ("晴",),
+    "cloudy": ("云", "阴"),
+    "storm": ("雷", "暴", "冰雹", "台风"),
+    "fog": ("雾", "霾"),
+}
+
+
+@lru_cache(maxsize=4096)
+def classify_condition(condition: Optional[str]) -> int:
+    """
+    解析天气状况文本为类别位掩码
+
+    Args:
+        condition: 天气状况 (如 "小到中雨 / 阵雨")，可为空
+
+    Returns:
+        CONDITION_FLAGS 中各位的按位或，无法识别时为 0
+    """
+    if not isinstance(condition, str) or not condition:
+        return 0
+    flags = 0
+    for name, keywords in _KEYWORDS.items():
+        if any(keyword in condition for keyword in keywords):
+            flags |= CONDITION_FLAGS[name]
+    return flags
+
+
+async def ensure_condition_flags(db: AsyncSession) -> bool:
+    """
+    回填 condition_flags 为空的记录 (新增该列之前导入的数据，应用启动时调用)
+
+    不同的天气状况文本只有几十种：先在 Python 侧逐种解析，再按 id 分批执行
+    UPDATE ... FROM (VALUES ...) 连接更新 (weather_condition 上没有索引，不按文本逐个全表扫描)；
+    每批单独提交，中断后重启会从剩余的空行继续；空行经部分索引 idx_condition_flags_pending 查找，
+    回填完成后每次启动的检查不再扫描全表
+
+    Returns:
+        是否执行了回填
+    """
+    pending_filter = WeatherData.condition_flags.is_(None)
+    pending = (
+        await db.execute(select(WeatherData.weather_condition).where(pending_filter).distinct())
+    ).scalars().all()
+    if not pending:
+        return False
+
+    mapping = values(
+        column("weather_condition", String),
+        column("condition_flags", SmallInteger),
+        name="parsed_conditions",
+    ).data([(condition, classify_condition(condition)) for condition in pending])
+    lo, hi = (await db.execute(select(func.min(WeatherData.id), func.max(WeatherData.id)).where(pending_filter))).one()
+    table = WeatherData.__table__
+    for batch_start in range(lo, hi + 1, BACKFILL_BATCH_SIZE):
+        await db.execute(
+            update(table)
+            .where(
+                table.c.id >= batch_start,
+                table.c.id < batch_start + BACKFILL_BATCH_SIZE,
+                table.c.weather_condition == mapping.c.weather_condition,
+                table.c.condition_flags.is_(None),
+            )
+            .values(condition_flags=mapping.c.condition_flags)
+        )
+        await db.commit()
+    return True
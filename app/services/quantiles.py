@@ -0,0 +1,56 @@
+﻿"""
+可合并的分位数草图
+每个 (城市, 年, 月, 指标) 的逐日数值按 RESOLUTION 分桶，保存为稀疏直方图 {"b": [桶编号], "c": [条数]}；
+合并即按桶累加条数，任意多个月份合并后的结果与先合并原始数据再分桶完全相同
+
+误差界：每个次序统计量与真实值相差不超过 RESOLUTION / 2，
+线性插值得到的分位数 (与 SQL percentile_cont / numpy.percentile 相同的定义) 误差同样不超过 RESOLUTION / 2；
+原始数据精度不高于 RESOLUTION 时 (如整数摄氏度) 结果精确
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# 分桶宽度 (℃)
+RESOLUTION = 0.1
+
+# 分位数误差上界 (℃)
+ERROR_BOUND = RESOLUTION / 2
+
+
+def build_sketch(values: Iterable[float]) -> Dict[str, List[int]]:
+    """由原始数值构建草图"""
+    bins = np.rint(np.asarray(list(values), dtype=np.float64) / RESOLUTION).astype(np.int64)
+    uniq, counts = np.unique(bins, return_counts=True)
+    return {"b": uniq.tolist(), "c": counts.tolist()}
+
+
+def merge_sketches(sketches: Iterable[Dict[str, List[int]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """合并多个草图，返回升序的 (桶编号, 条数)"""
+    sketches = [s for s in sketches if s and s["b"]]
+    if not sketches:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    bins = np.concatenate([np.asarray(s["b"], dtype=np.int64) for s in sketches])
+    counts = np.concatenate([np.asarray(s["c"], dtype=np.int64) for s in sketches])
+    uniq, inverse = np.unique(bins, return_inverse=True)
+    return uniq, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+def sketch_quantiles(bins: np.ndarray, counts: np.ndarray, fractions: Sequence[float]) -> List[Optional[float]]:
+    """
+    由合并后的草图计算分位数 (fractions 取值 0..1)，定义与 percentile_cont 一致：
+    位置 q * (n - 1) 处的值，在相邻两个次序统计量之间线性插值
+    """
+    n = int(counts.sum())
+    if n == 0:
+        return [None] * len(fractions)
+    cumulative = np.cumsum(counts)
+    positions = np.asarray(fractions, dtype=np.float64) * (n - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, n - 1)
+    # 第 k 个次序统计量 (从 0 开始) 所在的桶：累计条数首次超过 k 的位置
+    v_lower = bins[np.searchsorted(cumulative, lower, side="right")]
+    v_upper = bins[np.searchsorted(cumulative, upper, side="right")]
+    values = (v_lower + (v_upper - v_lower) * (positions - lower)) * RESOLUTION
+    return [round(float(v), 6) for v in values]
@@ -0,0 +1,306 @@
+﻿"""
+月度预聚合表维护与查询
+按 (城市, 年, 月, 指标) 保存 count / sum / sum_sq / min / max，
+分析工具对完整月份直接读取预聚合行，只对区间两端不完整的月份扫描逐日数据，结果与全量扫描一致；
+每行另存一个可合并的分位数草图 (app/services/quantiles.py)，分位数查询合并草图而不必排序逐日数据
+"""
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, and_, bindparam, cast, delete, extract, func, literal, or_, select, tuple_, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import WeatherData, WeatherMonthlyRollup
+from app.services.quantiles import RESOLUTION
+
+
+# 预聚合的指标
+ROLLUP_METRICS = ("temp_min", "temp_max")
+
+
+def _month_id(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def _month_start(month_id: int) -> date:
+    return date(month_id // 12, month_id % 12 + 1, 1)
+
+
+def _raw_monthly_select(metric: str, *conditions):
+    """逐日数据按 (city, year, month) 聚合，列与 weather_monthly_rollup 一致"""
+    col = getattr(WeatherData, metric)
+    year = cast(extract("year", WeatherData.date), Integer)
+    month = cast(extract("month", WeatherData.date), Integer)
+    return (
+        select(
+            WeatherData.city.label("city"),
+            year.label("year"),
+            month.label("month"),
+            func.count(col).label("count"),
+            func.coalesce(func.sum(col), 0).label("sum"),
+            func.coalesce(func.sum(col * col), 0).label("sum_sq"),
+            func.min(col).label("min"),
+            func.max(col).label("max"),
+        )
+        .where(col.isnot(None), *conditions)
+        .group_by(WeatherData.city, year, month)
+    )
+
+
+def _rollup_insert(*conditions):
+    """按条件从逐日数据重算预聚合行 (所有指标) 的 INSERT ... SELECT"""
+    table = WeatherMonthlyRollup.__table__
+    selects = []
+    for metric in ROLLUP_METRICS:
+        raw = _raw_monthly_select(metric, *conditions).subquery()
+        selects.append(
+            select(
+                raw.c.city, raw.c.year, raw.c.month, literal(metric).label("metric"),
+                raw.c.count, raw.c.sum, raw.c.sum_sq, raw.c.min, raw.c.max,
+            )
+        )
+    return table.insert().from_select(
+        ["city", "year", "month", "metric", "count", "sum", "sum_sq", "min", "max"],
+        union_all(*selects),
+    )
+
+
+def _sketch_histogram_select(*conditions):
+    """
+    逐日数据在 SQL 中按 (city, year, month, metric, 桶编号) 计数，即各预聚合行草图的稀疏直方图
+
+    桶编号 round(value / RESOLUTION) 与 quantiles.build_sketch 的 np.rint 相同
+    (PostgreSQL 双精度 round 为四舍六入五成双)
+    """
+    year = cast(extract("year", WeatherData.date), Integer)
+    month = cast(extract("month", WeatherData.date), Integer)
+    selects = []
+    for metric in ROLLUP_METRICS:
+        col = getattr(WeatherData, metric)
+        bucket = cast(func.round(col / RESOLUTION), Integer)
+        selects.append(
+            select(
+                WeatherData.city.label("city"), year.label("year"), month.label("month"),
+                literal(metric).label("metric"), bucket.label("bucket"), func.count().label("count"),
+            )
+            .where(col.isnot(None), *conditions)
+            .group_by(WeatherData.city, year, month, bucket)
+        )
+    return union_all(*selects).order_by("city", "year", "month", "metric", "bucket")
+
+
+async def _fill_sketches(db: AsyncSession, *conditions) -> None:
+    """按条件为对应的预聚合行写入分位数草图 (预聚合行须已重算)；直方图在 SQL 中聚合，不拉取逐日数据"""
+    result = await db.execute(_sketch_histogram_select(*conditions))
+    sketches = []
+    for key, rows in groupby(result.all(), key=lambda row: row[:4]):
+        rows = list(rows)
+        sketches.append((*key, {"b": [row.bucket for row in rows], "c": [row.count for row in rows]}))
+    if not sketches:
+        return
+    
+    table = WeatherMonthlyRollup.__table__
+    await db.execute(
+        update(table)
+        .where(
+            table.c.city == bindparam("b_city"),
+            table.c.year == bindparam("b_year"),
+            table.c.month == bindparam("b_month"),
+            table.c.metric == bindparam("b_metric"),
+        )
+        .values(sketch=bindparam("sketch")),
+        [
+            {"b_city": city, "b_year": y, "b_month": m, "b_metric": metric, "sketch": sketch}
+            for city, y, m, metric, sketch in sketches
+        ],
+    )
+
+
+async def _refresh_months(db: AsyncSession, city: str, first_month: int, last_month: int) -> None:
+    """重算某城市连续月份区间 [first_month, last_month] 的预聚合行"""
+    start = _month_start(first_month)
+    end = _month_start(last_month + 1) - timedelta(days=1)
+    table = WeatherMonthlyRollup.__table__
+    await db.execute(
+        delete(table).where(
+            table.c.city == city,
+            tuple_(table.c.year, table.c.month) >= tuple_(start.year, start.month),
+            tuple_(table.c.year, table.c.month) <= tuple_(end.year, end.month),
+        )
+    )
+    conditions = (WeatherData.city == city, WeatherData.date >= start, WeatherData.date <= end)
+    await db.execute(_rollup_insert(*conditions))
+    await _fill_sketches(db, *conditions)
+
+
+async def refresh_rollup(db: AsyncSession, rows: Iterable[Tuple[str, date]]) -> None:
+    """
+    重算写入涉及的月份 (插入或删除后调用)
+    
+    同一城市的相邻月份合并为一次区间重算；与写入处于同一事务，由调用方提交
+    
+    Args:
+        rows: 变更记录的 (city, date) 序列
+    """
+    months: Dict[str, Set[int]] = {}
+    for city, d in rows:
+        months.setdefault(city, set()).add(_month_id(d))
+    
+    for city in sorted(months):
+        ids = sorted(months[city])
+        run_start = prev = ids[0]
+        for month_id in ids[1:]:
+            if month_id != prev + 1:
+                await _refresh_months(db, city, run_start, prev)
+                run_start = month_id
+            prev = month_id
+        await _refresh_months(db, city, run_start, prev)
+
+
+async def refresh_rollup_range(db: AsyncSession, city: str, start: date, end: date) -> None:
+    """重算某城市日期区间覆盖的所有月份 (如按区间替换数据后)，由调用方提交"""
+    if start > end:
+        start, end = end, start
+    await _refresh_months(db, city, _month_id(start), _month_id(end))
+
+
+async def rebuild_rollup(db: AsyncSession) -> None:
+    """
+    全量重建预聚合表 (首次部署或整表清空后使用)，由调用方提交
+
+    草图逐城市填充，内存占用只与单个城市的直方图行数有关，与总行数无关
+    """
+    await db.execute(delete(WeatherMonthlyRollup.__table__))
+    await db.execute(_rollup_insert())
+    cities = (
+        await db.execute(select(WeatherMonthlyRollup.city).distinct().order_by(WeatherMonthlyRollup.city))
+    ).scalars().all()
+    for city in cities:
+        await _fill_sketches(db, WeatherData.city == city)
+
+
+async def ensure_rollup(db: AsyncSession) -> bool:
+    """
+    预聚合表为空 (或存在缺少分位数草图的旧数据行) 而天气数据非空时执行一次全量重建 (应用启动时调用)
+    
+    Returns:
+        是否执行了重建
+    """
+    has_rollup = (await db.execute(select(WeatherMonthlyRollup.city).limit(1))).first()
+    missing_sketch = (
+        await db.execute(select(WeatherMonthlyRollup.city).where(WeatherMonthlyRollup.sketch.is_(None)).limit(1))
+    ).first()
+    if has_rollup and not missing_sketch:
+        return False
+    has_data = (await db.execute(select(WeatherData.id).limit(1))).first()
+    if not has_data:
+        return False
+    await rebuild_rollup(db)
+    return True
+
+
+def split_months(start: date, end: date) -> Tuple[Optional[Tuple[date, date]], List[Tuple[date, date]]]:
+    """
+    将日期区间拆分为完整月份部分和两端不完整的部分
+    
+    Returns:
+        (完整月份区间 或 None, 需扫描逐日数据的区间列表)
+    """
+    full_start = start if start.day == 1 else _month_start(_month_id(start) + 1)
+    full_end = end if (end + timedelta(days=1)).day == 1 else _month_start(_month_id(end)) - timedelta(days=1)
+    if full_start > full_end:
+        return None, [(start, end)] if start <= end else []
+    
+    edges = []
+    if start < full_start:
+        edges.append((start, full_start - timedelta(days=1)))
+    if full_end < end:
+        edges.append((full_end + timedelta(days=1), end))
+    return (full_start, full_end), edges
+
+
+def monthly_aggregate_query(city_keys: List[str], metric: str, start: date, end: date):
+    """
+    构建区间内按 (city, year, month) 的聚合查询
+    
+    完整月份读取 weather_monthly_rollup，两端不完整的月份从 weather_data 现算，
+    两部分 UNION ALL 为一条语句；每行列为 city / year / month / count / sum / sum_sq / min / max
+    
+    Args:
+        city_keys: 规范化后的城市键 (小写)
+        metric: 指标名称 (须在 ROLLUP_METRICS 中)
+    """
+    full, edges = split_months(start, end)
+    selects = []
+    
+    if full is not None:
+        r = WeatherMonthlyRollup
+        selects.append(
+            select(r.city, r.year, r.month, r.count, r.sum, r.sum_sq, r.min, r.max).where(
+                func.lower(r.city).in_(city_keys),
+                r.metric == metric,
+                tuple_(r.year, r.month) >= tuple_(full[0].year, full[0].month),
+                tuple_(r.year, r.month) <= tuple_(full[1].year, full[1].month),
+            )
+        )
+    
+    if edges:
+        selects.append(
+            _raw_monthly_select(
+                metric,
+                WeatherData.city_key.in_(city_keys),
+                or_(*[and_(WeatherData.date >= lo, WeatherData.date <= hi) for lo, hi in edges]),
+            )
+        )
+    
+    if not selects:
+        return None
+    return selects[0] if len(selects) == 1 else union_all(*selects)
+
+
+def period_aggregate_query(city_keys: List[str], metric: str, start: date, end: date, period: Optional[str] = None):
+    """
+    在 SQL 中按城市 (及时间桶) 合并月度聚合，每个分组只返回一行
+    
+    时间桶由 (year, month) 整数运算得到，与具体数据库无关：
+    month -> year * 12 + month - 1，season -> year * 4 + (month - 1) // 3，year -> year；
+    逐日部分的 year / month 由 extract 提取，SQLAlchemy 按方言编译
+    (PostgreSQL 为 EXTRACT，SQLite 为 STRFTIME)
+    
+    Args:
+        period: None 表示只按城市分组；否则为 month / season / year
+    
+    Returns:
+        列为 city / bucket / count / sum / sum_sq / min / max 的查询，按 (city, bucket) 排序；
+        区间为空时返回 None
+    """
+    monthly = monthly_aggregate_query(city_keys, metric, start, end)
+    if monthly is None:
+        return None
+    m = monthly.subquery()
+    
+    if period == "month":
+        bucket = m.c.year * 12 + m.c.month - 1
+    elif period == "season":
+        bucket = m.c.year * 4 + (m.c.month - 1) // 3
+    elif period == "year":
+        bucket = m.c.year
+    else:
+        bucket = literal(0)
+    bucket = bucket.label("bucket")
+    
+    return (
+        select(
+            m.c.city,
+            bucket,
+            func.sum(m.c.count).label("count"),
+            func.sum(m.c.sum).label("sum"),
+            func.sum(m.c.sum_sq).label("sum_sq"),
+            func.min(m.c.min).label("min"),
+            func.max(m.c.max).label("max"),
+        )
+        .where(m.c.count > 0)
+        .group_by(m.c.city, bucket)
+        .order_by(m.c.city, bucket)
+    )
@@ -0,0 +1,102 @@
+﻿"""
+数据集汇总表维护
+按城市维护记录数和日期范围，供 /weather/stats 与 data.get_dataset_overview 直接读取，
+避免每次请求对 weather_data 全表 COUNT / DISTINCT / MIN / MAX
+"""
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import WeatherCitySummary, WeatherData
+
+
+async def refresh_city_summary(db: AsyncSession, cities: Iterable[str]) -> None:
+    """
+    重算指定城市的汇总行 (会删除数据的写入路径，如按区间替换)
+    
+    每个城市只在 uq_city_date 上做一次范围聚合；与写入处于同一事务，由调用方提交
+    """
+    table = WeatherCitySummary.__table__
+    for city in sorted({c for c in cities if c}):
+        count, min_d, max_d = (
+            await db.execute(
+                select(func.count(), func.min(WeatherData.date), func.max(WeatherData.date))
+                .where(WeatherData.city == city)
+            )
+        ).one()
+        if not count:
+            await db.execute(delete(table).where(table.c.city == city))
+            continue
+        stmt = insert(table).values(city=city, row_count=count, min_date=min_d, max_date=max_d)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.city],
+            set_={
+                "row_count": stmt.excluded.row_count,
+                "min_date": stmt.excluded.min_date,
+                "max_date": stmt.excluded.max_date,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+
+async def rebuild_summary(db: AsyncSession) -> None:
+    """全量重建汇总表 (首次部署或整表清空后使用)，由调用方提交"""
+    table = WeatherCitySummary.__table__
+    await db.execute(delete(table))
+    await db.execute(
+        insert(table).from_select(
+            ["city", "row_count", "min_date", "max_date"],
+            select(
+                WeatherData.city,
+                func.count(),
+                func.min(WeatherData.date),
+                func.max(WeatherData.date),
+            ).group_by(WeatherData.city),
+        )
+    )
+
+
+async def ensure_summary(db: AsyncSession) -> bool:
+    """
+    汇总表为空而天气数据非空时执行一次全量重建 (应用启动时调用)
+    
+    Returns:
+        是否执行了重建
+    """
+    has_summary = (await db.execute(select(WeatherCitySummary.city).limit(1))).first()
+    if has_summary:
+        return False
+    has_data = (await db.execute(select(WeatherData.id).limit(1))).first()
+    if not has_data:
+        return False
+    await rebuild_summary(db)
+    return True
+
+
+async def get_dataset_summary(db: AsyncSession) -> Dict[str, Any]:
+    """
+    读取数据集概况：总记录数、城市列表 (按名称排序)、整体日期范围
+    
+    只读取汇总表，代价与城市数成正比
+    """
+    rows = (
+        await db.execute(
+            select(
+                WeatherCitySummary.city,
+                WeatherCitySummary.row_count,
+                WeatherCitySummary.min_date,
+                WeatherCitySummary.max_date,
+            ).order_by(WeatherCitySummary.city)
+        )
+    ).all()
+    min_dates = [r.min_date for r in rows if r.min_date]
+    max_dates = [r.max_date for r in rows if r.max_date]
+    return {
+        "total_records": sum(r.row_count for r in rows),
+        "cities": [r.city for r in rows],
+        "start": min(min_dates) if min_dates else None,
+        "end": max(max_dates) if max_dates else None,
+    }
@@ -0,0 +1,108 @@
+﻿"""
+数据集版本登记表
+进程内保存 dataset_versions 的副本 (全局 + 按城市)，收到变更通知后从数据库刷新；
+据此为查询结果生成强 ETag，条件请求可在不访问数据库的情况下直接判断是否未变更
+"""
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.models import DatasetVersion, WeatherData
+from app.services.changes import ALL_CITIES, change_listener
+
+
+class DatasetVersions:
+    """全局及按城市的数据集版本号 (只读副本)"""
+    
+    def __init__(self):
+        self.global_version = 0
+        self.cities: Dict[str, int] = {}
+        self.loaded = False
+        self._dirty = False
+        self._refreshing = False
+    
+    async def load(self) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(DatasetVersion.scope, DatasetVersion.version))
+                rows = result.all()
+        except Exception:
+            # 无法确认当前版本时停止签发 ETag，避免对已变更的数据返回 304
+            self.loaded = False
+            raise
+        
+        cities: Dict[str, int] = {}
+        global_version = 0
+        for scope, version in rows:
+            if scope == ALL_CITIES:
+                global_version = version
+            else:
+                cities[WeatherData.normalize_city_key(scope)] = version
+        self.cities = cities
+        self.global_version = global_version
+        self.loaded = True
+    
+    async def _on_change(self, payload: str) -> None:
+        """收到变更通知后刷新；导入期间通知密集，刷新进行中时只标记，完成后再补一次"""
+        self._dirty = True
+        if self._refreshing:
+            return
+        self._refreshing = True
+        try:
+            while self._dirty:
+                self._dirty = False
+                await self.load()
+        finally:
+            self._refreshing = False
+    
+    def _on_lost(self) -> None:
+        """监听连接断开：收不到变更通知，停止签发 ETag；重连后以 ALL_CITIES 通知触发重新加载"""
+        self.loaded = False
+    
+    async def start(self) -> None:
+        """订阅变更通知并加载当前版本；先订阅再加载，避免漏掉加载期间的写入"""
+        change_listener.subscribe(self._on_change, self._on_lost)
+        await change_listener.start()
+        await self.load()
+    
+    async def stop(self) -> None:
+        change_listener.unsubscribe(self._on_change, self._on_lost)
+        self.loaded = False
+    
+    def etag(self, scope: str, args: Dict[str, Any], cities: Optional[Iterable[str]] = None) -> Optional[str]:
+        """
+        计算查询结果的强 ETag
+        
+        Args:
+            scope: 接口标识 (如请求路径)
+            args: 规范化后的请求参数
+            cities: 结果只依赖这些城市时传入，取各城市版本；否则取全局版本
+        
+        Returns:
+            带引号的 ETag；版本未加载时返回 None (不做条件请求)
+        """
+        if not self.loaded:
+            return None
+        
+        keys = sorted({WeatherData.normalize_city_key(c) for c in cities or [] if c})
+        if keys:
+            versions = [[key, self.cities.get(key, 0)] for key in keys]
+        else:
+            versions = [[ALL_CITIES, self.global_version]]
+        
+        payload = json.dumps(
+            [settings.VERSION, scope, args, versions],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        return f'"{digest}"'
+
+
+# 全局版本登记表实例 (应用生命周期内启动)
+dataset_versions = DatasetVersions()
@@ -0,0 +1,222 @@
+﻿"""
+天气数据进程内列式缓存
+全量数据 (30 城市 × 约 10 年逐日) 以 NumPy 数组按城市、按日偏移存放，仅数 MB：
+- temp_min / temp_max: float64 (与数据库 double precision 相同，不因单精度舍入使内存与数据库两条路径的结果不同)，缺失日为 NaN
+- weather_condition / wind_info: 字典编码为 int16 (不同取值超出 int16 范围时为 int32)，缺失日为 -1
+应用启动时加载，分析/数据工具可直接在内存中作答；
+收到某城市的变更通知后丢弃该城市数据并在后台重新加载，重载期间工具回退到数据库查询；
+变更通知监听连接断开期间整体停用，重连后全量重载
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal
+from app.models.models import WeatherData
+from app.services.changes import ALL_CITIES, change_listener
+
+
+# 同一城市连续收到变更通知时，等待该时长后再重载 (合并导入脚本的逐批通知)
+RELOAD_DELAY_SECONDS = 0.5
+
+
+class _Dictionary:
+    """字符串字典编码表 (全局共享，只增不减)"""
+    
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+    
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+    
+    def decode(self, code: int) -> Optional[str]:
+        return self.values[code] if code >= 0 else None
+    
+    @property
+    def code_dtype(self):
+        """容纳当前全部编码 (及缺失值 -1) 的整数类型"""
+        return np.int16 if len(self.values) <= np.iinfo(np.int16).max else np.int32
+
+
+@dataclass
+class CityColumns:
+    """单个城市的列式数据，下标 i 对应日期 start + i 天"""
+    city: str
+    start: date
+    present: np.ndarray      # bool，该日是否有记录
+    temp_min: np.ndarray     # float64
+    temp_max: np.ndarray     # float64
+    condition: np.ndarray    # int16 / int32 字典编码
+    wind: np.ndarray         # int16 / int32 字典编码
+    
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=len(self.present) - 1)
+    
+    def window(self, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        """日期闭区间 [start, end] 对应的数组下标半开区间 [lo, hi)"""
+        n = len(self.present)
+        lo = 0 if start is None else max((start - self.start).days, 0)
+        hi = n if end is None else min((end - self.start).days + 1, n)
+        return lo, max(lo, hi)
+    
+    def metric(self, name: str) -> np.ndarray:
+        return self.temp_min if name == "temp_min" else self.temp_max
+    
+    def date_at(self, index: int) -> date:
+        return self.start + timedelta(days=int(index))
+
+
+class WeatherCache:
+    """进程内列式缓存，按城市键 (lower(city)) 索引"""
+    
+    def __init__(self):
+        self.conditions = _Dictionary()
+        self.winds = _Dictionary()
+        self._cities: Dict[str, CityColumns] = {}
+        self._generation: Dict[str, int] = {}
+        self._reloading: Dict[str, asyncio.Task] = {}
+        self.loaded = False
+    
+    # ----- 读取 -----
+    
+    def get(self, city: Optional[str]) -> Optional[CityColumns]:
+        """返回城市的列式数据；未加载或正在重载时返回 None，调用方应回退到数据库"""
+        if not self.loaded or not city:
+            return None
+        return self._cities.get(WeatherData.normalize_city_key(city))
+    
+    # ----- 加载 -----
+    
+    def _build(self, city: str, rows) -> Optional[CityColumns]:
+        """由按日期排序的 (date, temp_min, temp_max, condition, wind) 行构建列"""
+        if not rows:
+            return None
+        start = rows[0][0]
+        n = (rows[-1][0] - start).days + 1
+        present = np.zeros(n, dtype=bool)
+        temp_min = np.full(n, np.nan, dtype=np.float64)
+        temp_max = np.full(n, np.nan, dtype=np.float64)
+        condition_codes = np.full(n, -1, dtype=np.int64)
+        wind_codes = np.full(n, -1, dtype=np.int64)
+        for d, t_min, t_max, cond, w in rows:
+            i = (d - start).days
+            present[i] = True
+            temp_min[i] = np.nan if t_min is None else t_min
+            temp_max[i] = np.nan if t_max is None else t_max
+            condition_codes[i] = self.conditions.encode(cond)
+            wind_codes[i] = self.winds.encode(w)
+        # 编码完成后再按字典大小收窄类型，不同取值过多时不会溢出
+        condition = condition_codes.astype(self.conditions.code_dtype)
+        wind = wind_codes.astype(self.winds.code_dtype)
+        return CityColumns(city, start, present, temp_min, temp_max, condition, wind)
+    
+    async def _fetch(self, city: Optional[str] = None) -> Dict[str, CityColumns]:
+        """从数据库读取指定城市 (或全部城市) 并构建列式数据"""
+        query = select(
+            WeatherData.city,
+            WeatherData.date,
+            WeatherData.temp_min,
+            WeatherData.temp_max,
+            WeatherData.weather_condition,
+            WeatherData.wind_info,
+        )
+        if city is not None:
+            query = query.where(WeatherData.city_key == WeatherData.normalize_city_key(city))
+        query = query.order_by(WeatherData.city, WeatherData.date)
+        
+        grouped: Dict[str, list] = {}
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=5000))
+            async for rows in result.partitions():
+                for name, d, t_min, t_max, cond, w in rows:
+                    grouped.setdefault(name, []).append((d, t_min, t_max, cond, w))
+        
+        built = {}
+        for name, rows in grouped.items():
+            columns = self._build(name, rows)
+            if columns is not None:
+                built[WeatherData.normalize_city_key(name)] = columns
+        return built
+    
+    async def load_all(self) -> None:
+        """全量加载 (应用启动时调用)"""
+        self._cities = await self._fetch()
+        self.loaded = True
+    
+    async def _reload(self, key: str) -> None:
+        """
+        后台重载单个城市 (key 为 ALL_CITIES 时重载全部)
+        
+        等待片刻以合并连续通知；加载期间若又收到通知则丢弃结果重新加载
+        """
+        try:
+            while True:
+                generation = self._generation.get(key, 0)
+                await asyncio.sleep(RELOAD_DELAY_SECONDS)
+                if self._generation.get(key, 0) != generation:
+                    continue
+                snapshot = dict(self._generation)
+                built = await self._fetch(None if key == ALL_CITIES else key)
+                if self._generation.get(key, 0) != generation:
+                    continue
+                for city_key, columns in built.items():
+                    # 加载期间单独失效过的城市由其自身的重载任务负责
+                    if self._generation.get(city_key, 0) == snapshot.get(city_key, 0):
+                        self._cities[city_key] = columns
+                if key == ALL_CITIES:
+                    # 监听连接断开后重连触发的全量重载完成，恢复使用缓存
+                    self.loaded = True
+                return
+        finally:
+            self._reloading.pop(key, None)
+    
+    def invalidate(self, city: str) -> None:
+        """丢弃某城市 (ALL_CITIES 表示全部) 的缓存并安排后台重载"""
+        key = city if city == ALL_CITIES else WeatherData.normalize_city_key(city)
+        if key == ALL_CITIES:
+            self._cities.clear()
+        else:
+            self._cities.pop(key, None)
+        self._generation[key] = self._generation.get(key, 0) + 1
+        if key not in self._reloading:
+            self._reloading[key] = asyncio.get_running_loop().create_task(self._reload(key))
+    
+    async def _on_change(self, city: str) -> None:
+        self.invalidate(city)
+    
+    def _on_lost(self) -> None:
+        """监听连接断开：收不到变更通知，缓存可能过期，工具回退到数据库直至重连后全量重载完成"""
+        self.loaded = False
+    
+    # ----- 生命周期 -----
+    
+    async def start(self) -> None:
+        """订阅变更通知并全量加载；先订阅再加载，避免漏掉加载期间的写入"""
+        change_listener.subscribe(self._on_change, self._on_lost)
+        await change_listener.start()
+        await self.load_all()
+    
+    async def stop(self) -> None:
+        change_listener.unsubscribe(self._on_change, self._on_lost)
+        for task in list(self._reloading.values()):
+            task.cancel()
+        self._reloading.clear()
+        self._cities.clear()
+        self.loaded = False
+
+
+# 全局缓存实例
+weather_cache = WeatherCache()
@@ -0,0 +1,117 @@
+﻿"""
+风力风向解析
+wind_info 为自由文本 (如 "西北风 5-6级 / 西北风 4-5级"，斜杠前为白天、后为夜间)，
+写入时 (CSV 导入、爬虫更新) 解析为白天/夜间风向编码和风力等级四个小整数列，风力统计直接在列上聚合
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import SmallInteger, String, column, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import WeatherData
+
+
+# 风向编码 -> 名称：0 为无持续风向 (静风/旋转风)，1..8 从北风起顺时针
+WIND_DIRECTIONS = ("calm", "N", "NE", "E", "SE", "S", "SW", "W", "NW")
+
+# 解析结果对应的 weather_data 列
+WIND_COLUMNS = ("wind_dir_day", "wind_force_day", "wind_dir_night", "wind_force_night")
+
+# 回填时每批处理的 id 跨度，每批单独提交
+BACKFILL_BATCH_SIZE = 50_000
+
+# 取文本中最先出现的风向 ("南风转东风" 为南风，与风力取首个 "转" 前的等级一致)；同一位置两字风向优先于单字
+_DIRECTION_WORDS = (
+    ("无持续", 0), ("静风", 0), ("旋转", 0),
+    ("东北", 2), ("东南", 4), ("西南", 6), ("西北", 8),
+    ("北", 1), ("东", 3), ("南", 5), ("西", 7),
+)
+# 风力范围 (如 "3-4级") 取上限，"≤3级" / "<3级" 取 3，"微风" 视同 ≤3 级
+_FORCE_RANGE = re.compile(r"(\d+)\s*[-~～至到]\s*(\d+)\s*级")
+_FORCE_SINGLE = re.compile(r"(\d+)\s*级")
+_LIGHT_FORCE = 3
+
+
+def _parse_segment(segment: str) -> Tuple[Optional[int], Optional[int]]:
+    found = [(segment.find(word), -len(word), code) for word, code in _DIRECTION_WORDS if word in segment]
+    direction = min(found)[2] if found else None
+    match = _FORCE_RANGE.search(segment)
+    if match:
+        force = max(int(match.group(1)), int(match.group(2)))
+    else:
+        match = _FORCE_SINGLE.search(segment)
+        force = int(match.group(1)) if match else (_LIGHT_FORCE if "微风" in segment else None)
+    return direction, force
+
+
+@lru_cache(maxsize=4096)
+def parse_wind(wind_info: Optional[str]) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    """
+    解析风力风向文本
+
+    Args:
+        wind_info: 风力风向 (如 "东南风 4-5级 / 南风 3-4级")，只有一段时夜间同白天
+
+    Returns:
+        (白天风向, 白天风力, 夜间风向, 夜间风力)，无法识别的项为 None
+    """
+    if not isinstance(wind_info, str) or not wind_info.strip():
+        return None, None, None, None
+    day, _, night = wind_info.partition("/")
+    dir_day, force_day = _parse_segment(day)
+    dir_night, force_night = _parse_segment(night) if night.strip() else (dir_day, force_day)
+    return dir_day, force_day, dir_night, force_night
+
+
+def wind_columns(wind_info: Optional[str]) -> Dict[str, Optional[int]]:
+    """写入用：风力风向文本 -> {列名: 值}"""
+    return dict(zip(WIND_COLUMNS, parse_wind(wind_info)))
+
+
+async def ensure_wind_columns(db: AsyncSession) -> bool:
+    """
+    回填风向/风力列为空的记录 (新增这些列之前导入的数据，应用启动时调用)
+
+    不同的 wind_info 文本只有几十到几百种：先在 Python 侧逐种解析，再按 id 分批执行
+    UPDATE ... FROM (VALUES ...) 连接更新；每批单独提交，中断后重启会从剩余的空行继续；
+    空行经部分索引 idx_wind_pending 查找，回填完成后每次启动的检查不再扫描全表
+
+    Returns:
+        是否执行了回填
+    """
+    pending_filter = (
+        WeatherData.wind_dir_day.is_(None),
+        WeatherData.wind_force_day.is_(None),
+        WeatherData.wind_dir_night.is_(None),
+        WeatherData.wind_force_night.is_(None),
+    )
+    pending = (
+        await db.execute(select(WeatherData.wind_info).where(*pending_filter).distinct())
+    ).scalars().all()
+    # 解析不出任何一项的文本保持为空，不必回填 (也避免每次启动重复扫描更新)
+    parsed = [(text, *parse_wind(text)) for text in pending if any(v is not None for v in parse_wind(text))]
+    if not parsed:
+        return False
+
+    mapping = values(
+        column("wind_info", String),
+        *(column(name, SmallInteger) for name in WIND_COLUMNS),
+        name="parsed_wind",
+    ).data(parsed)
+    lo, hi = (await db.execute(select(func.min(WeatherData.id), func.max(WeatherData.id)).where(*pending_filter))).one()
+    table = WeatherData.__table__
+    for batch_start in range(lo, hi + 1, BACKFILL_BATCH_SIZE):
+        await db.execute(
+            update(table)
+            .where(
+                table.c.id >= batch_start,
+                table.c.id < batch_start + BACKFILL_BATCH_SIZE,
+                table.c.wind_info == mapping.c.wind_info,
+                *(table.c[name].is_(None) for name in WIND_COLUMNS),
+            )
+            .values({name: mapping.c[name] for name in WIND_COLUMNS})
+        )
+        await db.commit()
+    return True
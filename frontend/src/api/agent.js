@@ -10,7 +10,16 @@ const TOOL_ROUTE = {
   analysis_group_by_period: '/mcp/analysis/group_by_period',
   analysis_compare_cities: '/mcp/analysis/compare_cities',
   analysis_extreme_event_stats: '/mcp/analysis/extreme_event_stats',
+  analysis_condition_stats: '/mcp/analysis/condition_stats',
+  analysis_wind_stats: '/mcp/analysis/wind_stats',
+  analysis_rolling_stats: '/mcp/analysis/rolling_stats',
+  analysis_correlation_matrix: '/mcp/analysis/correlation_matrix',
+  analysis_cluster_cities: '/mcp/analysis/cluster_cities',
+  analysis_percentiles: '/mcp/analysis/percentiles',
+  analysis_anomalies: '/mcp/analysis/anomalies',
   analysis_simple_forecast: '/mcp/analysis/simple_forecast',
+  analysis_forecast_all: '/mcp/analysis/forecast_all',
+  analysis_get_forecast: '/mcp/analysis/get_forecast',
   'data.get_range': '/mcp/data.get_range',
   'data.get_dataset_overview': '/mcp/data.get_dataset_overview',
   'data.check_coverage': '/mcp/data.check_coverage',
@@ -20,7 +29,16 @@ const TOOL_ROUTE = {
   'analysis.group_by_period': '/mcp/analysis/group_by_period',
   'analysis.compare_cities': '/mcp/analysis/compare_cities',
   'analysis.extreme_event_stats': '/mcp/analysis/extreme_event_stats',
+  'analysis.condition_stats': '/mcp/analysis/condition_stats',
+  'analysis.wind_stats': '/mcp/analysis/wind_stats',
+  'analysis.rolling_stats': '/mcp/analysis/rolling_stats',
+  'analysis.correlation_matrix': '/mcp/analysis/correlation_matrix',
+  'analysis.cluster_cities': '/mcp/analysis/cluster_cities',
+  'analysis.percentiles': '/mcp/analysis/percentiles',
+  'analysis.anomalies': '/mcp/analysis/anomalies',
   'analysis.simple_forecast': '/mcp/analysis/simple_forecast',
+  'analysis.forecast_all': '/mcp/analysis/forecast_all',
+  'analysis.get_forecast': '/mcp/analysis/get_forecast',
 };
 
 export const listTools = () => api.get('/mcp/tools');
@@ -15,8 +15,17 @@ from mcp_tools.analysis_agent import (
     tool_describe_timeseries,
     tool_group_by_period,
     tool_compare_cities,
+    tool_condition_stats,
     tool_extreme_event_stats,
+    tool_rolling_stats,
+    tool_cluster_cities,
+    tool_correlation_matrix,
+    tool_percentiles,
+    tool_anomalies,
     tool_simple_forecast,
+    tool_wind_stats,
+    tool_forecast_all,
+    tool_get_forecast,
 )
 
 mcp = FastMCP("WeatherAnalysis")
@@ -24,7 +33,7 @@ mcp = FastMCP("WeatherAnalysis")
 
 @mcp.tool()
 async def analysis_describe_timeseries(city: str, metric: str, start_date: str, end_date: str):
-    """基础统计：均值、极值、标准差。"""
+    """基础统计：均值、极值、标准差。metric=all 时一次返回最低温、最高温、日较差的统计及分位数。"""
     return await tool_describe_timeseries(city, metric, start_date, end_date)
 
 
@@ -35,21 +44,98 @@ async def analysis_group_by_period(city: str, metric: str, period: str, start_da
 
 
 @mcp.tool()
-async def analysis_compare_cities(cities: list[str], metric: str, start_date: str, end_date: str):
-    """多城市同指标对比。"""
-    return await tool_compare_cities(cities, metric, start_date, end_date)
+async def analysis_compare_cities(cities: list[str], metric: str, start_date: str, end_date: str, period: str | None = None):
+    """多城市同指标对比；指定 period (month/season/year) 时额外返回城市 × 时间段矩阵，无数据处为 null。"""
+    return await tool_compare_cities(cities, metric, start_date, end_date, period)
 
 
 @mcp.tool()
-async def analysis_extreme_event_stats(city: str, metric: str, threshold: float, comparison: str, start_date: str, end_date: str):
-    """极端事件统计（阈值比较）。"""
-    return await tool_extreme_event_stats(city, metric, threshold, comparison, start_date, end_date)
+async def analysis_extreme_event_stats(
+    city: str,
+    metric: str,
+    threshold: float,
+    comparison: str,
+    start_date: str,
+    end_date: str,
+    min_streak_days: int = 3,
+):
+    """极端事件统计（阈值比较）：满足条件的天数、最长连续天数、持续不少于 min_streak_days 天的过程及起止日期。"""
+    return await tool_extreme_event_stats(city, metric, threshold, comparison, start_date, end_date, min_streak_days)
 
 
 @mcp.tool()
-async def analysis_simple_forecast(city: str, metric: str, horizon_days: int = 7):
-    """简单线性趋势预测。"""
-    return await tool_simple_forecast(city, metric, horizon_days)
+async def analysis_condition_stats(city: str, start_date: str, end_date: str, period: str = "year"):
+    """天气状况统计：按 year/season/month 统计 rain/snow/sunny/cloudy/storm/fog 各类天数，一天可同时计入多类。"""
+    return await tool_condition_stats(city, start_date, end_date, period)
+
+
+@mcp.tool()
+async def analysis_wind_stats(city: str, start_date: str, end_date: str, period: str = "month", min_force: int = 5):
+    """风力统计：按 year/season/month 统计风力（白天/夜间取较大者）≥ min_force 的天数、最大与平均风力，并给出白天风向分布。"""
+    return await tool_wind_stats(city, start_date, end_date, period, min_force)
+
+
+@mcp.tool()
+async def analysis_rolling_stats(city: str, metric: str, start_date: str, end_date: str, windows: list[int] | None = None):
+    """滑动窗口统计：每天的 7/30/365 天（或指定窗口）移动平均、最小值、最大值，一次计算完成。"""
+    return await tool_rolling_stats(city, metric, start_date, end_date, windows)
+
+
+@mcp.tool()
+async def analysis_correlation_matrix(
+    cities: list[str],
+    metric: str,
+    start_date: str,
+    end_date: str,
+    method: str = "pearson",
+    deseasonalize: bool = False,
+):
+    """多城市相关系数矩阵（pearson/spearman），按共同日期对齐；deseasonalize=true 时对去除常年值后的距平计算。"""
+    return await tool_correlation_matrix(cities, metric, start_date, end_date, method, deseasonalize)
+
+
+@mcp.tool()
+async def analysis_cluster_cities(k: int = 3, method: str = "kmeans", cities: list[str] | None = None):
+    """城市气候聚类（kmeans/hierarchical）：特征为 12 个月的最低/最高温常年值、温度标准差和日较差，按数据集版本缓存。"""
+    return await tool_cluster_cities(k, method, cities)
+
+
+@mcp.tool()
+async def analysis_percentiles(
+    city: str,
+    metric: str,
+    start_date: str,
+    end_date: str,
+    percentiles: list[float] | None = None,
+    months: list[int] | None = None,
+):
+    """分位数（0-100，默认 5/25/50/75/95）；months 可限定月份，如 [6,7,8] 表示历年夏季。由月度分位数草图合并得到，误差不超过 0.05℃。"""
+    return await tool_percentiles(city, metric, start_date, end_date, percentiles, months)
+
+
+@mcp.tool()
+async def analysis_anomalies(city: str, metric: str, start_date: str, end_date: str):
+    """距平：每天相对于该城市同日常年值（全部历史、前后 7 天平滑）的偏差及标准化距平。"""
+    return await tool_anomalies(city, metric, start_date, end_date)
+
+
+@mcp.tool()
+async def analysis_simple_forecast(city: str, metric: str, horizon_days: int = 7, method: str = "seasonal"):
+    """温度预测：默认季节模型（趋势 + 年周期谐波 + 残差自回归），method=linear 为近 120 天线性趋势。"""
+    return await tool_simple_forecast(city, metric, horizon_days, method)
+
+
+
+@mcp.tool()
+async def analysis_forecast_all(metrics: list[str] | None = None, horizon_days: int = 7, workers: int | None = None):
+    """批量预测：为所有城市、指标拟合模型（进程池并行）并写入预测表，返回本次运行的汇总。"""
+    return await tool_forecast_all(metrics, horizon_days, workers)
+
+
+@mcp.tool()
+async def analysis_get_forecast(city: str, metric: str):
+    """读取 forecast_all 预先计算的最新一批预测，不在请求时拟合模型。"""
+    return await tool_get_forecast(city, metric)
 
 
 if __name__ == "__main__":
@@ -5,16 +5,39 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-from collections import defaultdict
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import and_, func, select
+import numpy as np
+from sqlalchemy import Integer, and_, cast, delete, extract, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import AsyncSessionLocal
-from app.models.models import WeatherData
+from app.models.models import (
+    DatasetVersion,
+    WeatherCitySummary,
+    WeatherClimatology,
+    WeatherData,
+    WeatherForecast,
+    WeatherMonthlyRollup,
+)
+from app.services.changes import ALL_CITIES
+from app.services.climatology import DAY_SLOTS, day_slot_expr, day_slots
+from app.services.conditions import CONDITION_FLAGS, classify_condition
+from app.services.quantiles import ERROR_BOUND, build_sketch, merge_sketches, sketch_quantiles
+from app.services.rollup import period_aggregate_query, split_months
+from app.services.versions import dataset_versions
+from app.services.weather_cache import CityColumns, weather_cache
+from app.services.wind import WIND_DIRECTIONS, parse_wind
+from mcp_tools.clustering import kmeans, standardize, ward
+from mcp_tools.coalesce import single_flight
 from mcp_tools.data_agent import _CITY_PINYIN
+from mcp_tools.seasonal import LINEAR_POINTS, RECENT_DAYS, SeasonalModel, fit_forecast, linear_forecast, sync_model
 
 
 def _parse_date(value: Optional[str]) -> Optional[date]:
@@ -43,6 +66,10 @@ def _normalize_city_name(city: str) -> str:
 
 
 _VALID_METRIC = {"temp_min", "temp_max"}
+# describe_timeseries multi-metric mode: temp_min, temp_max and the daily range in one pass
+_ALL_METRICS = "all"
+_RANGE_METRIC = "temp_range"
+_PERCENTILES = (("p5", 0.05), ("p25", 0.25), ("median", 0.5), ("p75", 0.75), ("p95", 0.95))
 _VALID_PERIOD = {"month", "season", "year"}
 _COMPARISONS = {
     ">": lambda col, t: col > t,
@@ -62,33 +89,151 @@ _COMPARISONS = {
 }
 
 
+# ----- in-memory (columnar cache) helpers -----
+
+
+def _cached_series(cols: CityColumns, metric: str, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+    """Day indexes (ascending) and float64 values of a metric within [start, end]."""
+    lo, hi = cols.window(start, end)
+    values = cols.metric(metric)[lo:hi]
+    mask = cols.present[lo:hi] & ~np.isnan(values)
+    idx = np.flatnonzero(mask)
+    return idx + lo, values[idx].astype(np.float64)
+
+
+def _describe_values(values: np.ndarray) -> Tuple[int, Optional[float], Optional[float], Optional[float], Optional[float]]:
+    """count/min/max/mean/stddev_samp with SQL semantics (NULL on empty, stddev NULL for n < 2)."""
+    n = int(values.size)
+    if n == 0:
+        return 0, None, None, None, None
+    std = float(values.std(ddof=1)) if n > 1 else None
+    return n, float(values.min()), float(values.max()), float(values.mean()), std
+
+
+def _full_stats(values: np.ndarray) -> Dict[str, Any]:
+    """describe stats plus percentiles; linear interpolation matches SQL percentile_cont."""
+    c, mn, mx, avg, std = _describe_values(values)
+    stats = {"count": c, "min": mn, "max": mx, "mean": avg, "stddev": std}
+    points = np.percentile(values, [q * 100 for _, q in _PERCENTILES]) if c else [None] * len(_PERCENTILES)
+    for (name, _), v in zip(_PERCENTILES, points):
+        stats[name] = float(v) if v is not None else None
+    return stats
+
+
+def _describe_all_cached(cols: CityColumns, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+    lo, hi = cols.window(start, end)
+    present = cols.present[lo:hi]
+    t_min = cols.temp_min[lo:hi].astype(np.float64)
+    t_max = cols.temp_max[lo:hi].astype(np.float64)
+    ok_min = present & ~np.isnan(t_min)
+    ok_max = present & ~np.isnan(t_max)
+    return {
+        "temp_min": _full_stats(t_min[ok_min]),
+        "temp_max": _full_stats(t_max[ok_max]),
+        _RANGE_METRIC: _full_stats((t_max - t_min)[ok_min & ok_max]),
+    }
+
+
+def _period_ids(cols: CityColumns, idx: np.ndarray, period: str) -> np.ndarray:
+    """Bucket id per day index; non-decreasing for ascending idx."""
+    days = np.datetime64(cols.start, "D") + idx
+    years = days.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    if period == "year":
+        ids = years
+    elif period == "month":
+        ids = years * 12 + (months - 1)
+    else:  # season
+        ids = years * 4 + (months - 1) // 3
+    return ids
+
+
+def _period_label(bucket_id: int, period: str) -> str:
+    if period == "year":
+        return f"{bucket_id}"
+    if period == "month":
+        return f"{bucket_id // 12}-{bucket_id % 12 + 1:02d}"
+    return f"{bucket_id // 4}-Q{bucket_id % 4 + 1}"
+
+
+def _group_values(ids: np.ndarray, values: np.ndarray, period: str) -> List[Dict[str, Any]]:
+    """count/min/max/mean per bucket; ids must be sorted so each bucket is one contiguous run."""
+    if values.size == 0:
+        return []
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    counts = np.diff(np.r_[starts, ids.size])
+    sums = np.add.reduceat(values, starts)
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    return [
+        {
+            "period": _period_label(int(ids[s]), period),
+            "count": int(c),
+            "min": float(mn),
+            "max": float(mx),
+            "mean": float(sm / c),
+        }
+        for s, c, sm, mn, mx in zip(starts, counts, sums, mins, maxs)
+    ]
+
+
+# ----- monthly rollup helpers -----
+
+
+async def _aggregate_rows(cities: List[str], metric: str, start: date, end: date, period: Optional[str] = None):
+    """One mergeable aggregate row per (city, bucket), bucketed in SQL over the monthly rollup plus edge days."""
+    query = period_aggregate_query([WeatherData.normalize_city_key(c) for c in cities], metric, start, end, period)
+    if query is None:
+        return []
+    async with await _get_session() as db:
+        return (await db.execute(query)).all()
+
+
+def _merge_aggregates(rows) -> Tuple[int, Optional[float], Optional[float], Optional[float], Optional[float]]:
+    """count/min/max/mean/stddev_samp over aggregate rows (same semantics as _describe_values)."""
+    rows = [r for r in rows if r.count]
+    n = int(sum(r.count for r in rows))
+    if n == 0:
+        return 0, None, None, None, None
+    total = float(sum(r.sum for r in rows))
+    total_sq = float(sum(r.sum_sq for r in rows))
+    mean = total / n
+    std = math.sqrt(max((total_sq - total * mean) / (n - 1), 0.0)) if n > 1 else None
+    return n, float(min(r.min for r in rows)), float(max(r.max for r in rows)), mean, std
+
+
+@single_flight("analysis.describe_timeseries", normalize_city=_normalize_city_name)
 async def tool_describe_timeseries(city: str, metric: str, start_date: str, end_date: str) -> Dict[str, Any]:
-    if metric not in _VALID_METRIC:
-        return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    """Basic stats for one metric, or with metric="all" stats plus percentiles for
+    temp_min, temp_max and temp_range (temp_max - temp_min) in a single scan."""
+    if metric not in _VALID_METRIC and metric != _ALL_METRICS:
+        return {"ok": False, "error": "metric must be temp_min, temp_max or all"}
     city = _normalize_city_name(city)
     start = _parse_date(start_date)
     end = _parse_date(end_date)
     if not (city and start and end):
         return {"ok": False, "error": "city/start_date/end_date required"}
 
-    async with await _get_session() as db:
-        col = getattr(WeatherData, metric)
-        query = (
-            select(
-                func.count(col),
-                func.min(col),
-                func.max(col),
-                func.avg(col),
-                func.stddev_samp(col),
-            )
-            .where(
-                func.lower(WeatherData.city) == func.lower(city.strip()),
-                WeatherData.date >= start,
-                WeatherData.date <= end,
-                col.isnot(None),
-            )
-        )
-        c, mn, mx, avg, std = (await db.execute(query)).one()
+    cols = weather_cache.get(city)
+    if metric == _ALL_METRICS:
+        if cols is not None:
+            metrics = _describe_all_cached(cols, start, end)
+        else:
+            metrics = await _describe_all_from_db(city, start, end)
+        return {
+            "ok": True,
+            "city": city,
+            "metric": metric,
+            "start_date": start_date,
+            "end_date": end_date,
+            "count": metrics["temp_max"]["count"],
+            "metrics": metrics,
+        }
+
+    if cols is not None:
+        c, mn, mx, avg, std = _describe_values(_cached_series(cols, metric, start, end)[1])
+    else:
+        c, mn, mx, avg, std = await _describe_from_db(city, metric, start, end)
 
     return {
         "ok": True,
@@ -104,6 +249,56 @@ async def tool_describe_timeseries(city: str, metric: str, start_date: str, end_
     }
 
 
+async def _describe_from_db(city: str, metric: str, start: date, end: date):
+    return _merge_aggregates(await _aggregate_rows([city], metric, start, end))
+
+
+async def _describe_all_from_db(city: str, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+    """All three metrics in one statement; each percentile set is one ordered-set aggregate (one sort)."""
+    exprs = {
+        "temp_min": WeatherData.temp_min,
+        "temp_max": WeatherData.temp_max,
+        _RANGE_METRIC: WeatherData.temp_max - WeatherData.temp_min,
+    }
+    fractions = array([q for _, q in _PERCENTILES])
+    columns = []
+    for expr in exprs.values():
+        columns += [
+            func.count(expr),
+            func.min(expr),
+            func.max(expr),
+            func.avg(expr),
+            func.stddev_samp(expr),
+            func.percentile_cont(fractions).within_group(expr),
+        ]
+    async with await _get_session() as db:
+        row = (
+            await db.execute(
+                select(*columns).where(
+                    WeatherData.city_key == WeatherData.normalize_city_key(city),
+                    WeatherData.date >= start,
+                    WeatherData.date <= end,
+                )
+            )
+        ).one()
+
+    metrics = {}
+    for i, name in enumerate(exprs):
+        c, mn, mx, avg, std, points = row[i * 6:(i + 1) * 6]
+        stats = {
+            "count": c or 0,
+            "min": float(mn) if mn is not None else None,
+            "max": float(mx) if mx is not None else None,
+            "mean": float(avg) if avg is not None else None,
+            "stddev": float(std) if std is not None else None,
+        }
+        for (label, _), v in zip(_PERCENTILES, points or [None] * len(_PERCENTILES)):
+            stats[label] = float(v) if v is not None else None
+        metrics[name] = stats
+    return metrics
+
+
+@single_flight("analysis.group_by_period", normalize_city=_normalize_city_name)
 async def tool_group_by_period(city: str, metric: str, period: str, start_date: str, end_date: str) -> Dict[str, Any]:
     if metric not in _VALID_METRIC:
         return {"ok": False, "error": "metric must be temp_min or temp_max"}
@@ -115,46 +310,12 @@ async def tool_group_by_period(city: str, metric: str, period: str, start_date:
     if not (city and start and end):
         return {"ok": False, "error": "city/start_date/end_date required"}
 
-    async with await _get_session() as db:
-        col = getattr(WeatherData, metric)
-        rows = (
-            await db.execute(
-                select(WeatherData.date, col)
-                .where(
-                    func.lower(WeatherData.city) == func.lower(city.strip()),
-                    WeatherData.date >= start,
-                    WeatherData.date <= end,
-                    col.isnot(None),
-                )
-                .order_by(WeatherData.date)
-            )
-        ).all()
-
-    buckets: Dict[str, List[float]] = defaultdict(list)
-    for d, v in rows:
-        if v is None:
-            continue
-        if period == "year":
-            key = f"{d.year}"
-        elif period == "month":
-            key = f"{d.year}-{d.month:02d}"
-        else:  # season
-            season = (d.month - 1) // 3 + 1
-            key = f"{d.year}-Q{season}"
-        buckets[key].append(float(v))
-
-    series = []
-    for k in sorted(buckets.keys()):
-        vals = buckets[k]
-        series.append(
-            {
-                "period": k,
-                "count": len(vals),
-                "min": min(vals),
-                "max": max(vals),
-                "mean": sum(vals) / len(vals) if vals else None,
-            }
-        )
+    cols = weather_cache.get(city)
+    if cols is not None:
+        idx, values = _cached_series(cols, metric, start, end)
+        series = _group_values(_period_ids(cols, idx, period), values, period)
+    else:
+        series = await _group_from_db(city, metric, period, start, end)
 
     return {
         "ok": True,
@@ -167,9 +328,74 @@ async def tool_group_by_period(city: str, metric: str, period: str, start_date:
     }
 
 
-async def tool_compare_cities(cities: List[str], metric: str, start_date: str, end_date: str) -> Dict[str, Any]:
+async def _group_from_db(city: str, metric: str, period: str, start: date, end: date) -> List[Dict[str, Any]]:
+    # rows arrive one per bucket; several only if the city is stored under differently-cased names
+    buckets: Dict[int, list] = {}
+    for r in await _aggregate_rows([city], metric, start, end, period):
+        buckets.setdefault(int(r.bucket), []).append(r)
+
+    series = []
+    for bucket_id in sorted(buckets):
+        c, mn, mx, avg, _ = _merge_aggregates(buckets[bucket_id])
+        series.append({"period": _period_label(bucket_id, period), "count": c, "min": mn, "max": mx, "mean": avg})
+    return series
+
+
+def _date_bucket(d: date, period: str) -> int:
+    """Bucket id of a date, same numbering as _period_ids and the SQL rollup buckets."""
+    if period == "year":
+        return d.year
+    if period == "month":
+        return d.year * 12 + d.month - 1
+    return d.year * 4 + (d.month - 1) // 3
+
+
+def _compare_matrix(
+    city_norm: List[str],
+    names: Dict[str, str],
+    cells: Dict[str, Dict[str, Dict[str, Any]]],
+    period: str,
+    start: date,
+    end: date,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Dense city x period matrix; buckets without data are explicit nulls (count 0)."""
+    periods = [_period_label(b, period) for b in range(_date_bucket(start, period), _date_bucket(end, period) + 1)]
+    matrix = []
+    seen = set()
+    for city in city_norm:
+        key = WeatherData.normalize_city_key(city)
+        if key in seen:
+            continue
+        seen.add(key)
+        row = cells.get(key, {})
+        empty = {"count": 0, "min": None, "max": None, "mean": None}
+        points = [row.get(label, empty) for label in periods]
+        matrix.append(
+            {
+                "city": names.get(key, city),
+                "count": [pt["count"] for pt in points],
+                "min": [pt["min"] for pt in points],
+                "max": [pt["max"] for pt in points],
+                "mean": [pt["mean"] for pt in points],
+            }
+        )
+    return periods, matrix
+
+
+@single_flight("analysis.compare_cities", normalize_city=_normalize_city_name)
+async def tool_compare_cities(
+    cities: List[str],
+    metric: str,
+    start_date: str,
+    end_date: str,
+    period: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Per-city aggregates over the range; with period (month|season|year) also a
+    dense city x period matrix computed from one GROUP BY (city, bucket) query."""
     if metric not in _VALID_METRIC:
         return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    if period is not None and period not in _VALID_PERIOD:
+        return {"ok": False, "error": "period must be month|season|year"}
     if not cities:
         return {"ok": False, "error": "cities required"}
     cities = [_normalize_city_name(c) for c in cities if c]
@@ -179,123 +405,1082 @@ async def tool_compare_cities(cities: List[str], metric: str, start_date: str, e
         return {"ok": False, "error": "start_date/end_date required"}
 
     city_norm = [c.strip() for c in cities if c and c.strip()]
+    cached = [weather_cache.get(c) for c in city_norm]
+    # city key -> {period label -> stats}
+    cells: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    if cached and all(cols is not None for cols in cached):
+        results = []
+        seen = set()
+        for cols in cached:
+            if cols.city in seen:
+                continue
+            seen.add(cols.city)
+            idx, values = _cached_series(cols, metric, start, end)
+            c, mn, mx, avg, _ = _describe_values(values)
+            if c:
+                results.append({"city": cols.city, "count": c, "min": mn, "max": mx, "mean": avg})
+            if period:
+                series = _group_values(_period_ids(cols, idx, period), values, period)
+                cells[WeatherData.normalize_city_key(cols.city)] = {pt["period"]: pt for pt in series}
+    else:
+        results, cells = await _compare_from_db(city_norm, metric, start, end, period)
+
+    result = {
+        "ok": True,
+        "metric": metric,
+        "start_date": start_date,
+        "end_date": end_date,
+        "results": results,
+    }
+    if period:
+        names = {WeatherData.normalize_city_key(r["city"]): r["city"] for r in results}
+        periods, matrix = _compare_matrix(city_norm, names, cells, period, start, end)
+        result.update({"period": period, "periods": periods, "matrix": matrix})
+    return result
+
+
+async def _compare_from_db(city_norm: List[str], metric: str, start: date, end: date, period: Optional[str] = None):
+    """Whole-range results and, with a period, per-bucket cells; both from one query."""
+    by_city: Dict[str, list] = {}
+    cells: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for r in await _aggregate_rows(city_norm, metric, start, end, period):
+        by_city.setdefault(r.city, []).append(r)
+        if period:
+            c, mn, mx, avg, _ = _merge_aggregates([r])
+            label = _period_label(int(r.bucket), period)
+            cells.setdefault(WeatherData.normalize_city_key(r.city), {})[label] = {
+                "period": label, "count": c, "min": mn, "max": mx, "mean": avg,
+            }
+
+    # results follow the requested city order, like the cached path
+    order = {}
+    for city in city_norm:
+        order.setdefault(WeatherData.normalize_city_key(city), len(order))
+    results = []
+    for city in sorted(by_city, key=lambda c: order.get(WeatherData.normalize_city_key(c), len(order))):
+        c, mn, mx, avg, _ = _merge_aggregates(by_city[city])
+        results.append({"city": city, "count": c, "min": mn, "max": mx, "mean": avg})
+    return results, cells
+
+
+def _streaks_from_days(hit_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start/end day indexes of each run of consecutive days in sorted hit_idx."""
+    if hit_idx.size == 0:
+        return hit_idx, hit_idx
+    breaks = np.flatnonzero(np.diff(hit_idx) != 1)
+    starts = hit_idx[np.r_[0, breaks + 1]]
+    ends = hit_idx[np.r_[breaks, hit_idx.size - 1]]
+    return starts, ends
+
+
+def _extreme_from_cache(cols: CityColumns, metric: str, threshold: float, comparison: str, start: date, end: date, min_streak_days: int):
+    idx, values = _cached_series(cols, metric, start, end)
+    # the comparison lambdas work element-wise on NumPy arrays as well
+    hit_idx = idx[_COMPARISONS[comparison](values, threshold)]
+    starts, ends = _streaks_from_days(hit_idx)
+    lengths = ends - starts + 1
+    keep = lengths >= min_streak_days
+    spells = [
+        {"start": cols.date_at(s).isoformat(), "end": cols.date_at(e).isoformat(), "days": int(n)}
+        for s, e, n in zip(starts[keep], ends[keep], lengths[keep])
+    ]
+    longest = int(lengths.max()) if lengths.size else 0
+    return int(hit_idx.size), longest, spells
+
+
+async def _extreme_from_db(city: str, metric: str, threshold: float, comparison: str, start: date, end: date, min_streak_days: int):
+    """Gaps-and-islands in one statement: date - row_number() is constant within a run of consecutive days."""
+    col = getattr(WeatherData, metric)
+    hits = (
+        select(
+            WeatherData.date.label("date"),
+            (WeatherData.date - cast(func.row_number().over(order_by=WeatherData.date), Integer)).label("grp"),
+        )
+        .where(
+            WeatherData.city_key == WeatherData.normalize_city_key(city),
+            WeatherData.date >= start,
+            WeatherData.date <= end,
+            col.isnot(None),
+            _COMPARISONS[comparison](col, threshold),
+        )
+        .subquery()
+    )
+    days = func.count()
+    islands = (
+        select(
+            func.min(hits.c.date).label("start"),
+            func.max(hits.c.date).label("end"),
+            days.label("days"),
+            func.sum(days).over().label("total"),
+            func.max(days).over().label("longest"),
+            func.row_number().over(order_by=func.min(hits.c.date)).label("rn"),
+        )
+        .group_by(hits.c.grp)
+        .subquery()
+    )
+    # qualifying spells, plus the first island so the totals survive when none qualify
+    query = (
+        select(islands)
+        .where(or_(islands.c.days >= min_streak_days, islands.c.rn == 1))
+        .order_by(islands.c.start)
+    )
     async with await _get_session() as db:
-        col = getattr(WeatherData, metric)
-        query = (
-            select(
-                WeatherData.city,
-                func.count(col),
-                func.min(col),
-                func.max(col),
-                func.avg(col),
-            )
-            .where(
-                func.lower(WeatherData.city).in_([func.lower(c) for c in city_norm]),
-                WeatherData.date >= start,
-                WeatherData.date <= end,
-                col.isnot(None),
-            )
-            .group_by(WeatherData.city)
+        rows = (await db.execute(query)).all()
+
+    if not rows:
+        return 0, 0, []
+    spells = [
+        {"start": r.start.isoformat(), "end": r.end.isoformat(), "days": int(r.days)}
+        for r in rows
+        if r.days >= min_streak_days
+    ]
+    return int(rows[0].total), int(rows[0].longest), spells
+
+
+@single_flight("analysis.extreme_event_stats", normalize_city=_normalize_city_name)
+async def tool_extreme_event_stats(
+    city: str,
+    metric: str,
+    threshold: float,
+    comparison: str,
+    start_date: str,
+    end_date: str,
+    min_streak_days: int = 3,
+) -> Dict[str, Any]:
+    """Days matching the threshold, plus streaks: the longest run of consecutive
+    matching days and every spell of at least min_streak_days days."""
+    if metric not in _VALID_METRIC:
+        return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    if comparison not in _COMPARISONS:
+        return {"ok": False, "error": "comparison must be one of >,<,>=,<="}
+    city = _normalize_city_name(city)
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    if not (city and start and end):
+        return {"ok": False, "error": "city/start_date/end_date required"}
+    min_streak_days = max(1, int(min_streak_days or 1))
+
+    cols = weather_cache.get(city)
+    if cols is not None:
+        count, longest, spells = _extreme_from_cache(cols, metric, threshold, comparison, start, end, min_streak_days)
+    else:
+        count, longest, spells = await _extreme_from_db(city, metric, threshold, comparison, start, end, min_streak_days)
+
+    return {
+        "ok": True,
+        "city": city,
+        "metric": metric,
+        "comparison": comparison,
+        "threshold": threshold,
+        "start_date": start_date,
+        "end_date": end_date,
+        "event_days": count,
+        "longest_streak": longest,
+        "min_streak_days": min_streak_days,
+        "spell_count": len(spells),
+        "spells": spells,
+    }
+
+
+# flags per weather_cache condition code, extended as the shared dictionary grows
+_CONDITION_LUT: List[int] = []
+
+
+def _condition_counts_cached(cols: CityColumns, start: date, end: date, period: str) -> List[Dict[str, Any]]:
+    lo, hi = cols.window(start, end)
+    idx = np.flatnonzero(cols.present[lo:hi]) + lo
+    if idx.size == 0:
+        return []
+    values = weather_cache.conditions.values
+    _CONDITION_LUT.extend(classify_condition(v) for v in values[len(_CONDITION_LUT):])
+    # trailing 0 so that code -1 (no condition) maps to no flags
+    flags = np.array(_CONDITION_LUT + [0], dtype=np.int16)[cols.condition[idx]]
+    ids = _period_ids(cols, idx, period)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    counts = np.diff(np.r_[starts, ids.size])
+    hits = {name: np.add.reduceat((flags & bit) != 0, starts) for name, bit in CONDITION_FLAGS.items()}
+    return [
+        {"period": _period_label(int(ids[s]), period), "days": int(c), **{name: int(h[i]) for name, h in hits.items()}}
+        for i, (s, c) in enumerate(zip(starts, counts))
+    ]
+
+
+def _sql_period_bucket(period: str):
+    """Bucket id of WeatherData.date in SQL, same numbering as _period_ids."""
+    year = cast(extract("year", WeatherData.date), Integer)
+    month = cast(extract("month", WeatherData.date), Integer)
+    if period == "year":
+        bucket = year
+    elif period == "month":
+        bucket = year * 12 + month - 1
+    else:
+        bucket = year * 4 + (month - 1) // 3
+    return bucket.label("bucket")
+
+
+def _city_range_filter(city: str, start: date, end: date):
+    return (
+        WeatherData.city_key == WeatherData.normalize_city_key(city),
+        WeatherData.date >= start,
+        WeatherData.date <= end,
+    )
+
+
+async def _condition_counts_db(city: str, start: date, end: date, period: str) -> List[Dict[str, Any]]:
+    # the flag tests are integer predicates evaluated on the rows of the idx_city_key_date
+    # scan, no LIKE over weather_condition
+    bucket = _sql_period_bucket(period)
+    query = (
+        select(
+            bucket,
+            func.count().label("days"),
+            *(
+                func.count().filter(WeatherData.condition_flags.op("&")(bit) != 0).label(name)
+                for name, bit in CONDITION_FLAGS.items()
+            ),
         )
+        .where(*_city_range_filter(city, start, end))
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    async with await _get_session() as db:
         rows = (await db.execute(query)).all()
+    return [
+        {"period": _period_label(int(r.bucket), period), "days": r.days, **{name: getattr(r, name) for name in CONDITION_FLAGS}}
+        for r in rows
+    ]
 
-    results = [
+
+@single_flight("analysis.condition_stats", normalize_city=_normalize_city_name)
+async def tool_condition_stats(city: str, start_date: str, end_date: str, period: str = "year") -> Dict[str, Any]:
+    """Days per weather category (rain/snow/sunny/cloudy/storm/fog) per period, from the
+    condition flags parsed at write time. A day can count towards several categories."""
+    if period not in _VALID_PERIOD:
+        return {"ok": False, "error": "period must be month|season|year"}
+    city = _normalize_city_name(city)
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    if not (city and start and end):
+        return {"ok": False, "error": "city/start_date/end_date required"}
+
+    cols = weather_cache.get(city)
+    if cols is not None:
+        series = _condition_counts_cached(cols, start, end, period)
+    else:
+        series = await _condition_counts_db(city, start, end, period)
+
+    totals = {key: sum(p[key] for p in series) for key in ("days", *CONDITION_FLAGS)}
+    return {
+        "ok": True,
+        "city": city,
+        "period": period,
+        "start_date": start_date,
+        "end_date": end_date,
+        "categories": list(CONDITION_FLAGS),
+        "totals": totals,
+        "series": series,
+    }
+
+
+_DEFAULT_MIN_FORCE = 5
+_MAX_FORCE = 17
+# (direction_day, force_day, force_night) per weather_cache wind code, extended as the dictionary grows
+_WIND_LUT: List[Tuple[int, float, float]] = []
+
+
+def _wind_buckets(ids, days, windy, max_force, force_sum, force_n, directions) -> List[Dict[str, Any]]:
+    """Internal per-bucket rows shared by the cache and SQL paths."""
+    return [
         {
-            "city": r[0],
-            "count": r[1],
-            "min": r[2],
-            "max": r[3],
-            "mean": float(r[4]) if r[4] is not None else None,
+            "bucket": int(b), "days": int(d), "windy_days": int(w),
+            "max_force": None if mx is None else int(mx),
+            "force_sum": float(s or 0), "force_n": int(n), "directions": [int(c) for c in dirs],
         }
-        for r in rows
+        for b, d, w, mx, s, n, dirs in zip(ids, days, windy, max_force, force_sum, force_n, directions)
     ]
+
+
+def _wind_from_cache(cols: CityColumns, start: date, end: date, period: str, min_force: int) -> List[Dict[str, Any]]:
+    lo, hi = cols.window(start, end)
+    idx = np.flatnonzero(cols.present[lo:hi]) + lo
+    if idx.size == 0:
+        return []
+    values = weather_cache.winds.values
+    for text in values[len(_WIND_LUT):]:
+        dir_day, force_day, _, force_night = parse_wind(text)
+        _WIND_LUT.append((
+            -1 if dir_day is None else dir_day,
+            np.nan if force_day is None else force_day,
+            np.nan if force_night is None else force_night,
+        ))
+    # trailing entry so that code -1 (no wind_info) maps to unknown
+    lut = np.array(_WIND_LUT + [(-1, np.nan, np.nan)], dtype=np.float64)[cols.wind[idx]]
+    direction = lut[:, 0].astype(np.int64)
+    # daily force: the stronger of day and night, like greatest() in SQL
+    with np.errstate(invalid="ignore"):
+        force = np.fmax(lut[:, 1], lut[:, 2])
+    known = ~np.isnan(force)
+
+    ids = _period_ids(cols, idx, period)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    days = np.diff(np.r_[starts, ids.size])
+    filled = np.where(known, force, -np.inf)
+    max_force = [None if np.isinf(v) else v for v in np.maximum.reduceat(filled, starts)]
+    directions = [
+        np.add.reduceat(direction == code, starts) for code in range(len(WIND_DIRECTIONS))
+    ]
+    return _wind_buckets(
+        ids[starts],
+        days,
+        np.add.reduceat(known & (filled >= min_force), starts),
+        max_force,
+        np.add.reduceat(np.where(known, force, 0.0), starts),
+        np.add.reduceat(known, starts),
+        zip(*directions),
+    )
+
+
+async def _wind_from_db(city: str, start: date, end: date, period: str, min_force: int) -> List[Dict[str, Any]]:
+    # aggregated on the parsed smallint columns inside the idx_city_key_date scan
+    bucket = _sql_period_bucket(period)
+    force = func.greatest(WeatherData.wind_force_day, WeatherData.wind_force_night)
+    query = (
+        select(
+            bucket,
+            func.count(),
+            func.count().filter(force >= min_force),
+            func.max(force),
+            func.sum(force),
+            func.count(force),
+            *(func.count().filter(WeatherData.wind_dir_day == code) for code in range(len(WIND_DIRECTIONS))),
+        )
+        .where(*_city_range_filter(city, start, end))
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    async with await _get_session() as db:
+        rows = (await db.execute(query)).all()
+    if not rows:
+        return []
+    ids, days, windy, max_force, force_sum, force_n, *directions = zip(*rows)
+    return _wind_buckets(ids, days, windy, max_force, force_sum, force_n, zip(*directions))
+
+
+@single_flight("analysis.wind_stats", normalize_city=_normalize_city_name)
+async def tool_wind_stats(
+    city: str,
+    start_date: str,
+    end_date: str,
+    period: str = "month",
+    min_force: int = _DEFAULT_MIN_FORCE,
+) -> Dict[str, Any]:
+    """Wind per period from the direction/force columns parsed at write time: days with force
+    >= min_force (the stronger of day and night), max and mean daily force, and a daytime
+    direction count over the whole range."""
+    if period not in _VALID_PERIOD:
+        return {"ok": False, "error": "period must be month|season|year"}
+    city = _normalize_city_name(city)
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    if not (city and start and end):
+        return {"ok": False, "error": "city/start_date/end_date required"}
+    min_force = int(min_force)
+    if not 0 <= min_force <= _MAX_FORCE:
+        return {"ok": False, "error": f"min_force must be between 0 and {_MAX_FORCE}"}
+
+    cols = weather_cache.get(city)
+    if cols is not None:
+        buckets = _wind_from_cache(cols, start, end, period, min_force)
+    else:
+        buckets = await _wind_from_db(city, start, end, period, min_force)
+
+    def summary(rows) -> Dict[str, Any]:
+        n = sum(r["force_n"] for r in rows)
+        forces = [r["max_force"] for r in rows if r["max_force"] is not None]
+        return {
+            "days": sum(r["days"] for r in rows),
+            "windy_days": sum(r["windy_days"] for r in rows),
+            "max_force": max(forces) if forces else None,
+            "mean_force": sum(r["force_sum"] for r in rows) / n if n else None,
+        }
+
+    series = [{"period": _period_label(r["bucket"], period), **summary([r])} for r in buckets]
+    directions = [sum(counts) for counts in zip(*(r["directions"] for r in buckets))] or [0] * len(WIND_DIRECTIONS)
     return {
         "ok": True,
-        "metric": metric,
+        "city": city,
+        "period": period,
         "start_date": start_date,
         "end_date": end_date,
-        "results": results,
+        "min_force": min_force,
+        "totals": {**summary(buckets), "directions": dict(zip(WIND_DIRECTIONS, directions))},
+        "series": series,
     }
 
 
-async def tool_extreme_event_stats(city: str, metric: str, threshold: float, comparison: str, start_date: str, end_date: str) -> Dict[str, Any]:
+_ROLLING_WINDOWS = (7, 30, 365)
+_MAX_ROLLING_WINDOW = 3660
+_MAX_ROLLING_COUNT = 6
+# day numbers for window frames: RANGE offsets need a numeric ordering column on Postgres
+_EPOCH = date(1970, 1, 1)
+
+
+def _window_extreme(values: np.ndarray, first: np.ndarray, last: np.ndarray, op) -> np.ndarray:
+    """op (np.minimum / np.maximum) over values[first[i]:last[i] + 1] for every i, via a
+    sparse table of power-of-two spans: O(n log w) memory instead of n * w."""
+    length = last - first + 1
+    table = [values]
+    while (2 << (len(table) - 1)) <= length.max():
+        prev, step = table[-1], 1 << (len(table) - 1)
+        table.append(op(prev[:-step], prev[step:]))
+    level = np.floor(np.log2(length)).astype(np.int64)
+    out = np.empty(length.size)
+    for k in np.unique(level):
+        sel = level == k
+        out[sel] = op(table[k][first[sel]], table[k][last[sel] - (1 << k) + 1])
+    return out
+
+
+def _rolling_from_cache(cols: CityColumns, metric: str, start: date, end: date, windows: List[int]) -> List[Dict[str, Any]]:
+    """Calendar-day windows [d - w + 1, d] on the dense day grid; missing days are skipped."""
+    out_lo, hi = cols.window(start, end)
+    lo = cols.window(start - timedelta(days=max(windows) - 1), end)[0]
+    values = cols.metric(metric)[lo:hi].astype(np.float64)
+    ok = cols.present[lo:hi] & ~np.isnan(values)
+    rows = np.flatnonzero(ok[out_lo - lo:]) + (out_lo - lo)
+    if not rows.size:
+        return []
+
+    filled = np.where(ok, values, 0.0)
+    sums = np.concatenate(([0.0], np.cumsum(filled)))
+    counts = np.concatenate(([0], np.cumsum(ok)))
+    items = [{"date": cols.date_at(lo + int(i)).isoformat(), metric: float(values[i])} for i in rows]
+    for w in windows:
+        first = np.maximum(rows - w + 1, 0)
+        mean = (sums[rows + 1] - sums[first]) / (counts[rows + 1] - counts[first])
+        lows = _window_extreme(np.where(ok, values, np.inf), first, rows, np.minimum)
+        highs = _window_extreme(np.where(ok, values, -np.inf), first, rows, np.maximum)
+        for item, m, mn, mx in zip(items, mean, lows, highs):
+            item[f"mean_{w}"] = float(m)
+            item[f"min_{w}"] = float(mn)
+            item[f"max_{w}"] = float(mx)
+    return items
+
+
+async def _rolling_from_db(city: str, metric: str, start: date, end: date, windows: List[int]) -> List[Dict[str, Any]]:
+    """Same windows as RANGE frames over the day number, in one query; the inner scan
+    starts max(windows) - 1 days early so the first output days see full windows."""
+    col = getattr(WeatherData, metric)
+    day = WeatherData.date - _EPOCH
+    columns = [WeatherData.date.label("date"), col.label("value")]
+    for w in windows:
+        frame = {"order_by": day, "range_": (-(w - 1), 0)}
+        columns += [
+            func.avg(col).over(**frame).label(f"mean_{w}"),
+            func.min(col).over(**frame).label(f"min_{w}"),
+            func.max(col).over(**frame).label(f"max_{w}"),
+        ]
+    inner = (
+        select(*columns)
+        .where(
+            WeatherData.city_key == WeatherData.normalize_city_key(city),
+            col.isnot(None),
+            WeatherData.date >= start - timedelta(days=max(windows) - 1),
+            WeatherData.date <= end,
+        )
+        .subquery()
+    )
+    async with await _get_session() as db:
+        rows = (await db.execute(select(inner).where(inner.c.date >= start).order_by(inner.c.date))).mappings().all()
+    items = []
+    for row in rows:
+        item = {"date": row["date"].isoformat(), metric: float(row["value"])}
+        for w in windows:
+            for stat in ("mean", "min", "max"):
+                item[f"{stat}_{w}"] = float(row[f"{stat}_{w}"])
+        items.append(item)
+    return items
+
+
+@single_flight("analysis.rolling_stats", normalize_city=_normalize_city_name)
+async def tool_rolling_stats(
+    city: str, metric: str, start_date: str, end_date: str, windows: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    """Moving mean/min/max over calendar-day windows (default 7/30/365) for every day in
+    range, computed in one pass. Windows ending before the first record are partial."""
     if metric not in _VALID_METRIC:
         return {"ok": False, "error": "metric must be temp_min or temp_max"}
-    if comparison not in _COMPARISONS:
-        return {"ok": False, "error": "comparison must be one of >,<,>=,<="}
+    windows = sorted({int(w) for w in windows}) if windows else list(_ROLLING_WINDOWS)
+    if len(windows) > _MAX_ROLLING_COUNT or not all(1 <= w <= _MAX_ROLLING_WINDOW for w in windows):
+        return {"ok": False, "error": f"windows must be at most {_MAX_ROLLING_COUNT} values in 1..{_MAX_ROLLING_WINDOW} days"}
     city = _normalize_city_name(city)
     start = _parse_date(start_date)
     end = _parse_date(end_date)
     if not (city and start and end):
         return {"ok": False, "error": "city/start_date/end_date required"}
 
+    cols = weather_cache.get(city)
+    if cols is not None:
+        items = _rolling_from_cache(cols, metric, start, end, windows)
+    else:
+        items = await _rolling_from_db(city, metric, start, end, windows)
+
+    return {
+        "ok": True,
+        "city": city,
+        "metric": metric,
+        "start_date": start_date,
+        "end_date": end_date,
+        "windows": windows,
+        "count": len(items),
+        "items": items,
+    }
+
+
+_CORRELATION_METHODS = {"pearson", "spearman"}
+_MAX_CORRELATION_CITIES = 50
+
+
+def _average_ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks 1..n with ties sharing their average rank (as Spearman's rho requires)."""
+    order = np.argsort(values, kind="mergesort")
+    ordered = values[order]
+    first = np.concatenate(([True], ordered[1:] != ordered[:-1]))
+    group = np.cumsum(first) - 1
+    bounds = np.concatenate((np.flatnonzero(first), [values.size]))
+    ranks = np.empty(values.size)
+    ranks[order] = (bounds[group] + bounds[group + 1] + 1) / 2.0
+    return ranks
+
+
+async def _correlation_grid(keys: List[str], metric: str, start: date, end: date, deseasonalize: bool) -> np.ndarray:
+    """(days x cities) float64 grid on the shared axis start..end, NaN where a city has no
+    value; with deseasonalize the climatology normal of each day is subtracted. Cities in the
+    columnar cache are copied from it, the rest come from one query (joined to the normals)."""
+    n_days = (end - start).days + 1
+    grid = np.full((n_days, len(keys)), np.nan)
+    axis = np.datetime64(start, "D") + np.arange(n_days)
     col = getattr(WeatherData, metric)
-    cond = _COMPARISONS[comparison](col, threshold)
+    clim = WeatherClimatology
+
+    missing = []
+    for j, key in enumerate(keys):
+        cols = weather_cache.get(key)
+        if cols is None:
+            missing.append(key)
+            continue
+        idx, values = _cached_series(cols, metric, start, end)
+        grid[(cols.start - start).days + idx, j] = values
+
+    async with await _get_session() as db:
+        if missing:
+            columns = [WeatherData.city_key, WeatherData.date, col]
+            query = select(*columns).where(
+                WeatherData.city_key.in_(missing), col.isnot(None), WeatherData.date >= start, WeatherData.date <= end
+            )
+            if deseasonalize:
+                query = query.add_columns(clim.mean).outerjoin(
+                    clim,
+                    and_(clim.city == WeatherData.city, clim.metric == metric, clim.day == day_slot_expr(WeatherData.date)),
+                )
+            rows = (await db.execute(query)).all()
+            if rows:
+                position = {key: j for j, key in enumerate(keys)}
+                fields = list(zip(*rows))
+                row_idx = (np.array(fields[1], dtype="datetime64[D]") - axis[0]).astype(np.int64)
+                col_idx = np.array([position[k] for k in fields[0]])
+                values = np.array(fields[2], dtype=np.float64)
+                if deseasonalize:
+                    values = values - np.array([np.nan if m is None else m for m in fields[3]], dtype=np.float64)
+                grid[row_idx, col_idx] = values
+
+        cached = [j for j, key in enumerate(keys) if key not in missing]
+        if deseasonalize and cached:
+            rows = (
+                await db.execute(
+                    select(func.lower(clim.city), clim.day, clim.mean).where(
+                        func.lower(clim.city).in_([keys[j] for j in cached]), clim.metric == metric
+                    )
+                )
+            ).all()
+            normals = np.full((len(keys), DAY_SLOTS + 1), np.nan)
+            for key, day, mean in rows:
+                normals[keys.index(key), day] = mean
+            slots = day_slots(axis)
+            for j in cached:
+                grid[:, j] -= normals[j, slots]
+    return grid
+
+
+@single_flight("analysis.correlation_matrix", normalize_city=_normalize_city_name)
+async def tool_correlation_matrix(
+    cities: List[str],
+    metric: str,
+    start_date: str,
+    end_date: str,
+    method: str = "pearson",
+    deseasonalize: bool = False,
+) -> Dict[str, Any]:
+    """Pearson or Spearman correlation matrix of several cities' daily series.
+
+    Series are aligned on a shared date axis and only days on which every city has a
+    value are used (aligned_days). deseasonalize=True correlates departures from each
+    city's day-of-year normal (weather_climatology) instead of raw values, so the shared
+    annual cycle does not dominate.
+    """
+    if metric not in _VALID_METRIC:
+        return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    if method not in _CORRELATION_METHODS:
+        return {"ok": False, "error": "method must be pearson or spearman"}
+    city_norm = list(dict.fromkeys(_normalize_city_name(c) for c in cities or [] if c))
+    if len(city_norm) < 2 or len(city_norm) > _MAX_CORRELATION_CITIES:
+        return {"ok": False, "error": f"cities must list 2..{_MAX_CORRELATION_CITIES} distinct cities"}
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    if not (start and end) or start > end:
+        return {"ok": False, "error": "start_date/end_date required"}
+
+    keys = [WeatherData.normalize_city_key(c) for c in city_norm]
+    grid = await _correlation_grid(keys, metric, start, end, deseasonalize)
+    aligned = grid[~np.isnan(grid).any(axis=1)]
+
+    matrix: List[List[Optional[float]]] = [[None] * len(keys) for _ in keys]
+    if aligned.shape[0] >= 2:
+        if method == "spearman":
+            aligned = np.column_stack([_average_ranks(aligned[:, j]) for j in range(aligned.shape[1])])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = np.corrcoef(aligned, rowvar=False)
+        matrix = [[None if np.isnan(v) else round(float(v), 6) for v in row] for row in corr]
+
+    return {
+        "ok": True,
+        "cities": city_norm,
+        "metric": metric,
+        "method": method,
+        "deseasonalized": bool(deseasonalize),
+        "start_date": start_date,
+        "end_date": end_date,
+        "aligned_days": int(aligned.shape[0]),
+        "matrix": matrix,
+    }
+
+
+_CLUSTER_METHODS = {"kmeans", "hierarchical"}
+_CLUSTER_METRICS = ("temp_min", "temp_max")
+_MAX_CLUSTERS = 10
+# per-city climate features and clustering results, valid for one global dataset version
+_CLUSTER_CACHE: Dict[str, Any] = {"version": None, "features": None, "results": {}}
+
+
+async def _global_version() -> int:
+    """Global dataset version from the registry, or read directly when it is not loaded (CLI / stdio servers)."""
+    if dataset_versions.loaded:
+        return dataset_versions.global_version
+    async with await _get_session() as db:
+        version = (
+            await db.execute(select(DatasetVersion.version).where(DatasetVersion.scope == ALL_CITIES))
+        ).scalar_one_or_none()
+    return version or 0
+
+
+async def _climate_features() -> Tuple[List[str], np.ndarray]:
+    """(cities, matrix) with 12 monthly normals per metric, each metric's overall stddev and the
+    mean diurnal range, from one grouped query over the monthly rollup. Cities missing any
+    calendar month are left out."""
+    r = WeatherMonthlyRollup
+    query = select(
+        r.city, r.month, r.metric, func.sum(r.count), func.sum(r.sum), func.sum(r.sum_sq)
+    ).group_by(r.city, r.month, r.metric)
+    async with await _get_session() as db:
+        rows = (await db.execute(query)).all()
+
+    agg: Dict[str, np.ndarray] = {}
+    metric_pos = {m: i for i, m in enumerate(_CLUSTER_METRICS)}
+    for city, month, metric, n, total, total_sq in rows:
+        if metric not in metric_pos:
+            continue
+        grid = agg.setdefault(city, np.zeros((len(_CLUSTER_METRICS), 12, 3)))
+        grid[metric_pos[metric], month - 1] = (n, total, total_sq)
+
+    cities, features = [], []
+    for city in sorted(agg):
+        grid = agg[city]
+        n, total, total_sq = grid[..., 0], grid[..., 1], grid[..., 2]
+        if (n == 0).any():
+            continue
+        normals = total / n
+        n_all, s_all, ss_all = n.sum(axis=1), total.sum(axis=1), total_sq.sum(axis=1)
+        std = np.sqrt(np.maximum((ss_all - s_all * s_all / n_all) / np.maximum(n_all - 1, 1), 0.0))
+        means = s_all / n_all
+        diurnal = means[metric_pos["temp_max"]] - means[metric_pos["temp_min"]]
+        cities.append(city)
+        features.append(np.concatenate((normals.ravel(), std, [diurnal])))
+    return cities, np.array(features).reshape(len(cities), -1)
+
+
+def _cluster_profile(rows: np.ndarray) -> Dict[str, Any]:
+    """Member-average features in original units."""
+    mean = rows.mean(axis=0)
+    profile: Dict[str, Any] = {}
+    for i, metric in enumerate(_CLUSTER_METRICS):
+        profile[f"{metric}_normals"] = [round(float(v), 2) for v in mean[i * 12:(i + 1) * 12]]
+    offset = 12 * len(_CLUSTER_METRICS)
+    for i, metric in enumerate(_CLUSTER_METRICS):
+        profile[f"{metric}_std"] = round(float(mean[offset + i]), 2)
+    profile["diurnal_range"] = round(float(mean[-1]), 2)
+    return profile
+
+
+@single_flight("analysis.cluster_cities", normalize_city=_normalize_city_name)
+async def tool_cluster_cities(k: int = 3, method: str = "kmeans", cities: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Group cities by climate: monthly normals of temp_min/temp_max, their variability and the
+    diurnal range, z-scored and clustered with k-means or Ward hierarchical clustering.
+
+    Features and results are cached per global dataset version, so repeat calls do no work
+    and the first call after new data recomputes once. Cluster ids are ordered from the
+    coldest to the warmest mean temp_max.
+    """
+    if method not in _CLUSTER_METHODS:
+        return {"ok": False, "error": "method must be kmeans or hierarchical"}
+
+    version = await _global_version()
+    if _CLUSTER_CACHE["version"] != version:
+        _CLUSTER_CACHE.update(version=version, features=await _climate_features(), results={})
+    all_cities, matrix = _CLUSTER_CACHE["features"]
+
+    skipped: List[str] = []
+    if cities:
+        position = {WeatherData.normalize_city_key(c): i for i, c in enumerate(all_cities)}
+        selected = []
+        for name in dict.fromkeys(_normalize_city_name(c) for c in cities if c):
+            i = position.get(WeatherData.normalize_city_key(name))
+            if i is None:
+                skipped.append(name)
+            else:
+                selected.append(i)
+    else:
+        selected = list(range(len(all_cities)))
+    if not 2 <= k <= min(_MAX_CLUSTERS, len(selected)):
+        return {"ok": False, "error": f"k must be between 2 and min({_MAX_CLUSTERS}, number of cities with full data = {len(selected)})"}
 
+    key = (tuple(selected), k, method)
+    cached = _CLUSTER_CACHE["results"].get(key)
+    if cached is not None:
+        return {**cached, "skipped": skipped, "cached": True}
+
+    names = [all_cities[i] for i in selected]
+    rows = matrix[selected]
+    distinct = len(np.unique(rows, axis=0))
+    if k > distinct:
+        return {"ok": False, "error": f"k must be at most the number of distinct city profiles ({distinct})"}
+    x = standardize(rows)
+    labels, inertia = kmeans(x, k) if method == "kmeans" else ward(x, k)
+
+    # stable ids: coldest cluster (mean annual temp_max) first
+    tmax = slice(12, 24)
+    order = sorted(range(k), key=lambda c: float(rows[labels == c][:, tmax].mean()))
+    clusters = []
+    assignments: Dict[str, int] = {}
+    for cluster_id, c in enumerate(order):
+        members = [names[i] for i in np.flatnonzero(labels == c)]
+        for name in members:
+            assignments[name] = cluster_id
+        clusters.append({
+            "cluster": cluster_id,
+            "size": len(members),
+            "cities": members,
+            "profile": _cluster_profile(rows[labels == c]),
+        })
+
+    result = {
+        "ok": True,
+        "method": method,
+        "k": k,
+        "dataset_version": version,
+        "clusters": clusters,
+        "assignments": assignments,
+        "inertia": round(inertia, 4),
+    }
+    _CLUSTER_CACHE["results"][key] = result
+    return {**result, "skipped": skipped, "cached": False}
+
+
+_DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+_MAX_PERCENTILES = 20
+
+
+def _month_filter_cached(cols: CityColumns, idx: np.ndarray, months: Optional[List[int]]) -> np.ndarray:
+    if not months:
+        return np.ones(idx.size, dtype=bool)
+    days = np.datetime64(cols.start, "D") + idx
+    return np.isin(days.astype("datetime64[M]").astype(np.int64) % 12 + 1, months)
+
+
+async def _merged_sketch(city: str, metric: str, start: date, end: date, months: Optional[List[int]]):
+    """Full months from the rollup sketches, partial edge months from raw rows, merged."""
+    full, edges = split_months(start, end)
+    key = WeatherData.normalize_city_key(city)
+    sketches = []
     async with await _get_session() as db:
-        query = select(func.count(col)).where(
-            func.lower(WeatherData.city) == func.lower(city.strip()),
+        if full is not None:
+            r = WeatherMonthlyRollup
+            query = select(r.sketch).where(
+                func.lower(r.city) == key,
+                r.metric == metric,
+                tuple_(r.year, r.month) >= tuple_(full[0].year, full[0].month),
+                tuple_(r.year, r.month) <= tuple_(full[1].year, full[1].month),
+            )
+            if months:
+                query = query.where(r.month.in_(months))
+            sketches += (await db.execute(query)).scalars().all()
+        if edges:
+            col = getattr(WeatherData, metric)
+            query = select(col).where(
+                WeatherData.city_key == key,
+                col.isnot(None),
+                or_(*[and_(WeatherData.date >= lo, WeatherData.date <= hi) for lo, hi in edges]),
+            )
+            if months:
+                query = query.where(cast(extract("month", WeatherData.date), Integer).in_(months))
+            sketches.append(build_sketch((await db.execute(query)).scalars().all()))
+    return merge_sketches(sketches)
+
+
+@single_flight("analysis.percentiles", normalize_city=_normalize_city_name)
+async def tool_percentiles(
+    city: str,
+    metric: str,
+    start_date: str,
+    end_date: str,
+    percentiles: Optional[List[float]] = None,
+    months: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """Percentiles (0..100, percentile_cont interpolation) over a date range, optionally
+    restricted to calendar months (e.g. [6, 7, 8] for summers across years).
+
+    Database path merges the per-month quantile sketches of the rollup, so whole months
+    never sort raw rows; results are within quantiles.ERROR_BOUND of the exact value
+    (exact for whole-degree data). The columnar cache path is exact.
+    """
+    if metric not in _VALID_METRIC:
+        return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    percentiles = list(percentiles) if percentiles else list(_DEFAULT_PERCENTILES)
+    if len(percentiles) > _MAX_PERCENTILES or not all(0 <= p <= 100 for p in percentiles):
+        return {"ok": False, "error": f"percentiles must be at most {_MAX_PERCENTILES} values in 0..100"}
+    months = sorted({int(m) for m in months}) if months else None
+    if months and not all(1 <= m <= 12 for m in months):
+        return {"ok": False, "error": "months must be in 1..12"}
+    city = _normalize_city_name(city)
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    if not (city and start and end):
+        return {"ok": False, "error": "city/start_date/end_date required"}
+
+    cols = weather_cache.get(city)
+    if cols is not None:
+        idx, values = _cached_series(cols, metric, start, end)
+        values = values[_month_filter_cached(cols, idx, months)]
+        count = int(values.size)
+        points = [float(v) for v in np.percentile(values, percentiles)] if count else [None] * len(percentiles)
+        error_bound = 0.0
+    else:
+        bins, counts = await _merged_sketch(city, metric, start, end, months)
+        count = int(counts.sum())
+        points = sketch_quantiles(bins, counts, [p / 100 for p in percentiles])
+        error_bound = ERROR_BOUND
+
+    return {
+        "ok": True,
+        "city": city,
+        "metric": metric,
+        "start_date": start_date,
+        "end_date": end_date,
+        "months": months,
+        "count": count,
+        "percentiles": {f"p{p:g}": v for p, v in zip(percentiles, points)},
+        "error_bound": error_bound,
+    }
+
+
+@single_flight("analysis.anomalies", normalize_city=_normalize_city_name)
+async def tool_anomalies(city: str, metric: str, start_date: str, end_date: str) -> Dict[str, Any]:
+    """Each day's departure from the city's smoothed day-of-year normal, read from the
+    precomputed weather_climatology table with a single join."""
+    if metric not in _VALID_METRIC:
+        return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    city = _normalize_city_name(city)
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    if not (city and start and end):
+        return {"ok": False, "error": "city/start_date/end_date required"}
+
+    col = getattr(WeatherData, metric)
+    clim = WeatherClimatology
+    query = (
+        select(WeatherData.date, col, clim.mean, clim.std)
+        .outerjoin(
+            clim,
+            and_(clim.city == WeatherData.city, clim.metric == metric, clim.day == day_slot_expr(WeatherData.date)),
+        )
+        .where(
+            WeatherData.city_key == WeatherData.normalize_city_key(city),
+            col.isnot(None),
             WeatherData.date >= start,
             WeatherData.date <= end,
-            col.isnot(None),
-            cond,
         )
-        count = (await db.execute(query)).scalar() or 0
+        .order_by(WeatherData.date)
+    )
+    async with await _get_session() as db:
+        rows = (await db.execute(query)).all()
+
+    items = []
+    anomalies = []
+    for d, value, normal, std in rows:
+        anomaly = value - normal if normal is not None else None
+        if anomaly is not None:
+            anomalies.append(anomaly)
+        items.append({
+            "date": d.isoformat(),
+            metric: value,
+            "normal": normal,
+            "std": std,
+            "anomaly": anomaly,
+            "zscore": anomaly / std if anomaly is not None and std else None,
+        })
 
     return {
         "ok": True,
         "city": city,
         "metric": metric,
-        "comparison": comparison,
-        "threshold": threshold,
         "start_date": start_date,
         "end_date": end_date,
-        "event_days": count,
+        "count": len(items),
+        "mean_anomaly": float(np.mean(anomalies)) if anomalies else None,
+        "items": items,
     }
 
 
-async def tool_simple_forecast(city: str, metric: str, horizon_days: int = 7) -> Dict[str, Any]:
+_FORECAST_METHODS = {"seasonal", "linear"}
+# fitted seasonal models per (city key, metric): (dataset version at fit time, model)
+_SEASONAL_MODELS: Dict[Tuple[str, str], Tuple[Optional[int], SeasonalModel]] = {}
+# the fitted-prefix checksum covers everything from this date up to the model's last day
+_HISTORY_START = date(1900, 1, 1)
+
+
+async def _fetch_series(city: str, metric: str, after: Optional[date] = None) -> Tuple[date, np.ndarray, np.ndarray]:
+    """(origin, day offsets, values) of a city's series from the database, optionally only after a date."""
+    col = getattr(WeatherData, metric)
+    query = select(WeatherData.date, col).where(
+        WeatherData.city_key == WeatherData.normalize_city_key(city), col.isnot(None)
+    )
+    if after is not None:
+        query = query.where(WeatherData.date > after)
+    async with await _get_session() as db:
+        rows = (await db.execute(query.order_by(WeatherData.date))).all()
+    if not rows:
+        return after or _HISTORY_START, np.zeros(0, dtype=np.int64), np.zeros(0)
+    origin = rows[0][0]
+    t = np.array([(d - origin).days for d, _ in rows], dtype=np.int64)
+    return origin, t, np.array([v for _, v in rows], dtype=np.float64)
+
+
+async def _sync_model_from_db(model: Optional[SeasonalModel], city: str, metric: str) -> Tuple[Optional[SeasonalModel], str]:
+    """Database variant of sync_model: the fitted prefix is checked against the monthly
+    rollup and only the trailing window is fetched for an incremental update."""
+    if model is not None:
+        rows = await _aggregate_rows([city], metric, _HISTORY_START, model.last_date)
+        prefix = (int(sum(r.count for r in rows)), float(sum(r.sum for r in rows)), float(sum(r.sum_sq for r in rows)))
+        if model.matches(*prefix):
+            origin, t, values = await _fetch_series(city, metric, after=model.last_date - timedelta(days=RECENT_DAYS))
+            t_model = t + (origin - model.origin).days
+            new = t_model > (model.last_date - model.origin).days
+            if not new.any():
+                return model, "validated"
+            model.extend(t_model[new], values[new], t_model, values)
+            return model, "incremental"
+    origin, t, values = await _fetch_series(city, metric)
+    return sync_model(None, origin, t, values)
+
+
+async def _seasonal_model(city: str, metric: str) -> Tuple[Optional[SeasonalModel], str]:
+    """Fitted model for (city, metric), refitted only when the city's data changed.
+
+    With the dataset version registry loaded (API process) an unchanged version
+    serves the cached parameters without touching any data. Otherwise the fitted
+    history is validated by checksum and only days after the last fit are folded in.
+    """
+    key = (WeatherData.normalize_city_key(city), metric)
+    version = dataset_versions.cities.get(key[0], 0) if dataset_versions.loaded else None
+    cached = _SEASONAL_MODELS.get(key)
+    if cached is not None and version is not None and cached[0] == version:
+        return cached[1], "cached"
+    model = cached[1] if cached is not None else None
+
+    cols = weather_cache.get(city)
+    if cols is not None:
+        idx, values = _cached_series(cols, metric, None, None)
+        model, status = sync_model(model, cols.start, idx, values)
+    else:
+        model, status = await _sync_model_from_db(model, city, metric)
+
+    if model is None:
+        _SEASONAL_MODELS.pop(key, None)
+    else:
+        _SEASONAL_MODELS[key] = (version, model)
+    return model, status
+
+
+@single_flight("analysis.simple_forecast", normalize_city=_normalize_city_name)
+async def tool_simple_forecast(city: str, metric: str, horizon_days: int = 7, method: str = "seasonal") -> Dict[str, Any]:
+    """Forecast the next horizon_days days.
+
+    method="seasonal" (default) uses the cached trend + annual harmonics + AR(1)
+    model; cities with less than two years of history, or method="linear", use a
+    linear trend over the latest 120 points.
+    """
     if metric not in _VALID_METRIC:
         return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    if method not in _FORECAST_METHODS:
+        return {"ok": False, "error": "method must be seasonal or linear"}
     if not city:
         return {"ok": False, "error": "city required"}
     city = _normalize_city_name(city)
     horizon_days = max(1, min(int(horizon_days or 7), 30))
 
+    if method == "seasonal":
+        model, status = await _seasonal_model(city, metric)
+        if model is not None:
+            return {
+                "ok": True,
+                "city": city,
+                "metric": metric,
+                "horizon_days": horizon_days,
+                "method": "seasonal_trend_harmonics",
+                "fit": status,
+                "forecast": [{"date": d.isoformat(), metric: round(v, 2)} for d, v in model.forecast(horizon_days)],
+            }
+
     async with await _get_session() as db:
         col = getattr(WeatherData, metric)
         rows = (
             await db.execute(
                 select(WeatherData.date, col)
-                .where(func.lower(WeatherData.city) == func.lower(city.strip()), col.isnot(None))
+                .where(WeatherData.city_key == WeatherData.normalize_city_key(city), col.isnot(None))
                 .order_by(WeatherData.date.desc())
-                .limit(120)
+                .limit(LINEAR_POINTS)
             )
         ).all()
 
-    # use latest 120 points in chronological order
+    # use latest points in chronological order
     rows = list(reversed(rows))
 
     if len(rows) < 2:
         return {"ok": False, "error": "not enough data for forecast", "city": city, "metric": metric}
 
-    # Use simple linear trend over available points
-    xs = list(range(len(rows)))
-    ys = [float(r[1]) for r in rows]
-    n = len(xs)
-    mean_x = sum(xs) / n
-    mean_y = sum(ys) / n
-    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
-    den = sum((x - mean_x) ** 2 for x in xs) or 1.0
-    slope = num / den
-    intercept = mean_y - slope * mean_x
-
-    last_date = rows[-1][0]
-    forecast = []
-    for i in range(1, horizon_days + 1):
-        y_hat = intercept + slope * (n - 1 + i)
-        d = last_date + timedelta(days=i)
-        forecast.append({"date": d.isoformat(), metric: round(y_hat, 2)})
+    forecast = [
+        {"date": d.isoformat(), metric: round(v, 2)}
+        for d, v in linear_forecast(rows[-1][0], np.array([r[1] for r in rows]), horizon_days)
+    ]
 
     return {
         "ok": True,
@@ -307,6 +1492,204 @@ async def tool_simple_forecast(city: str, metric: str, horizon_days: int = 7) ->
     }
 
 
+# ----- batch forecasting -----
+
+
+# upper bound for forecast_all(workers=...); the shared pool is sized to it
+FORECAST_MAX_WORKERS = os.cpu_count() or 1
+
+# shared pool: worker processes stay warm (interpreter + numpy imported) across runs
+_FORECAST_POOL: Optional[ProcessPoolExecutor] = None
+
+# one batch run at a time: concurrent runs would race on replacing the same run_date
+_FORECAST_LOCK = asyncio.Lock()
+
+
+def start_forecast_pool() -> ProcessPoolExecutor:
+    """Create the shared batch-forecast pool (app lifespan); CLI / stdio servers get it lazily."""
+    global _FORECAST_POOL
+    if _FORECAST_POOL is None:
+        # spawn, not fork: the parent holds a running event loop and open DB connections
+        _FORECAST_POOL = ProcessPoolExecutor(
+            max_workers=FORECAST_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _FORECAST_POOL
+
+
+def stop_forecast_pool() -> None:
+    global _FORECAST_POOL
+    if _FORECAST_POOL is not None:
+        _FORECAST_POOL.shutdown(wait=True, cancel_futures=True)
+        _FORECAST_POOL = None
+
+
+async def _fetch_all_series(metrics: List[str]) -> Dict[Tuple[str, str], Tuple[date, np.ndarray, np.ndarray]]:
+    """{(city, metric): (origin, day offsets, values)} for every city; cities held by the
+    columnar cache are read from it, the rest in one streamed scan of weather_data."""
+    async with await _get_session() as db:
+        cities = (await db.execute(select(WeatherCitySummary.city).order_by(WeatherCitySummary.city))).scalars().all()
+
+    series: Dict[Tuple[str, str], Tuple[date, np.ndarray, np.ndarray]] = {}
+    missing = []
+    for city in cities:
+        cols = weather_cache.get(city)
+        if cols is None:
+            missing.append(city)
+            continue
+        for metric in metrics:
+            idx, values = _cached_series(cols, metric, None, None)
+            series[(city, metric)] = (cols.start, idx, values)
+    if not missing:
+        return series
+
+    grouped: Dict[str, List[Any]] = {}
+    query = (
+        select(WeatherData.city, WeatherData.date, *(getattr(WeatherData, m) for m in metrics))
+        .where(WeatherData.city.in_(missing))
+        .order_by(WeatherData.city, WeatherData.date)
+    )
+    async with await _get_session() as db:
+        result = await db.stream(query.execution_options(yield_per=5000))
+        async for rows in result.partitions():
+            for row in rows:
+                grouped.setdefault(row[0], []).append(row[1:])
+    for city, rows in grouped.items():
+        origin = rows[0][0]
+        t = np.array([(r[0] - origin).days for r in rows], dtype=np.int64)
+        for i, metric in enumerate(metrics):
+            values = np.array([np.nan if r[i + 1] is None else r[i + 1] for r in rows], dtype=np.float64)
+            keep = ~np.isnan(values)
+            series[(city, metric)] = (origin, t[keep], values[keep])
+    return series
+
+
+async def tool_forecast_all(
+    metrics: Optional[List[str]] = None, horizon_days: int = 7, workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """Forecast every city and metric and store the run in weather_forecasts.
+
+    Model fitting runs in the shared process pool so it never blocks the event loop;
+    cached seasonal models are shipped to the workers and folded forward incrementally,
+    and the refreshed models are put back into the simple_forecast cache. workers
+    (1..FORECAST_MAX_WORKERS) caps how many fits run at once; runs are serialized.
+    """
+    metrics = metrics or sorted(_VALID_METRIC)
+    if any(m not in _VALID_METRIC for m in metrics):
+        return {"ok": False, "error": "metrics must be temp_min and/or temp_max"}
+    if workers is not None and not 1 <= workers <= FORECAST_MAX_WORKERS:
+        return {"ok": False, "error": f"workers must be between 1 and {FORECAST_MAX_WORKERS}"}
+    horizon_days = max(1, min(int(horizon_days or 7), 30))
+    async with _FORECAST_LOCK:
+        return await _forecast_all(metrics, horizon_days, workers or FORECAST_MAX_WORKERS)
+
+
+async def _forecast_all(metrics: List[str], horizon_days: int, workers: int) -> Dict[str, Any]:
+    run_date = date.today()
+
+    # versions as of the fetch: a write landing during the fit must not mark the model current
+    versions = dict(dataset_versions.cities) if dataset_versions.loaded else None
+    series = await _fetch_all_series(metrics)
+    keys = [k for k, (_, t, _) in series.items() if t.size]
+    loop = asyncio.get_running_loop()
+    pool = start_forecast_pool()
+    slots = asyncio.Semaphore(workers)
+
+    async def fit_one(city: str, metric: str):
+        async with slots:
+            return await loop.run_in_executor(
+                pool,
+                fit_forecast,
+                _SEASONAL_MODELS.get((WeatherData.normalize_city_key(city), metric), (None, None))[1],
+                *series[(city, metric)],
+                horizon_days,
+            )
+
+    results = await asyncio.gather(*(fit_one(city, metric) for city, metric in keys))
+
+    fit: Dict[str, int] = {}
+    records = []
+    for (city, metric), (model, status, method, forecast) in zip(keys, results):
+        fit[status] = fit.get(status, 0) + 1
+        key = (WeatherData.normalize_city_key(city), metric)
+        if model is not None:
+            version = versions.get(key[0], 0) if versions is not None else None
+            _SEASONAL_MODELS[key] = (version, model)
+        else:
+            _SEASONAL_MODELS.pop(key, None)
+        origin, t, _ = series[(city, metric)]
+        last_observed = origin + timedelta(days=int(t[-1]))
+        records.extend(
+            {
+                "city": city,
+                "metric": metric,
+                "run_date": run_date,
+                "target_date": d,
+                "value": round(v, 2),
+                "method": method,
+                "last_observed": last_observed,
+            }
+            for d, v in forecast
+        )
+
+    table = WeatherForecast.__table__
+    async with await _get_session() as db:
+        # also serializes with runs from other processes (CLI, stdio server) until commit
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(table.name))))
+        # re-running on the same day replaces that day's run
+        await db.execute(delete(table).where(table.c.run_date == run_date, table.c.metric.in_(metrics)))
+        if records:
+            await db.execute(table.insert(), records)
+        await db.commit()
+
+    return {
+        "ok": True,
+        "run_date": run_date.isoformat(),
+        "horizon_days": horizon_days,
+        "metrics": metrics,
+        "cities": len({city for city, _ in keys}),
+        "forecasts": len(records),
+        "fit": fit,
+    }
+
+
+@single_flight("analysis.get_forecast", normalize_city=_normalize_city_name)
+async def tool_get_forecast(city: str, metric: str) -> Dict[str, Any]:
+    """Latest precomputed forecast for a city from weather_forecasts (written by analysis.forecast_all)."""
+    if metric not in _VALID_METRIC:
+        return {"ok": False, "error": "metric must be temp_min or temp_max"}
+    if not city:
+        return {"ok": False, "error": "city required"}
+    city = _normalize_city_name(city)
+    key = WeatherData.normalize_city_key(city)
+    latest = (
+        select(func.max(WeatherForecast.run_date))
+        .where(func.lower(WeatherForecast.city) == key, WeatherForecast.metric == metric)
+        .scalar_subquery()
+    )
+    async with await _get_session() as db:
+        rows = (
+            await db.execute(
+                select(WeatherForecast.run_date, WeatherForecast.target_date, WeatherForecast.value,
+                       WeatherForecast.method, WeatherForecast.last_observed)
+                .where(func.lower(WeatherForecast.city) == key, WeatherForecast.metric == metric,
+                       WeatherForecast.run_date == latest)
+                .order_by(WeatherForecast.target_date)
+            )
+        ).all()
+    if not rows:
+        return {"ok": False, "error": "no precomputed forecast, run analysis.forecast_all", "city": city, "metric": metric}
+    return {
+        "ok": True,
+        "city": city,
+        "metric": metric,
+        "horizon_days": len(rows),
+        "method": rows[0].method,
+        "run_date": rows[0].run_date.isoformat(),
+        "last_observed": rows[0].last_observed.isoformat(),
+        "forecast": [{"date": r.target_date.isoformat(), metric: r.value} for r in rows],
+    }
+
+
 # ----- CLI -----
 
 def _build_parser() -> argparse.ArgumentParser:
@@ -321,6 +1704,16 @@ def _build_parser() -> argparse.ArgumentParser:
     p.add_argument("--threshold", type=float)
     p.add_argument("--comparison")
     p.add_argument("--horizon", type=int, default=7)
+    p.add_argument("--method")
+    p.add_argument("--min-streak-days", type=int, default=3)
+    p.add_argument("--metrics", nargs="*")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--windows", nargs="*", type=int)
+    p.add_argument("--percentiles", nargs="*", type=float)
+    p.add_argument("--months", nargs="*", type=int)
+    p.add_argument("--deseasonalize", action="store_true")
+    p.add_argument("--k", type=int, default=3)
+    p.add_argument("--min-force", type=int, default=_DEFAULT_MIN_FORCE)
     p.add_argument("--limit", type=int)
     p.add_argument("--fields", nargs="*")
     return p
@@ -333,15 +1726,36 @@ def main():
     elif args.tool == "analysis.group_by_period":
         coro = tool_group_by_period(args.city, args.metric, args.period, args.start_date, args.end_date)
     elif args.tool == "analysis.compare_cities":
-        coro = tool_compare_cities(args.cities or [], args.metric, args.start_date, args.end_date)
+        coro = tool_compare_cities(args.cities or [], args.metric, args.start_date, args.end_date, args.period)
     elif args.tool == "analysis.extreme_event_stats":
-        coro = tool_extreme_event_stats(args.city, args.metric, args.threshold, args.comparison, args.start_date, args.end_date)
+        coro = tool_extreme_event_stats(args.city, args.metric, args.threshold, args.comparison, args.start_date, args.end_date, args.min_streak_days)
+    elif args.tool == "analysis.rolling_stats":
+        coro = tool_rolling_stats(args.city, args.metric, args.start_date, args.end_date, args.windows)
+    elif args.tool == "analysis.condition_stats":
+        coro = tool_condition_stats(args.city, args.start_date, args.end_date, args.period or "year")
+    elif args.tool == "analysis.wind_stats":
+        coro = tool_wind_stats(args.city, args.start_date, args.end_date, args.period or "month", args.min_force)
+    elif args.tool == "analysis.cluster_cities":
+        coro = tool_cluster_cities(args.k, args.method or "kmeans", args.cities)
+    elif args.tool == "analysis.correlation_matrix":
+        coro = tool_correlation_matrix(args.cities or [], args.metric, args.start_date, args.end_date, args.method or "pearson", args.deseasonalize)
+    elif args.tool == "analysis.percentiles":
+        coro = tool_percentiles(args.city, args.metric, args.start_date, args.end_date, args.percentiles, args.months)
+    elif args.tool == "analysis.anomalies":
+        coro = tool_anomalies(args.city, args.metric, args.start_date, args.end_date)
     elif args.tool == "analysis.simple_forecast":
-        coro = tool_simple_forecast(args.city, args.metric, args.horizon)
+        coro = tool_simple_forecast(args.city, args.metric, args.horizon, args.method or "seasonal")
+    elif args.tool == "analysis.forecast_all":
+        coro = tool_forecast_all(args.metrics, args.horizon, args.workers)
+    elif args.tool == "analysis.get_forecast":
+        coro = tool_get_forecast(args.city, args.metric)
     else:
         raise SystemExit(f"Unknown tool: {args.tool}")
 
-    result = asyncio.run(coro)
+    try:
+        result = asyncio.run(coro)
+    finally:
+        stop_forecast_pool()
     print(result)
 
 
@@ -0,0 +1,97 @@
+﻿"""NumPy k-means and Ward hierarchical clustering used by analysis.cluster_cities.
+
+Both work on a small (cities x features) matrix that the caller has already
+standardized, and both are deterministic: k-means uses a fixed seed for its
+k-means++ restarts, and Ward merges are resolved in index order on ties.
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+KMEANS_RESTARTS = 10
+KMEANS_MAX_ITER = 100
+SEED = 0
+
+
+def standardize(x: np.ndarray) -> np.ndarray:
+    """Column z-scores; constant columns become zeros instead of NaN."""
+    std = x.std(axis=0)
+    return (x - x.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+
+def _inertia(x: np.ndarray, labels: np.ndarray, centers: np.ndarray) -> float:
+    return float(((x - centers[labels]) ** 2).sum())
+
+
+def _kmeans_once(x: np.ndarray, k: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    # k-means++ seeding
+    centers = [x[rng.integers(len(x))]]
+    for _ in range(1, k):
+        d2 = ((x[:, None, :] - np.asarray(centers)[None]) ** 2).sum(axis=2).min(axis=1)
+        probs = d2 / d2.sum() if d2.sum() > 0 else np.full(len(x), 1.0 / len(x))
+        centers.append(x[rng.choice(len(x), p=probs)])
+    centers = np.asarray(centers)
+
+    labels = np.full(len(x), -1)
+    for _ in range(KMEANS_MAX_ITER):
+        new = ((x[:, None, :] - centers[None]) ** 2).sum(axis=2).argmin(axis=1)
+        if np.array_equal(new, labels):
+            break
+        labels = new
+        for j in range(k):
+            members = x[labels == j]
+            if len(members):
+                centers[j] = members.mean(axis=0)
+            else:
+                # empty cluster: re-seed it with the point farthest from its center
+                far = int(((x - centers[labels]) ** 2).sum(axis=1).argmax())
+                labels[far] = j
+                centers[j] = x[far]
+    return labels, centers
+
+
+def kmeans(x: np.ndarray, k: int) -> Tuple[np.ndarray, float]:
+    """Best of KMEANS_RESTARTS Lloyd runs; returns (labels, inertia).
+
+    Every cluster is non-empty as long as x has at least k distinct rows.
+    """
+    rng = np.random.default_rng(SEED)
+    best_labels, best_inertia = None, np.inf
+    for _ in range(KMEANS_RESTARTS):
+        labels, centers = _kmeans_once(x, k, rng)
+        inertia = _inertia(x, labels, centers)
+        if inertia < best_inertia - 1e-12:
+            best_labels, best_inertia = labels, inertia
+    return best_labels, float(best_inertia)
+
+
+def ward(x: np.ndarray, k: int) -> Tuple[np.ndarray, float]:
+    """Agglomerative clustering with Ward linkage, cut at k clusters; returns (labels, inertia).
+
+    Uses the Lance-Williams update on squared distances, O(n^3) which is fine for
+    the handful of cities in the dataset.
+    """
+    n = len(x)
+    d = ((x[:, None, :] - x[None]) ** 2).sum(axis=2)
+    np.fill_diagonal(d, np.inf)
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    labels = np.arange(n)
+    for _ in range(n - k):
+        masked = np.where(active[:, None] & active[None], d, np.inf)
+        i, j = np.unravel_index(np.argmin(masked), masked.shape)
+        i, j = min(i, j), max(i, j)
+        si, sj = sizes[i], sizes[j]
+        s = si + sj + sizes
+        # Lance-Williams for Ward on squared Euclidean distances
+        d[i] = ((si + sizes) * d[i] + (sj + sizes) * d[j] - sizes * d[i, j]) / s
+        d[:, i] = d[i]
+        d[i, i] = np.inf
+        sizes[i] = si + sj
+        active[j] = False
+        labels[labels == j] = i
+    _, labels = np.unique(labels, return_inverse=True)
+    centers = np.array([x[labels == c].mean(axis=0) for c in range(k)])
+    return labels, _inertia(x, labels, centers)
@@ -0,0 +1,75 @@
+﻿"""Single-flight coalescing for read-only MCP tools.
+
+Concurrent calls to the same tool with the same (normalized) arguments share
+one in-flight execution instead of each opening a session and running the same
+query. Only calls that overlap in time are merged; nothing is cached once the
+shared execution finishes. Callers receive the same result object and must
+treat it as read-only.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _make_key(name: str, arguments: Dict[str, Any], normalize_city: Optional[Callable[[str], str]]) -> Tuple[str, str]:
+    if normalize_city is not None:
+        if arguments.get("city"):
+            arguments["city"] = normalize_city(arguments["city"])
+        if arguments.get("cities"):
+            arguments["cities"] = [normalize_city(c) for c in arguments["cities"]]
+    return name, json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def single_flight(name: str, normalize_city: Optional[Callable[[str], str]] = None):
+    """Coalesce concurrent identical calls of an async tool function.
+
+    Args:
+        name: Tool name used in the key and the counters (e.g. "data.get_range").
+        normalize_city: Applied to ``city`` / ``cities`` arguments before keying,
+            so "Beijing" and "北京" share a flight.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+        counters = _stats.setdefault(name, {"calls": 0, "executed": 0, "coalesced": 0})
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = _make_key(name, dict(bound.arguments), normalize_city)
+            counters["calls"] += 1
+
+            task = _inflight.get(key)
+            if task is not None:
+                counters["coalesced"] += 1
+            else:
+                counters["executed"] += 1
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                _inflight[key] = task
+
+                def _release(done: asyncio.Future, key=key) -> None:
+                    if _inflight.get(key) is done:
+                        del _inflight[key]
+
+                task.add_done_callback(_release)
+
+            # Shield so a cancelled caller (e.g. client disconnect) does not
+            # cancel the execution the other callers are waiting on.
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    return decorator
+
+
+def coalesce_stats() -> Dict[str, Dict[str, int]]:
+    """Per-tool counters: total calls, executions, and calls served by a shared flight."""
+    return {name: dict(counters) for name, counters in _stats.items()}
@@ -17,14 +17,23 @@ import asyncio
 from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional
 
+import numpy as np
 import requests
 from bs4 import BeautifulSoup
 
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import AsyncSessionLocal
 from app.models.models import WeatherData
+from app.services.changes import notify_cities_changed
+from app.services.climatology import refresh_climatology_range
+from app.services.conditions import classify_condition
+from app.services.rollup import refresh_rollup_range
+from app.services.summary import get_dataset_summary, refresh_city_summary
+from app.services.weather_cache import CityColumns, weather_cache
+from app.services.wind import wind_columns
+from mcp_tools.coalesce import single_flight
 
 # ----- helpers -----
 
@@ -166,53 +175,90 @@ def _fetch_month(city_pinyin: str, city_name: str, year: int, month: str) -> Lis
 # ----- tool impls -----
 
 
+# columns returned by data.get_range; projected directly so rows come back as
+# plain tuples instead of hydrated ORM entities (no temp_raw/created_at/identity map)
+_RANGE_COLUMNS = (
+    WeatherData.city,
+    WeatherData.date,
+    WeatherData.weather_condition,
+    WeatherData.temp_min,
+    WeatherData.temp_max,
+    WeatherData.wind_info,
+)
+
+
+def _range_from_cache(cols: CityColumns, start: Optional[date], end: Optional[date], limit: int) -> Dict[str, Any]:
+    lo, hi = cols.window(start, end)
+    # newest first, like the SQL path (ORDER BY date DESC LIMIT n)
+    idx = (np.flatnonzero(cols.present[lo:hi]) + lo)[::-1][: max(limit, 0)]
+    conditions, winds = weather_cache.conditions, weather_cache.winds
+    items = []
+    for i in idx:
+        t_min, t_max = cols.temp_min[i], cols.temp_max[i]
+        items.append(
+            {
+                "city": cols.city,
+                "date": cols.date_at(i).isoformat(),
+                "weather_condition": conditions.decode(int(cols.condition[i])),
+                "temp_min": None if np.isnan(t_min) else float(t_min),
+                "temp_max": None if np.isnan(t_max) else float(t_max),
+                "wind_info": winds.decode(int(cols.wind[i])),
+            }
+        )
+    return {"count": len(items), "items": items}
+
+
+@single_flight("data.get_range", normalize_city=_normalize_city_name)
 async def tool_get_range(city: Optional[str], start_date: Optional[str], end_date: Optional[str], limit: int = 500) -> Dict[str, Any]:
     start = _parse_date(start_date)
     end = _parse_date(end_date)
     if city:
         city = _normalize_city_name(city)
+        cols = weather_cache.get(city)
+        if cols is not None:
+            return _range_from_cache(cols, start, end, limit)
     async with await _get_session() as db:
-        query = select(WeatherData)
+        query = select(*_RANGE_COLUMNS)
         if city:
-            query = query.where(func.lower(WeatherData.city) == func.lower(city.strip()))
+            query = query.where(WeatherData.city_key == WeatherData.normalize_city_key(city))
         if start:
             query = query.where(WeatherData.date >= start)
         if end:
             query = query.where(WeatherData.date <= end)
         query = query.order_by(WeatherData.date.desc()).limit(limit)
-        rows = (await db.execute(query)).scalars().all()
+        rows = (await db.execute(query)).all()
     return {
         "count": len(rows),
         "items": [
             {
-                "city": r.city,
-                "date": r.date.isoformat(),
-                "weather_condition": r.weather_condition,
-                "temp_min": r.temp_min,
-                "temp_max": r.temp_max,
-                "wind_info": r.wind_info,
+                "city": r_city,
+                "date": r_date.isoformat(),
+                "weather_condition": condition,
+                "temp_min": t_min,
+                "temp_max": t_max,
+                "wind_info": wind,
             }
-            for r in rows
+            for r_city, r_date, condition, t_min, t_max, wind in rows
         ],
     }
 
 
+@single_flight("data.get_dataset_overview")
 async def tool_get_dataset_overview() -> Dict[str, Any]:
+    # served from the per-city summary table: O(number of cities), no weather_data scan
     async with await _get_session() as db:
-        total = (await db.execute(select(func.count(WeatherData.id)))).scalar()
-        cities = (await db.execute(select(WeatherData.city).distinct().order_by(WeatherData.city))).scalars().all()
-        dr = (
-            await db.execute(
-                select(func.min(WeatherData.date).label("start"), func.max(WeatherData.date).label("end"))
-            )
-        ).one_or_none()
+        summary = await get_dataset_summary(db)
     return {
-        "total_records": total,
-        "cities": cities,
-        "date_range": {"start": dr[0].isoformat() if dr and dr[0] else None, "end": dr[1].isoformat() if dr and dr[1] else None},
+        "total_records": summary["total_records"],
+        "cities": summary["cities"],
+        "date_range": {
+            "start": summary["start"].isoformat() if summary["start"] else None,
+            "end": summary["end"].isoformat() if summary["end"] else None,
+        },
     }
 
 
+@single_flight("data.check_coverage", normalize_city=_normalize_city_name)
 async def tool_check_coverage(city: str, start_date: str, end_date: str) -> Dict[str, Any]:
     city = _normalize_city_name(city)
     start = _parse_date(start_date)
@@ -222,7 +268,7 @@ async def tool_check_coverage(city: str, start_date: str, end_date: str) -> Dict
 
     async with await _get_session() as db:
         query = select(WeatherData.date).where(
-            func.lower(WeatherData.city) == func.lower(city.strip()),
+            WeatherData.city_key == WeatherData.normalize_city_key(city),
             WeatherData.date >= start,
             WeatherData.date <= end,
         )
@@ -249,6 +295,7 @@ async def tool_check_coverage(city: str, start_date: str, end_date: str) -> Dict
 ALLOWED_FIELDS = {"city", "date", "weather_condition", "temp_min", "temp_max", "wind_info"}
 
 
+@single_flight("data.custom_query", normalize_city=_normalize_city_name)
 async def tool_custom_query(fields: List[str], city: Optional[str], start_date: Optional[str], end_date: Optional[str], limit: int = 200) -> Dict[str, Any]:
     selected = [f for f in fields if f in ALLOWED_FIELDS]
     if not selected:
@@ -262,7 +309,7 @@ async def tool_custom_query(fields: List[str], city: Optional[str], start_date:
         cols = [getattr(WeatherData, f) for f in selected]
         query = select(*cols)
         if city:
-            query = query.where(func.lower(WeatherData.city) == func.lower(city.strip()))
+            query = query.where(WeatherData.city_key == WeatherData.normalize_city_key(city))
         if start:
             query = query.where(WeatherData.date >= start)
         if end:
@@ -321,9 +368,11 @@ async def tool_update_city_range(city: str, start_date: str, end_date: str) -> D
             "city": r["city"],
             "date": d,
             "weather_condition": r.get("weather_condition"),
+            "condition_flags": classify_condition(r.get("weather_condition")),
             "temp_min": r.get("temp_min"),
             "temp_max": r.get("temp_max"),
             "wind_info": r.get("wind_info"),
+            **wind_columns(r.get("wind_info")),
         })
 
     if not filtered:
@@ -343,12 +392,19 @@ async def tool_update_city_range(city: str, start_date: str, end_date: str) -> D
 
         await db.execute(
             delete(WeatherData).where(
-                func.lower(WeatherData.city) == func.lower(city.strip()),
+                WeatherData.city_key == WeatherData.normalize_city_key(city),
                 WeatherData.date >= start,
                 WeatherData.date <= end,
             )
         )
         db.add_all([WeatherData(**item) for item in filtered])
+        await db.flush()
+        # keep the dataset summary, monthly rollup and climatology in the same transaction
+        # as the rewrite; the change notification is delivered on commit and invalidates caches
+        await refresh_city_summary(db, [city])
+        await refresh_rollup_range(db, city, start, end)
+        await refresh_climatology_range(db, city, start, end)
+        await notify_cities_changed(db, [city])
         await db.commit()
 
     return {
@@ -0,0 +1,167 @@
+﻿"""Seasonal daily-temperature model used by analysis.simple_forecast.
+
+y(t) = a + b * t + sum_k (c_k cos(2πk t / 365.25) + s_k sin(2πk t / 365.25)) + AR(1) residual
+
+The trend-plus-harmonics part is an ordinary least-squares fit kept as normal
+equations (XᵀX, Xᵀy), so days appended after the last fit are folded in
+without touching the older history. The residual persistence (phi) and the
+latest residual are re-estimated from a recent window on every update; the
+forecast decays the latest anomaly towards the seasonal curve as phi ** h.
+
+Everything here is plain numpy on arrays, so fit_forecast can run in a worker
+process (analysis.forecast_all) as well as in the API process.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+HARMONICS = 3
+YEAR_DAYS = 365.25
+# fewer points than this cannot pin down an annual cycle; callers fall back to a linear trend
+MIN_POINTS = 2 * 365
+# window used to estimate the AR(1) residual persistence
+RECENT_DAYS = 365
+# points used by the linear-trend fallback
+LINEAR_POINTS = 120
+
+
+def features(t: np.ndarray) -> np.ndarray:
+    """Design matrix for day offsets t (days since the model origin)."""
+    t = np.asarray(t, dtype=np.float64)
+    w = 2.0 * math.pi * t / YEAR_DAYS
+    cols = [np.ones_like(t), t / YEAR_DAYS]
+    for k in range(1, HARMONICS + 1):
+        cols.append(np.cos(k * w))
+        cols.append(np.sin(k * w))
+    return np.column_stack(cols)
+
+
+def checksum(values: np.ndarray) -> Tuple[int, float, float]:
+    """(count, sum, sum of squares) used to detect changes to already-fitted history."""
+    values = np.asarray(values, dtype=np.float64)
+    return int(values.size), float(values.sum()), float(np.dot(values, values))
+
+
+@dataclass
+class SeasonalModel:
+    origin: date
+    last_date: date
+    count: int
+    total: float
+    total_sq: float
+    xtx: np.ndarray
+    xty: np.ndarray
+    coef: np.ndarray
+    phi: float = 0.0
+    last_resid: float = 0.0
+
+    @classmethod
+    def fit(cls, origin: date, t: np.ndarray, values: np.ndarray) -> "SeasonalModel":
+        """Full fit; t are ascending day offsets from origin."""
+        values = np.asarray(values, dtype=np.float64)
+        x = features(t)
+        count, total, total_sq = checksum(values)
+        model = cls(
+            origin=origin,
+            last_date=origin + timedelta(days=int(t[-1])),
+            count=count,
+            total=total,
+            total_sq=total_sq,
+            xtx=x.T @ x,
+            xty=x.T @ values,
+            coef=np.zeros(x.shape[1]),
+        )
+        model._solve()
+        model._fit_residuals(t, values)
+        return model
+
+    def matches(self, count: int, total: float, total_sq: float) -> bool:
+        """True if the history up to last_date is unchanged since the fit."""
+        return (
+            count == self.count
+            and math.isclose(total, self.total, rel_tol=1e-9, abs_tol=1e-6)
+            and math.isclose(total_sq, self.total_sq, rel_tol=1e-9, abs_tol=1e-6)
+        )
+
+    def extend(self, new_t: np.ndarray, new_values: np.ndarray, recent_t: np.ndarray, recent_values: np.ndarray) -> None:
+        """Fold in days after last_date; recent_* is the trailing window (including the new days)."""
+        new_values = np.asarray(new_values, dtype=np.float64)
+        if new_values.size:
+            x = features(new_t)
+            self.xtx = self.xtx + x.T @ x
+            self.xty = self.xty + x.T @ new_values
+            count, total, total_sq = checksum(new_values)
+            self.count += count
+            self.total += total
+            self.total_sq += total_sq
+            self.last_date = self.origin + timedelta(days=int(new_t[-1]))
+            self._solve()
+        self._fit_residuals(recent_t, recent_values)
+
+    def forecast(self, horizon: int) -> List[Tuple[date, float]]:
+        last_t = (self.last_date - self.origin).days
+        t = np.arange(last_t + 1, last_t + horizon + 1)
+        decay = self.phi ** np.arange(1, horizon + 1)
+        y = features(t) @ self.coef + decay * self.last_resid
+        return [(self.last_date + timedelta(days=i + 1), float(v)) for i, v in enumerate(y)]
+
+    def _solve(self) -> None:
+        # tiny ridge keeps the solve stable for short or gappy histories
+        ridge = 1e-9 * np.eye(self.xtx.shape[0])
+        self.coef = np.linalg.solve(self.xtx + ridge, self.xty)
+
+    def _fit_residuals(self, t: np.ndarray, values: np.ndarray) -> None:
+        t = np.asarray(t)
+        keep = t > t[-1] - RECENT_DAYS
+        t = t[keep]
+        resid = np.asarray(values, dtype=np.float64)[keep] - features(t) @ self.coef
+        self.last_resid = float(resid[-1])
+        # lag-1 autocorrelation over pairs of consecutive days only
+        pairs = np.flatnonzero(np.diff(t) == 1)
+        den = float(np.dot(resid[pairs], resid[pairs]))
+        phi = float(np.dot(resid[pairs + 1], resid[pairs])) / den if den > 0 else 0.0
+        self.phi = min(max(phi, 0.0), 0.99)
+
+
+def sync_model(model: Optional[SeasonalModel], origin: date, t: np.ndarray, values: np.ndarray) -> Tuple[Optional[SeasonalModel], str]:
+    """Reuse/extend a fitted model against a full series (t: ascending day offsets from origin), or refit."""
+    if model is not None:
+        t_model = t + (origin - model.origin).days
+        prefix = t_model <= (model.last_date - model.origin).days
+        if model.matches(*checksum(values[prefix])):
+            if prefix.all():
+                return model, "validated"
+            model.extend(t_model[~prefix], values[~prefix], t_model, values)
+            return model, "incremental"
+    if values.size < MIN_POINTS:
+        return None, "insufficient"
+    return SeasonalModel.fit(origin + timedelta(days=int(t[0])), t - t[0], values), "full"
+
+
+def linear_forecast(last_date: date, values: np.ndarray, horizon: int) -> List[Tuple[date, float]]:
+    """Linear trend over the latest LINEAR_POINTS values (indexed by position, not date)."""
+    ys = np.asarray(values, dtype=np.float64)[-LINEAR_POINTS:]
+    xs = np.arange(ys.size, dtype=np.float64)
+    den = float(np.dot(xs - xs.mean(), xs - xs.mean())) or 1.0
+    slope = float(np.dot(xs - xs.mean(), ys - ys.mean())) / den
+    intercept = float(ys.mean()) - slope * float(xs.mean())
+    return [(last_date + timedelta(days=i), intercept + slope * (ys.size - 1 + i)) for i in range(1, horizon + 1)]
+
+
+def fit_forecast(
+    model: Optional[SeasonalModel], origin: date, t: np.ndarray, values: np.ndarray, horizon: int
+) -> Tuple[Optional[SeasonalModel], str, str, List[Tuple[date, float]]]:
+    """(model, fit status, method, forecast) for one series; falls back to the linear trend
+    when the history is too short for the seasonal model. Used as a process-pool task."""
+    if values.size < 2:
+        return None, "insufficient", "", []
+    model, status = sync_model(model, origin, t, values)
+    if model is not None:
+        return model, status, "seasonal_trend_harmonics", model.forecast(horizon)
+    last_date = origin + timedelta(days=int(t[-1]))
+    return None, status, "simple_linear_trend", linear_forecast(last_date, values, horizon)
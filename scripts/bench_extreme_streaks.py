@@ -0,0 +1,129 @@
+﻿"""
+连续极端天气 (热浪/寒潮) 检测基准
+
+对所有城市 × 全部日期范围执行 extreme_event_stats 的连续天数统计，对比三种实现：
+- rows:   拉取 (date, value) 逐日数据到 Python 逐行判断 (改造前 agent 侧的做法)
+- window: 数据库窗口函数 gaps-and-islands，单条语句只返回过程列表
+- cache:  进程内列式缓存上的 NumPy 向量化检测
+
+三种实现的结果会逐城市比对，输出总耗时 (墙钟时间，取多次最小值) 与每城市平均耗时。
+
+运行方式:
+    python scripts/bench_extreme_streaks.py
+    python scripts/bench_extreme_streaks.py --metric temp_min --comparison "<=" --threshold -5
+
+前置条件:
+    数据库已导入数据 (python scripts/import_csv.py)
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.database import AsyncSessionLocal, engine
+from app.models.models import WeatherData
+from app.services.summary import get_dataset_summary
+from app.services.weather_cache import weather_cache
+from mcp_tools.analysis_agent import _COMPARISONS, _extreme_from_cache, _extreme_from_db
+
+
+async def run_rows(city, metric, threshold, comparison, start, end, min_days):
+    """基线：逐日数据拉到 Python 后逐行扫描"""
+    col = getattr(WeatherData, metric)
+    async with AsyncSessionLocal() as db:
+        rows = (
+            await db.execute(
+                select(WeatherData.date, col)
+                .where(WeatherData.city == city, WeatherData.date >= start, WeatherData.date <= end)
+                .order_by(WeatherData.date)
+            )
+        ).all()
+
+    check = _COMPARISONS[comparison]
+    count, longest, spells = 0, 0, []
+    run_start = prev = None
+    run_len = 0
+    for d, v in rows:
+        if v is not None and check(v, threshold):
+            count += 1
+            if prev is not None and (d - prev).days == 1 and run_len:
+                run_len += 1
+            else:
+                if run_len >= min_days:
+                    spells.append({"start": run_start.isoformat(), "end": prev.isoformat(), "days": run_len})
+                run_start, run_len = d, 1
+            prev = d
+            longest = max(longest, run_len)
+        else:
+            if run_len >= min_days:
+                spells.append({"start": run_start.isoformat(), "end": prev.isoformat(), "days": run_len})
+            run_len, prev = 0, None
+    if run_len >= min_days:
+        spells.append({"start": run_start.isoformat(), "end": prev.isoformat(), "days": run_len})
+    return count, longest, spells
+
+
+async def run_window(city, metric, threshold, comparison, start, end, min_days):
+    return await _extreme_from_db(city, metric, threshold, comparison, start, end, min_days)
+
+
+async def run_cache(city, metric, threshold, comparison, start, end, min_days):
+    return _extreme_from_cache(weather_cache.get(city), metric, threshold, comparison, start, end, min_days)
+
+
+async def measure(fn, cities, args, start, end, repeat):
+    """对所有城市执行一轮，重复取最小耗时；返回 (秒, 各城市结果)"""
+    best, results = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = [
+            await fn(city, args.metric, args.threshold, args.comparison, start, end, args.min_days)
+            for city in cities
+        ]
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Heat-wave / cold-spell streak detection benchmark")
+    parser.add_argument("--metric", default="temp_max")
+    parser.add_argument("--comparison", default=">=")
+    parser.add_argument("--threshold", type=float, default=30)
+    parser.add_argument("--min-days", dest="min_days", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        summary = await get_dataset_summary(db)
+    cities, start, end = summary["cities"], summary["start"], summary["end"]
+    if not cities:
+        print("❌ 数据库中没有天气数据")
+        return
+    await weather_cache.load_all()
+
+    print(f"城市: {len(cities)} 个，日期: {start} ~ {end}，条件: {args.metric} {args.comparison} {args.threshold}，连续 ≥ {args.min_days} 天\n")
+    timings = {}
+    outputs = {}
+    for name, fn in (("rows", run_rows), ("window", run_window), ("cache", run_cache)):
+        timings[name], outputs[name] = await measure(fn, cities, args, start, end, args.repeat)
+
+    consistent = outputs["rows"] == outputs["window"] == outputs["cache"]
+    spells = sum(len(r[2]) for r in outputs["cache"])
+    print(f"{'method':>8} | {'total ms':>9} | {'ms/city':>8} | {'speedup':>7}")
+    print("-" * 42)
+    for name, elapsed in timings.items():
+        print(f"{name:>8} | {elapsed * 1000:>9.1f} | {elapsed * 1000 / len(cities):>8.2f} | {timings['rows'] / elapsed:>6.1f}x")
+    print(f"\n共检测到 {spells} 次过程；三种实现结果{'一致 ✅' if consistent else '不一致 ❌'}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
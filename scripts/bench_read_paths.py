@@ -0,0 +1,116 @@
+﻿"""
+读路径微基准：ORM 实体加载 vs 列投影 Core 查询
+
+对同一查询分别用 select(WeatherData) (构建 ORM 实例再拷贝为字典) 和
+列投影 select(*columns) (直接解包行元组) 取 1k/10k/100k 行，
+统计本进程 CPU 时间 (含驱动解码、结果处理、字典构建，不含数据库服务端耗时)，
+输出每行 CPU 开销及节省比例。
+
+运行方式:
+    python scripts/bench_read_paths.py
+    python scripts/bench_read_paths.py --sizes 1000 10000 --repeat 5
+
+前置条件:
+    数据库已导入数据 (python scripts/import_csv.py)；行数不足时按实际返回行数计算
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.database import AsyncSessionLocal, engine
+from app.models.models import WeatherData
+
+
+COLUMNS = (
+    WeatherData.city,
+    WeatherData.date,
+    WeatherData.weather_condition,
+    WeatherData.temp_min,
+    WeatherData.temp_max,
+    WeatherData.wind_info,
+)
+
+
+async def run_orm(limit: int) -> int:
+    """旧读路径：加载整实体后逐属性拷贝"""
+    async with AsyncSessionLocal() as db:
+        query = select(WeatherData).order_by(WeatherData.date.desc()).limit(limit)
+        records = (await db.execute(query)).scalars().all()
+        data = [
+            {
+                "city": r.city,
+                "date": r.date.isoformat(),
+                "weather_condition": r.weather_condition,
+                "temp_min": r.temp_min,
+                "temp_max": r.temp_max,
+                "wind_info": r.wind_info,
+            }
+            for r in records
+        ]
+    return len(data)
+
+
+async def run_core(limit: int) -> int:
+    """新读路径：列投影，直接解包行元组"""
+    async with AsyncSessionLocal() as db:
+        query = select(*COLUMNS).order_by(WeatherData.date.desc()).limit(limit)
+        rows = (await db.execute(query)).all()
+        data = [
+            {
+                "city": city,
+                "date": d.isoformat(),
+                "weather_condition": condition,
+                "temp_min": t_min,
+                "temp_max": t_max,
+                "wind_info": wind,
+            }
+            for city, d, condition, t_min, t_max, wind in rows
+        ]
+    return len(data)
+
+
+async def measure(fn, limit: int, repeat: int):
+    """重复执行取最小 CPU 时间，返回 (行数, 秒)"""
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.process_time()
+        count = await fn(limit)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="ORM vs Core read path micro-benchmark")
+    parser.add_argument("--sizes", nargs="*", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # 预热连接池与语句缓存
+    await run_orm(10)
+    await run_core(10)
+
+    print(f"{'rows':>8} | {'ORM µs/row':>11} | {'Core µs/row':>11} | {'saved µs/row':>12} | {'speedup':>7}")
+    print("-" * 62)
+    for size in args.sizes:
+        n_orm, t_orm = await measure(run_orm, size, args.repeat)
+        n_core, t_core = await measure(run_core, size, args.repeat)
+        n = max(min(n_orm, n_core), 1)
+        orm_us = t_orm / n * 1e6
+        core_us = t_core / n * 1e6
+        speedup = orm_us / core_us if core_us else float("inf")
+        print(f"{n:>8,} | {orm_us:>11.2f} | {core_us:>11.2f} | {orm_us - core_us:>12.2f} | {speedup:>6.2f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
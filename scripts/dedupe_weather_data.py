@@ -0,0 +1,113 @@
+﻿"""
+weather_data 去重迁移 (一次性)
+在 (city, date) 唯一索引上线之前，重复导入可能为同一城市同一天留下多条记录。
+本脚本按城市分批删除重复记录 (每组保留 id 最大、即最近导入的一条)，每个城市单独提交，
+中断后重新运行会从剩余的重复继续；随后重建汇总表 / 月度预聚合 / 逐日常年值，
+创建唯一索引 uq_city_date 并删除被它取代的 idx_city_date
+
+运行方式:
+    python scripts/dedupe_weather_data.py
+    python scripts/dedupe_weather_data.py --dry-run
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import func, select, text
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.database import AsyncSessionLocal, engine, init_db
+from app.models.models import WeatherData
+from app.services.changes import ALL_CITIES, notify_cities_changed
+from app.services.climatology import rebuild_climatology
+from app.services.rollup import rebuild_rollup
+from app.services.summary import rebuild_summary
+
+
+# 每组 (city, date) 按 id 倒序编号，编号大于 1 的为多余记录
+DUPLICATE_IDS = """
+    SELECT id FROM (
+        SELECT id, row_number() OVER (PARTITION BY city, date ORDER BY id DESC) AS rn
+        FROM weather_data
+        WHERE city = :city
+    ) ranked
+    WHERE rn > 1
+"""
+COUNT_DUPLICATES = text(f"SELECT count(*) FROM ({DUPLICATE_IDS}) duplicates")
+DELETE_DUPLICATES = text(f"DELETE FROM weather_data WHERE id IN ({DUPLICATE_IDS})")
+
+
+async def dedupe(dry_run: bool = False) -> int:
+    """
+    按城市分批删除重复记录
+
+    Returns:
+        删除 (dry_run 时为将删除) 的记录数
+    """
+    async with AsyncSessionLocal() as db:
+        cities = (await db.execute(select(WeatherData.city).distinct().order_by(WeatherData.city))).scalars().all()
+
+    removed = 0
+    for city in cities:
+        async with AsyncSessionLocal() as db:
+            if dry_run:
+                count = (await db.execute(COUNT_DUPLICATES, {"city": city})).scalar()
+            else:
+                count = (await db.execute(DELETE_DUPLICATES, {"city": city})).rowcount
+                await db.commit()
+        if count:
+            print(f"🗑️  {city}: {count:,} 条重复记录")
+            removed += count
+    return removed
+
+
+async def rebuild_derived():
+    """重建派生表并通知缓存失效 (删除了记录，增量维护无从得知被删的是哪些天的哪一条)"""
+    async with AsyncSessionLocal() as db:
+        await rebuild_summary(db)
+        await rebuild_rollup(db)
+        await rebuild_climatology(db)
+        await notify_cities_changed(db, [ALL_CITIES])
+        await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate (city, date) rows and add the unique index")
+    parser.add_argument("--dry-run", action="store_true", help="只统计重复记录，不做修改")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("🧹 weather_data 去重迁移")
+    print("="*80 + "\n")
+
+    started = time.perf_counter()
+    removed = await dedupe(args.dry_run)
+    if args.dry_run:
+        print(f"\n🔍 共 {removed:,} 条重复记录 (dry run，未修改)")
+        return
+
+    if removed:
+        print(f"\n✅ 已删除 {removed:,} 条重复记录，正在重建汇总表 / 月度预聚合 / 逐日常年值...")
+        await rebuild_derived()
+    else:
+        print("✅ 没有重复记录")
+
+    # init_db 补建唯一索引 uq_city_date；之后旧的非唯一索引 idx_city_date 已无用处
+    await init_db()
+    async with engine.begin() as conn:
+        created = (await conn.execute(text("SELECT 1 FROM pg_indexes WHERE indexname = 'uq_city_date'"))).first()
+        if not created:
+            print("❌ 唯一索引 uq_city_date 创建失败 (迁移期间可能有新的重复写入)，请重新运行本脚本")
+            return
+        await conn.execute(text("DROP INDEX IF EXISTS idx_city_date"))
+    async with AsyncSessionLocal() as db:
+        total = (await db.execute(select(func.count()).select_from(WeatherData))).scalar()
+    print(f"✅ 唯一索引 uq_city_date 已就绪，当前 {total:,} 条记录 ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,197 +2,330 @@
 CSV 数据导入脚本
 将 weather_data.csv 导入到 PostgreSQL 数据库
 
+按块读取 CSV (每块 --chunk-size 行)，日期、气温、天气状况、风力风向在 pandas Series 上向量化解析，
+再经 asyncpg COPY (copy_records_to_table) 写入临时暂存表，按 (city, date) 唯一索引
+INSERT ... ON CONFLICT DO UPDATE 合并到 weather_data：文件内同一城市同一天出现多次时以最后一行为准，
+内容未变化的记录不改写。整个导入 (含清空) 与汇总表、月度预聚合、逐日常年值的维护在同一事务中提交，
+中途失败不会留下半份数据
+
+两种模式:
+- 默认 (全量)：表中已有数据时交互确认后清空再导入
+- --upsert (增量)：无需确认，合并到已有数据；可重复导入同一文件
+
 运行方式:
     python scripts/import_csv.py
+    python scripts/import_csv.py path/to/weather_data.csv --chunk-size 200000
+    python scripts/import_csv.py path/to/new_rows.csv --upsert
 
 依赖:
     pip install pandas
 """
+import argparse
 import asyncio
 import sys
+import time
 from pathlib import Path
-from datetime import datetime
+from typing import Set, Tuple
+
+import numpy as np
 import pandas as pd
-from sqlalchemy import select
+from sqlalchemy import func, inspect, select, text
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.db.database import AsyncSessionLocal, init_db
-from app.models.models import WeatherData
+from app.models.models import WeatherData, WeatherCitySummary, WeatherMonthlyRollup, WeatherClimatology
+from app.services.changes import ALL_CITIES, notify_cities_changed
+from app.services.climatology import rebuild_climatology, refresh_climatology
+from app.services.conditions import classify_condition
+from app.services.rollup import rebuild_rollup, refresh_rollup
+from app.services.summary import get_dataset_summary, rebuild_summary, refresh_city_summary
+from app.services.wind import WIND_COLUMNS, parse_wind
+
+
+# 写入 weather_data 的列 (id / created_at 使用表默认值)
+COPY_COLUMNS = (
+    "city", "date", "weather_condition", "condition_flags",
+    "temp_min", "temp_max", "temp_raw", "wind_info", *WIND_COLUMNS,
+)
 
+# 暂存表 (事务结束时删除)：各块依次 COPY 进来，全部读完后一次合并；
+# row_no 为 CSV 中的行号，同一 (city, date) 在整个文件中出现多次时以行号最大的一条为准
+STAGING_TABLE = "weather_import_staging"
+STAGING_COLUMNS = (*COPY_COLUMNS, "row_no")
+_UPDATE_COLUMNS = [c for c in COPY_COLUMNS if c not in ("city", "date")]
+CREATE_STAGING = (
+    f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+    f"SELECT {', '.join(COPY_COLUMNS)} FROM weather_data WITH NO DATA",
+    f"ALTER TABLE {STAGING_TABLE} ADD COLUMN row_no bigint NOT NULL",
+)
+# 合并暂存表；内容未变化的记录不改写，RETURNING 只返回新增 (xmax = 0) 或更新的行
+_MERGE_SQL = (
+    f"INSERT INTO weather_data ({', '.join(COPY_COLUMNS)}) "
+    f"SELECT DISTINCT ON (city, date) {', '.join(COPY_COLUMNS)} FROM {STAGING_TABLE} "
+    f"ORDER BY city, date, row_no DESC "
+    f"ON CONFLICT (city, date) DO UPDATE SET "
+    f"{', '.join(f'{c} = EXCLUDED.{c}' for c in _UPDATE_COLUMNS)} "
+    f"WHERE ({', '.join(f'weather_data.{c}' for c in _UPDATE_COLUMNS)}) "
+    f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in _UPDATE_COLUMNS)}) "
+    f"RETURNING city, date, (xmax = 0) AS inserted"
+)
+MERGE_STAGING = text(_MERGE_SQL)
+# 全量导入不需要逐行结果，只在数据库内计数 (避免把整份文件的 (city, date) 拉回 Python)
+MERGE_STAGING_COUNTS = text(
+    f"WITH merged AS ({_MERGE_SQL}) "
+    f"SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged"
+)
+# 整个文件内重复出现的 (city, date) 行数 (含跨块重复)
+COUNT_STAGED_DUPLICATES = text(f"SELECT count(*) - count(DISTINCT (city, date)) FROM {STAGING_TABLE}")
 
-def parse_date(date_str: str) -> datetime.date:
+# 合并依赖的 (city, date) 唯一索引；表中有重复数据时 init_db 无法创建它
+UNIQUE_INDEX = next(index for index in WeatherData.__table__.indexes if index.name == "uq_city_date")
+
+# 气温 "6℃-15℃" / "-6℃--2℃" / "16℃ / 7℃"：两个可带负号的数，中间为 - ~ ～ / 分隔
+TEMPERATURE_PATTERN = r"^\s*(-?\d+(?:\.\d+)?)\s*℃?\s*[-~～/]\s*(-?\d+(?:\.\d+)?)\s*℃?\s*$"
+
+
+def detect_encoding(csv_path: str) -> str:
+    """按文件开头 1 MB 判断编码：UTF-8 解码失败时使用 GBK"""
+    with open(csv_path, "rb") as f:
+        head = f.read(1 << 20)
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间不算失败
+        if e.start < len(head) - 3:
+            return "gbk"
+    return "utf-8"
+
+
+def parse_dates(dates: pd.Series) -> pd.Series:
     """
-    解析中文日期格式: "2016年01月01日" -> date(2016, 1, 1)
-    
+    解析中文日期格式: "2016年01月01日" -> Timestamp("2016-01-01")
+
     Args:
-        date_str: 中文日期字符串
-    
+        dates: 中文日期字符串列
+
     Returns:
-        datetime.date 对象
+        datetime64 列，无法解析的为 NaT
     """
-    try:
-        # 移除"年"、"月"、"日"字符
-        cleaned = date_str.replace('年', '-').replace('月', '-').replace('日', '')
-        return datetime.strptime(cleaned, '%Y-%m-%d').date()
-    except Exception as e:
-        print(f"⚠️  日期解析失败: {date_str} - {e}")
-        return None
+    return pd.to_datetime(dates.astype(str).str.strip(), format="%Y年%m月%d日", errors="coerce")
 
 
-def parse_temperature(temp_str: str) -> tuple:
+def parse_temperatures(temps: pd.Series) -> Tuple[pd.Series, pd.Series]:
     """
-    解析温度字符串: "6℃-15℃" -> (6.0, 15.0)
-    
+    解析温度字符串: "6℃-15℃" -> (6.0, 15.0)，"-6℃--2℃" -> (-6.0, -2.0)
+
     Args:
-        temp_str: 温度字符串
-    
+        temps: 温度字符串列
+
     Returns:
-        (最低温, 最高温) 元组
+        (最低温, 最高温) 两列，无法解析的为 NaN；两数顺序颠倒时按大小归位
     """
-    try:
-        # 移除"℃"符号并分割
-        cleaned = temp_str.replace('℃', '')
-        parts = cleaned.split('-')
-        
-        if len(parts) == 2:
-            temp_min = float(parts[0])
-            temp_max = float(parts[1])
-            return temp_min, temp_max
-        else:
-            print(f"⚠️  温度格式异常: {temp_str}")
-            return None, None
-    except Exception as e:
-        print(f"⚠️  温度解析失败: {temp_str} - {e}")
-        return None, None
+    parts = temps.astype(str).str.extract(TEMPERATURE_PATTERN).astype(float)
+    low = np.fmin(parts[0], parts[1])
+    high = np.fmax(parts[0], parts[1])
+    return low, high
 
 
-async def import_csv_data(csv_path: str, batch_size: int = 1000):
+def map_distinct(values: pd.Series, parse) -> np.ndarray:
     """
-    读取 CSV 并批量导入数据库
-    
+    对列中的不同取值各解析一次，再按编码展开到每一行 (天气状况、风力风向只有几十到几百种取值)
+
+    Args:
+        parse: 取值 -> 元组
+
+    Returns:
+        (行数, 元组长度) 的 object 数组，元素为 Python int / None，可直接交给 COPY
+    """
+    codes, uniques = pd.factorize(values)
+    # 末行对应缺失值 (编码 -1)，也保证空块时数组仍为二维
+    table = np.array([parse(value) for value in uniques] + [parse(None)], dtype=object)
+    return table[codes]
+
+
+def prepare_chunk(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    向量化解析一个数据块
+
+    Returns:
+        (待写入记录，列与 STAGING_COLUMNS 一致、row_no 取 df 的行索引, 被跳过的原始行)
+    """
+    dates = parse_dates(df["日期"])
+    temp_min, temp_max = parse_temperatures(df["气温"])
+    # 城市为空或只有空格的行无法归属，一并跳过 (空值无法 COPY 进 varchar，会中断整个导入事务)
+    has_city = df["城市"].notna() & df["城市"].astype(str).str.strip().ne("")
+    valid = has_city & dates.notna() & temp_min.notna() & temp_max.notna() & df["天气状况"].notna() & df["风力风向"].notna()
+    skipped = df[~valid]
+    df = df[valid]
+
+    conditions = df["天气状况"]
+    winds = df["风力风向"]
+    flags = map_distinct(conditions, lambda value: (classify_condition(value),))
+    wind = map_distinct(winds, parse_wind)
+    records = pd.DataFrame({
+        # 城市名去除首尾空格，与查询侧的城市键一致
+        "city": df["城市"].astype(str).str.strip().astype(object),
+        "date": dates[valid].dt.date,
+        "weather_condition": conditions.astype(object),
+        "condition_flags": flags[:, 0],
+        "temp_min": temp_min[valid],
+        "temp_max": temp_max[valid],
+        "temp_raw": df["气温"].astype(object),
+        "wind_info": winds.astype(object),
+        **{name: wind[:, i] for i, name in enumerate(WIND_COLUMNS)},
+        "row_no": df.index,
+    }, columns=list(STAGING_COLUMNS))
+    return records, skipped
+
+
+async def import_csv_data(csv_path: str, chunk_size: int = 200_000, upsert: bool = False):
+    """
+    分块读取 CSV 并经 COPY 批量导入数据库
+
     Args:
         csv_path: CSV 文件路径
-        batch_size: 每批次插入的记录数
+        chunk_size: 每块读取、解析、写入的行数
+        upsert: 增量模式，按 (city, date) 合并到已有数据，不清空、不交互
     """
     print(f"📂 读取 CSV 文件: {csv_path}")
-    
+    encoding = detect_encoding(csv_path)
+    if encoding != "utf-8":
+        print("⚠️  UTF-8 编码失败，使用 GBK 编码...")
+
     try:
-        # 使用 pandas 读取 CSV (尝试多种编码)
-        try:
-            df = pd.read_csv(csv_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            print("⚠️  UTF-8 编码失败，尝试 GBK 编码...")
-            df = pd.read_csv(csv_path, encoding='gbk')
-        
-        total_rows = len(df)
-        
-        print(f"✅ CSV 读取成功，共 {total_rows:,} 行数据")
-        print(f"📊 列名: {list(df.columns)}")
+        preview = pd.read_csv(csv_path, encoding=encoding, nrows=3)
+        print(f"📊 列名: {list(preview.columns)}")
         print(f"\n📝 前 3 行预览:")
-        print(df.head(3).to_string())
+        print(preview.to_string())
         print("\n" + "="*80 + "\n")
-        
     except Exception as e:
         print(f"❌ CSV 读取失败: {e}")
         return
-    
-    # 数据预处理
-    print("🔄 开始数据预处理...")
-    weather_records = []
-    skipped_count = 0
-    
-    for idx, row in df.iterrows():
-        try:
-            # 解析日期
-            date_obj = parse_date(row['日期'])
-            if date_obj is None:
-                skipped_count += 1
-                continue
-            
-            # 解析温度
-            temp_min, temp_max = parse_temperature(row['气温'])
-            if temp_min is None or temp_max is None:
-                skipped_count += 1
-                continue
-            
-            # 创建记录字典
-            record = {
-                'city': row['城市'],
-                'date': date_obj,
-                'weather_condition': row['天气状况'],
-                'temp_min': temp_min,
-                'temp_max': temp_max,
-                'temp_raw': row['气温'],
-                'wind_info': row['风力风向']
-            }
-            
-            weather_records.append(record)
-            
-            # 进度显示 (每 10000 条)
-            if (idx + 1) % 10000 == 0:
-                print(f"⏳ 已处理 {idx + 1:,} / {total_rows:,} 行...")
-        
-        except Exception as e:
-            print(f"⚠️  第 {idx + 1} 行处理失败: {e}")
-            skipped_count += 1
-    
-    valid_count = len(weather_records)
-    print(f"\n✅ 数据预处理完成:")
-    print(f"   - 有效记录: {valid_count:,} 条")
-    print(f"   - 跳过记录: {skipped_count:,} 条")
-    
-    if valid_count == 0:
-        print("❌ 没有有效数据可导入")
-        return
-    
-    # 批量插入数据库
-    print(f"\n🚀 开始导入数据库 (批次大小: {batch_size})...")
-    
+
     async with AsyncSessionLocal() as db:
         try:
-            inserted_count = 0
-            
+            connection = await db.connection()
+            has_unique_index = await connection.run_sync(
+                lambda sync_conn: inspect(sync_conn).has_index(WeatherData.__tablename__, UNIQUE_INDEX.name)
+            )
+            if not has_unique_index and upsert:
+                print(f"❌ 缺少唯一索引 {UNIQUE_INDEX.name} (表中存在重复数据)，无法增量合并")
+                print("   请先运行 python scripts/dedupe_weather_data.py，或不带 --upsert 清空后全量导入")
+                return
+
             # 检查是否已有数据
-            result = await db.execute(select(WeatherData).limit(1))
-            existing_data = result.scalar_one_or_none()
-            
-            if existing_data:
+            existing_data = (await db.execute(select(WeatherData.id).limit(1))).first()
+
+            if existing_data and not upsert:
                 print("⚠️  数据库中已存在天气数据")
                 confirm = input("是否清空后重新导入? (y/N): ")
                 if confirm.lower() == 'y':
                     print("🗑️  清空现有数据...")
                     await db.execute(WeatherData.__table__.delete())
-                    await db.commit()
+                    await db.execute(WeatherCitySummary.__table__.delete())
+                    await db.execute(WeatherMonthlyRollup.__table__.delete())
+                    await db.execute(WeatherClimatology.__table__.delete())
+                    await notify_cities_changed(db, [ALL_CITIES])
+                    # 不单独提交：与导入同一事务，导入失败时回滚为原有数据
                     print("✅ 清空完成")
+                    existing_data = None
                 else:
-                    print("❌ 取消导入")
+                    if has_unique_index:
+                        print("❌ 取消导入 (增量导入请使用 --upsert)")
+                    else:
+                        print("❌ 取消导入 (表中存在重复数据，请先运行 python scripts/dedupe_weather_data.py)")
                     return
-            
-            # 分批插入
-            for i in range(0, valid_count, batch_size):
-                batch = weather_records[i:i + batch_size]
-                
-                # 批量创建 ORM 对象
-                weather_objects = [WeatherData(**record) for record in batch]
-                db.add_all(weather_objects)
-                
-                await db.commit()
-                inserted_count += len(batch)
-                
-                # 进度显示
-                progress = (inserted_count / valid_count) * 100
-                print(f"⏳ 已导入 {inserted_count:,} / {valid_count:,} 条 ({progress:.1f}%)")
-            
+
+            if not has_unique_index:
+                # 表已清空 (或本来为空)：在同一事务中补建唯一索引，并删除被它取代的 idx_city_date
+                await connection.run_sync(UNIQUE_INDEX.create)
+                await db.execute(text("DROP INDEX IF EXISTS idx_city_date"))
+                print(f"✅ 已创建唯一索引 {UNIQUE_INDEX.name}")
+
+            raw = (await connection.get_raw_connection()).driver_connection
+            for statement in CREATE_STAGING:
+                await db.execute(text(statement))
+
+            print(f"🚀 开始导入数据库 (COPY + 合并，每块 {chunk_size:,} 行)...")
+            started = time.perf_counter()
+            parse_seconds = load_seconds = 0.0
+            read_count = skipped_count = 0
+            # 新增或内容变化的 (city, date)，增量模式导入后据此增量维护派生表
+            changed: Set[Tuple[str, object]] = set()
+
+            for chunk in pd.read_csv(csv_path, encoding=encoding, chunksize=chunk_size, dtype=str):
+                t0 = time.perf_counter()
+                records, skipped = prepare_chunk(chunk)
+                t1 = time.perf_counter()
+                await raw.copy_records_to_table(
+                    STAGING_TABLE,
+                    records=records.itertuples(index=False, name=None),
+                    columns=STAGING_COLUMNS,
+                )
+                t2 = time.perf_counter()
+                parse_seconds += t1 - t0
+                load_seconds += t2 - t1
+
+                if len(skipped) and skipped_count < 5:
+                    for _, row in skipped.head(5 - skipped_count).iterrows():
+                        print(f"⚠️  跳过无法解析的行: 城市={row['城市']!r} 日期={row['日期']!r} 气温={row['气温']!r}")
+                skipped_count += len(skipped)
+                read_count += len(records)
+
+                elapsed = time.perf_counter() - started
+                print(f"⏳ 已暂存 {read_count:,} 条 ({read_count / elapsed:,.0f} 行/秒)")
+
+            print("🔀 合并到 weather_data...")
+            t0 = time.perf_counter()
+            duplicate_count = (await db.execute(COUNT_STAGED_DUPLICATES)).scalar()
+            if upsert:
+                inserted_count = updated_count = 0
+                for city, d, inserted in (await db.execute(MERGE_STAGING)).all():
+                    changed.add((city, d))
+                    if inserted:
+                        inserted_count += 1
+                    else:
+                        updated_count += 1
+            else:
+                inserted_count, updated_count = (await db.execute(MERGE_STAGING_COUNTS)).one()
+            load_seconds += time.perf_counter() - t0
+
+            # 导入前表为空 (或已清空)：汇总表、月度预聚合、逐日常年值各用一条集合查询整表重建，比逐批增量维护快得多；
+            # 增量合并：只重算变化记录涉及的城市、月份和日序。均与导入同事务提交
+            print("🔄 更新汇总表、月度预聚合与逐日常年值...")
+            t0 = time.perf_counter()
+            if not existing_data:
+                await rebuild_summary(db)
+                await rebuild_rollup(db)
+                await rebuild_climatology(db)
+                await notify_cities_changed(db, [ALL_CITIES])
+            elif changed:
+                cities = {city for city, _ in changed}
+                await refresh_city_summary(db, cities)
+                await refresh_rollup(db, changed)
+                await refresh_climatology(db, changed)
+                await notify_cities_changed(db, cities)
+            await db.commit()
+            derived_seconds = time.perf_counter() - t0
+
+            total_seconds = time.perf_counter() - started
             print(f"\n✅ 数据导入完成!")
-            print(f"   - 成功插入: {inserted_count:,} 条记录")
-            
-            # 验证导入结果
-            result = await db.execute(select(WeatherData))
-            db_count = len(result.scalars().all())
-            print(f"   - 数据库总计: {db_count:,} 条记录")
-            
+            if upsert:
+                unchanged_count = read_count - duplicate_count - inserted_count - updated_count
+                print(f"   - 新增: {inserted_count:,} 条，更新: {updated_count:,} 条，未变化: {unchanged_count:,} 条")
+            else:
+                print(f"   - 成功插入: {inserted_count:,} 条记录")
+            print(f"   - 文件内重复 (以最后一行为准): {duplicate_count:,} 条")
+            print(f"   - 跳过记录: {skipped_count:,} 条")
+            print(f"   - 解析: {parse_seconds:.1f}s，写入: {load_seconds:.1f}s，派生表: {derived_seconds:.1f}s")
+            print(f"   - 总耗时: {total_seconds:.1f}s ({read_count / max(total_seconds, 1e-9):,.0f} 行/秒)")
+
+            # 验证导入结果 (读取汇总表，不扫描 weather_data)
+            summary = await get_dataset_summary(db)
+            print(f"   - 数据库总计: {summary['total_records']:,} 条记录")
+
         except Exception as e:
             print(f"\n❌ 数据导入失败: {e}")
             await db.rollback()
@@ -200,66 +333,69 @@ async def import_csv_data(csv_path: str, batch_size: int = 1000):
 
 
 async def show_statistics():
-    """显示导入后的统计信息"""
+    """显示导入后的统计信息 (汇总表 + 单次聚合查询，不加载全部记录)"""
     print("\n" + "="*80)
     print("📊 数据统计信息")
     print("="*80 + "\n")
-    
+
     async with AsyncSessionLocal() as db:
-        # 总记录数
-        result = await db.execute(select(WeatherData))
-        all_records = result.scalars().all()
-        total = len(all_records)
-        
+        summary = await get_dataset_summary(db)
+        total = summary["total_records"]
+
         print(f"📈 总记录数: {total:,} 条")
-        
+
         if total > 0:
             # 城市统计
-            cities = set(record.city for record in all_records)
+            cities = summary["cities"]
             print(f"🏙️  城市数量: {len(cities)} 个")
-            print(f"   城市列表: {', '.join(sorted(cities)[:10])}{'...' if len(cities) > 10 else ''}")
-            
+            print(f"   城市列表: {', '.join(cities[:10])}{'...' if len(cities) > 10 else ''}")
+
             # 日期范围
-            dates = [record.date for record in all_records]
-            min_date = min(dates)
-            max_date = max(dates)
-            print(f"📅 日期范围: {min_date} ~ {max_date}")
-            
+            print(f"📅 日期范围: {summary['start']} ~ {summary['end']}")
+
             # 温度统计
-            temps = [record.temp_max for record in all_records]
-            print(f"🌡️  最高温度: {max(temps):.1f}℃")
-            print(f"❄️  最低温度: {min([record.temp_min for record in all_records]):.1f}℃")
-            
+            max_temp, min_temp = (
+                await db.execute(select(func.max(WeatherData.temp_max), func.min(WeatherData.temp_min)))
+            ).one()
+            print(f"🌡️  最高温度: {max_temp:.1f}℃")
+            print(f"❄️  最低温度: {min_temp:.1f}℃")
+
             # 示例数据
             print(f"\n📝 示例数据 (前 5 条):")
-            for record in all_records[:5]:
+            for record in (await db.execute(select(WeatherData).order_by(WeatherData.id).limit(5))).scalars():
                 print(f"   {record}")
 
 
 async def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="Import weather CSV into PostgreSQL")
+    parser.add_argument("csv_path", nargs="?", default=str(Path(__file__).parent.parent / "data" / "weather_data.csv"))
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--upsert", action="store_true", help="增量导入：按 (city, date) 合并，不清空已有数据")
+    args = parser.parse_args()
+
     print("="*80)
     print("🌤️  天气数据导入工具")
     print("="*80 + "\n")
-    
+
     # CSV 文件路径
-    csv_path = Path(__file__).parent.parent / "data" / "weather_data.csv"
-    
+    csv_path = Path(args.csv_path)
+
     if not csv_path.exists():
         print(f"❌ CSV 文件不存在: {csv_path}")
         return
-    
+
     # 初始化数据库
     print("🔧 初始化数据库表...")
     await init_db()
     print("✅ 数据库表初始化完成\n")
-    
+
     # 导入数据
-    await import_csv_data(str(csv_path), batch_size=1000)
-    
+    await import_csv_data(str(csv_path), chunk_size=args.chunk_size, upsert=args.upsert)
+
     # 显示统计信息
     await show_statistics()
-    
+
     print("\n" + "="*80)
     print("✅ 所有操作完成!")
     print("="*80)
@@ -22,6 +22,13 @@ def main():
     )
     pretty("describe_timeseries", r1)
 
+    # describe all metrics with percentiles
+    r1b = requests.post(
+        f"{BASE}/describe_timeseries",
+        json={"city": "北京", "metric": "all", "start_date": "2025-11-01", "end_date": "2025-11-15"},
+    )
+    pretty("describe_timeseries (all)", r1b)
+
     # group by month
     r2 = requests.post(
         f"{BASE}/group_by_period",
@@ -43,6 +50,52 @@ def main():
     )
     pretty("extreme_event_stats", r4)
 
+    # rainy/snowy/... days per year from the parsed condition flags
+    r_cond = requests.post(
+        f"{BASE}/condition_stats",
+        json={"city": "成都", "start_date": "2020-01-01", "end_date": "2024-12-31", "period": "year"},
+    )
+    pretty("condition_stats", r_cond)
+
+    # days with wind force >= 5 per month from the parsed wind columns
+    r_wind = requests.post(
+        f"{BASE}/wind_stats",
+        json={"city": "北京", "start_date": "2024-01-01", "end_date": "2024-12-31", "period": "month", "min_force": 5},
+    )
+    pretty("wind_stats", r_wind)
+
+    # rolling 7/30/365-day stats
+    r_roll = requests.post(
+        f"{BASE}/rolling_stats",
+        json={"city": "北京", "metric": "temp_max", "start_date": "2025-06-01", "end_date": "2025-06-10"},
+    )
+    pretty("rolling_stats", r_roll)
+
+    # correlation matrix of deseasonalized daily series
+    r_corr = requests.post(
+        f"{BASE}/correlation_matrix",
+        json={"cities": ["北京", "上海", "广州"], "metric": "temp_max", "start_date": "2024-01-01", "end_date": "2024-12-31", "method": "spearman", "deseasonalize": True},
+    )
+    pretty("correlation_matrix", r_corr)
+
+    # climate clusters over all cities (cached per dataset version)
+    r_cluster = requests.post(f"{BASE}/cluster_cities", json={"k": 4, "method": "kmeans"})
+    pretty("cluster_cities", r_cluster)
+
+    # summer percentiles across years from the monthly sketches
+    r_pct = requests.post(
+        f"{BASE}/percentiles",
+        json={"city": "广州", "metric": "temp_max", "start_date": "2016-01-01", "end_date": "2025-12-31", "percentiles": [50, 95], "months": [6, 7, 8]},
+    )
+    pretty("percentiles", r_pct)
+
+    # departures from the day-of-year normals
+    r_anom = requests.post(
+        f"{BASE}/anomalies",
+        json={"city": "北京", "metric": "temp_max", "start_date": "2025-06-01", "end_date": "2025-06-10"},
+    )
+    pretty("anomalies", r_anom)
+
     # simple forecast
     r5 = requests.post(
         f"{BASE}/simple_forecast",
@@ -50,6 +103,12 @@ def main():
     )
     pretty("simple_forecast", r5)
 
+    # batch forecast for all cities, then read the precomputed result
+    r6 = requests.post(f"{BASE}/forecast_all", json={"horizon_days": 7})
+    pretty("forecast_all", r6)
+    r7 = requests.post(f"{BASE}/get_forecast", json={"city": "北京", "metric": "temp_max"})
+    pretty("get_forecast", r7)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,245 @@
+﻿"""
+分析工具数值核心测试脚本 (纯函数，无需数据库与服务)
+用 numpy / pandas 直接计算的结果逐条核对分位数草图、滑动窗口统计、秩与聚类
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app.services.quantiles import ERROR_BOUND, build_sketch, merge_sketches, sketch_quantiles
+from app.services.weather_cache import CityColumns
+from mcp_tools.analysis_agent import _average_ranks, _rolling_from_cache, _window_extreme
+from mcp_tools.clustering import kmeans, standardize, ward
+
+
+FRACTIONS = (0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0)
+
+_rng = np.random.default_rng(0)
+
+# (说明, 逐月数值, 允许误差)：精度不高于 0.1℃ 时结果精确 (只留浮点舍入)，更细的数据误差不超过 ERROR_BOUND
+QUANTILE_CASES = [
+    ("整数摄氏度", [_rng.integers(-20, 40, 31).astype(float) for _ in range(12)], 1e-6),
+    ("0.1℃ 精度", [np.round(_rng.uniform(-20, 40, 30), 1) for _ in range(12)], 1e-6),
+    ("单个数值", [np.array([7.0])], 1e-6),
+    ("全部相同", [np.full(28, -3.0), np.full(31, -3.0)], 1e-6),
+    ("含空月份", [np.array([]), np.array([1.0, 2.0]), np.array([])], 1e-6),
+    ("0.01℃ 精度", [np.round(_rng.normal(15, 8, 31), 2) for _ in range(12)], ERROR_BOUND + 1e-9),
+]
+
+
+def test_sketch_quantiles():
+    """合并后的草图分位数与 np.percentile (linear，即 percentile_cont) 对全部原始数据的结果一致"""
+    print("🧪 sketch_quantiles ...")
+    for name, months, tolerance in QUANTILE_CASES:
+        bins, counts = merge_sketches(build_sketch(values) for values in months)
+        actual = sketch_quantiles(bins, counts, FRACTIONS)
+        expected = np.percentile(np.concatenate(months), [q * 100 for q in FRACTIONS])
+        assert np.allclose(actual, expected, rtol=0, atol=tolerance), (name, actual, expected.tolist())
+    print(f"   {len(QUANTILE_CASES)} 组通过")
+
+
+def test_merge_sketches():
+    """任意拆分后合并的草图与对合并数据直接构建的草图完全相同；空输入得到空草图与 None"""
+    print("🧪 merge_sketches ...")
+    for name, months, _ in QUANTILE_CASES:
+        whole = build_sketch(np.concatenate(months))
+        bins, counts = merge_sketches(build_sketch(values) for values in months)
+        assert (bins.tolist(), counts.tolist()) == (whole["b"], whole["c"]), name
+        # 合并顺序与再次合并不影响结果
+        again = merge_sketches([{"b": bins.tolist(), "c": counts.tolist()}] + [build_sketch([])])
+        assert (again[0].tolist(), again[1].tolist()) == (whole["b"], whole["c"]), name
+
+    for sketches in ([], [build_sketch([])], [None, {"b": [], "c": []}]):
+        bins, counts = merge_sketches(sketches)
+        assert bins.size == 0 and counts.size == 0
+        assert sketch_quantiles(bins, counts, FRACTIONS) == [None] * len(FRACTIONS)
+    print("   通过")
+
+
+def test_window_extreme():
+    """稀疏表区间最值与逐个切片 min/max 相同 (长度 1、2 的幂及任意长度的区间)"""
+    print("🧪 _window_extreme ...")
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=200)
+    for w in (1, 2, 3, 8, 13, 64, 200):
+        last = np.arange(200)
+        first = np.maximum(last - w + 1, 0)
+        for op, brute in ((np.minimum, np.min), (np.maximum, np.max)):
+            expected = [brute(values[a:b + 1]) for a, b in zip(first, last)]
+            assert np.array_equal(_window_extreme(values, first, last, op), expected), (w, op)
+    print("   通过")
+
+
+def _synthetic_city() -> CityColumns:
+    """120 天的列式数据：中间缺 20 天记录，另有几天记录缺少气温"""
+    rng = np.random.default_rng(2)
+    n = 120
+    present = np.ones(n, dtype=bool)
+    present[40:60] = False
+    temp_max = np.round(rng.uniform(-5, 30, n), 1)
+    temp_max[~present] = np.nan
+    temp_max[[3, 70, 71]] = np.nan
+    return CityColumns(
+        city="测试",
+        start=date(2020, 1, 1),
+        present=present,
+        temp_min=temp_max - 8,
+        temp_max=temp_max,
+        condition=np.full(n, -1, dtype=np.int16),
+        wind=np.full(n, -1, dtype=np.int16),
+    )
+
+
+def test_rolling_from_cache():
+    """日历日窗口 [d - w + 1, d] 的均值/最值与逐日切片计算相同；跳过缺失日，窗口可早于首条记录"""
+    print("🧪 _rolling_from_cache ...")
+    cols = _synthetic_city()
+    windows = [1, 7, 30, 45]
+    # 查询起点早于首条记录，终点晚于末条记录
+    start, end = date(2019, 12, 20), date(2020, 5, 10)
+    items = _rolling_from_cache(cols, "temp_max", start, end, windows)
+
+    ok = cols.present & ~np.isnan(cols.temp_max)
+    days = [i for i in range(len(ok)) if ok[i]]
+    assert [item["date"] for item in items] == [cols.date_at(i).isoformat() for i in days]
+    for item, i in zip(items, days):
+        assert item["temp_max"] == cols.temp_max[i]
+        for w in windows:
+            window = cols.temp_max[max(i - w + 1, 0):i + 1]
+            window = window[~np.isnan(window)]
+            assert np.isclose(item[f"mean_{w}"], window.mean(), rtol=0, atol=1e-9), (item["date"], w)
+            assert (item[f"min_{w}"], item[f"max_{w}"]) == (window.min(), window.max()), (item["date"], w)
+
+    # 缺失区间内的查询没有输出；起点在缺失区间内时窗口仍包含之前的记录
+    assert _rolling_from_cache(cols, "temp_max", date(2020, 2, 10), date(2020, 2, 28), windows) == []
+    tail = _rolling_from_cache(cols, "temp_max", date(2020, 2, 20), date(2020, 3, 1), windows)
+    expected = items[days.index(60):days.index(60) + len(tail)]
+    assert tail[0]["date"] == "2020-03-01" and [t["date"] for t in tail] == [e["date"] for e in expected]
+    for t, e in zip(tail, expected):
+        assert all(np.isclose(t[key], e[key], rtol=0, atol=1e-9) for key in e if key != "date"), t["date"]
+    print("   通过")
+
+
+# (说明, 数值)
+RANK_CASES = [
+    ("无并列", [3.5, -1.0, 2.0, 10.0, 0.0]),
+    ("两两并列", [1.0, 2.0, 2.0, 3.0, 1.0]),
+    ("多处并列", [5.0, 5.0, 5.0, -2.0, 7.0, -2.0, 5.0, 7.0]),
+    ("全部相同", [4.0] * 6),
+    ("单个数值", [9.0]),
+    ("空", []),
+    ("0.1℃ 精度随机", np.round(np.random.default_rng(3).uniform(-10, 10, 500), 1).tolist()),
+]
+
+
+def test_average_ranks():
+    """平均秩与 pandas.Series.rank() (method="average") 相同"""
+    print("🧪 _average_ranks ...")
+    for name, values in RANK_CASES:
+        actual = _average_ranks(np.asarray(values, dtype=np.float64))
+        expected = pd.Series(values, dtype=np.float64).rank().to_numpy()
+        assert np.array_equal(actual, expected), (name, actual.tolist(), expected.tolist())
+    print(f"   {len(RANK_CASES)} 组通过")
+
+
+def _partition(labels: np.ndarray) -> set:
+    """与簇编号无关的划分表示"""
+    return {frozenset(np.flatnonzero(labels == c).tolist()) for c in np.unique(labels)}
+
+
+def _sse(x: np.ndarray, labels: np.ndarray) -> float:
+    return float(sum(((x[labels == c] - x[labels == c].mean(axis=0)) ** 2).sum() for c in np.unique(labels)))
+
+
+def _blobs() -> tuple:
+    """三个相距很远的点团，期望划分为 {0..4}, {5..9}, {10..14}"""
+    rng = np.random.default_rng(4)
+    centers = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 5.0], [0.0, 12.0, -6.0]])
+    x = np.concatenate([c + rng.normal(scale=0.5, size=(5, 3)) for c in centers])
+    return x, {frozenset(range(i, i + 5)) for i in (0, 5, 10)}
+
+
+def _brute_ward(x: np.ndarray, k: int) -> set:
+    """逐步合并使簇内平方和增加最少的两簇，直到剩下 k 簇"""
+    clusters = [[i] for i in range(len(x))]
+    while len(clusters) > k:
+        def cost(pair):
+            a, b = clusters[pair[0]], clusters[pair[1]]
+            merged = x[a + b]
+            return ((merged - merged.mean(axis=0)) ** 2).sum() - sum(((x[c] - x[c].mean(axis=0)) ** 2).sum() for c in (a, b))
+        i, j = min(((i, j) for i in range(len(clusters)) for j in range(i + 1, len(clusters))), key=cost)
+        clusters[i] = clusters[i] + clusters.pop(j)
+    return {frozenset(c) for c in clusters}
+
+
+def test_standardize():
+    """各列均值 0、标准差 1；常数列为 0 而不是 NaN"""
+    print("🧪 standardize ...")
+    x = np.column_stack([np.arange(6.0), np.full(6, 3.0), [1.0, 5.0, -2.0, 0.0, 8.0, 4.0]])
+    z = standardize(x)
+    assert np.allclose(z.mean(axis=0), 0) and np.allclose(z.std(axis=0), [1, 0, 1])
+    assert np.array_equal(z[:, 1], np.zeros(6))
+    assert np.allclose(z[:, 2], (x[:, 2] - x[:, 2].mean()) / x[:, 2].std())
+    print("   通过")
+
+
+def test_kmeans():
+    """分开的点团划分正确、惯性等于簇内平方和、结果可复现；重复行较多时也没有空簇"""
+    print("🧪 kmeans ...")
+    x, expected = _blobs()
+    labels, inertia = kmeans(x, 3)
+    assert _partition(labels) == expected
+    assert np.isclose(inertia, _sse(x, labels))
+    assert np.array_equal(kmeans(x, 3)[0], labels)
+
+    # 不同的行数 >= k 时每个簇都非空 (曾出现空簇导致均值为 NaN)
+    for x, k in (
+        (np.array([[0.0, 0.0]] * 4 + [[1.0, 1.0], [2.0, 2.0]]), 3),
+        (np.array([[0.0, 0.0, 0.0]] * 3 + [[5.0, 5.0, 5.0]] * 3), 2),
+        (np.repeat(np.eye(4), 3, axis=0), 4),
+    ):
+        labels, inertia = kmeans(x, k)
+        assert sorted(np.unique(labels).tolist()) == list(range(k)), (x.tolist(), labels.tolist())
+        assert np.isclose(inertia, _sse(x, labels))
+    # 全部相同的行：仍返回 k 个簇编号，且不产生 NaN
+    labels, inertia = kmeans(np.zeros((4, 3)), 2)
+    assert sorted(np.unique(labels).tolist()) == [0, 1] and inertia == 0.0
+    print("   通过")
+
+
+def test_ward():
+    """Lance-Williams 更新得到的划分与逐步比较平方和增量的暴力合并相同"""
+    print("🧪 ward ...")
+    x, expected = _blobs()
+    labels, inertia = ward(x, 3)
+    assert _partition(labels) == expected
+    assert np.isclose(inertia, _sse(x, labels))
+
+    rng = np.random.default_rng(5)
+    for k in (2, 3, 5):
+        x = rng.normal(size=(12, 4))
+        labels, inertia = ward(x, k)
+        assert sorted(np.unique(labels).tolist()) == list(range(k))
+        assert _partition(labels) == _brute_ward(x, k), k
+        assert np.isclose(inertia, _sse(x, labels))
+    print("   通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧮 分析工具数值核心测试")
+    print("=" * 60)
+    print()
+
+    test_sketch_quantiles()
+    test_merge_sketches()
+    test_window_extreme()
+    test_rolling_from_cache()
+    test_average_ranks()
+    test_standardize()
+    test_kmeans()
+    test_ward()
+
+    print("\n" + "=" * 60)
+    print("✅ 数值核心测试通过!")
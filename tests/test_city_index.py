@@ -0,0 +1,116 @@
+﻿"""
+城市查询索引测试脚本
+对每个按城市过滤的查询执行 EXPLAIN，确认走 idx_city_key_date / idx_rollup_city_key / idx_forecast_city_key 而不是全表扫描
+"""
+import asyncio
+from typing import List, Tuple
+
+from fastapi import Response
+from sqlalchemy import event, text
+
+from app.db.database import AsyncSessionLocal, engine, init_db
+from app.routers.weather import get_weather_batch, get_weather_data
+from app.schemas.schemas import WeatherBatchRequest
+from mcp_tools import analysis_agent, data_agent
+
+
+# 表名 -> 按城市查询应命中的索引
+TABLE_INDEXES = {
+    "weather_data": "idx_city_key_date",
+    "weather_monthly_rollup": "idx_rollup_city_key",
+    "weather_forecasts": "idx_forecast_city_key",
+    "weather_climatology": "weather_climatology_pkey",
+}
+
+
+async def _weather_get_data():
+    async with AsyncSessionLocal() as db:
+        await get_weather_data(city="北京", start_date="2020-01-01", end_date="2020-03-31", limit=50, cursor=None, response=Response(), db=db)
+
+
+async def _weather_batch():
+    body = WeatherBatchRequest(queries=[
+        {"city": "北京", "start_date": "2020-01-01", "end_date": "2020-03-31", "limit": 50},
+        {"city": "上海", "limit": 20},
+    ])
+    async with AsyncSessionLocal() as db:
+        await get_weather_batch(body=body, db=db)
+
+
+def _tool_calls():
+    """需要验证的查询：HTTP 路由 + 所有按城市过滤的 data/analysis 工具"""
+    return [
+        ("weather.get_weather_data", _weather_get_data),
+        ("weather.get_weather_batch", _weather_batch),
+        ("data.get_range", lambda: data_agent.tool_get_range("Beijing", "2020-01-01", "2020-03-31", 50)),
+        ("data.check_coverage", lambda: data_agent.tool_check_coverage("北京", "2020-01-01", "2020-03-31")),
+        ("data.custom_query", lambda: data_agent.tool_custom_query(["date", "temp_max"], "北京", "2020-01-01", "2020-03-31", 50)),
+        ("analysis.describe_timeseries", lambda: analysis_agent.tool_describe_timeseries("北京", "temp_max", "2020-01-15", "2020-12-20")),
+        ("analysis.group_by_period", lambda: analysis_agent.tool_group_by_period("北京", "temp_max", "month", "2020-01-15", "2020-12-20")),
+        ("analysis.compare_cities", lambda: analysis_agent.tool_compare_cities(["北京", "上海"], "temp_max", "2020-01-15", "2020-12-20")),
+        ("analysis.extreme_event_stats", lambda: analysis_agent.tool_extreme_event_stats("北京", "temp_max", 30, ">=", "2020-01-01", "2020-12-31")),
+        ("analysis.condition_stats", lambda: analysis_agent.tool_condition_stats("成都", "2017-01-01", "2020-12-31", "year")),
+        ("analysis.wind_stats", lambda: analysis_agent.tool_wind_stats("北京", "2017-01-01", "2020-12-31", "month", 5)),
+        ("analysis.rolling_stats", lambda: analysis_agent.tool_rolling_stats("北京", "temp_max", "2020-01-01", "2020-12-31")),
+        ("analysis.correlation_matrix", lambda: analysis_agent.tool_correlation_matrix(["北京", "上海", "广州"], "temp_max", "2020-01-01", "2020-12-31", "pearson", True)),
+        ("analysis.percentiles", lambda: analysis_agent.tool_percentiles("广州", "temp_max", "2016-01-15", "2025-12-20", [95], [6, 7, 8])),
+        ("analysis.anomalies", lambda: analysis_agent.tool_anomalies("北京", "temp_max", "2020-01-01", "2020-12-31")),
+        ("analysis.simple_forecast", lambda: analysis_agent.tool_simple_forecast("北京", "temp_max", 7)),
+        ("analysis.get_forecast", lambda: analysis_agent.tool_get_forecast("北京", "temp_max")),
+    ]
+
+
+async def _capture(name, call, captured: List[Tuple[str, str, object]]):
+    """执行一次工具调用，记录其发出的 weather_data / weather_monthly_rollup 查询语句和参数"""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if any(table in statement for table in TABLE_INDEXES):
+            captured.append((name, statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        await call()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def test_city_queries_use_index():
+    """所有按城市过滤的查询都应命中对应表的城市索引"""
+    print("🧪 检查城市查询的执行计划...\n")
+    await init_db()
+
+    captured: List[Tuple[str, str, object]] = []
+    for name, call in _tool_calls():
+        await _capture(name, call, captured)
+
+    failures = []
+    async with engine.connect() as conn:
+        # 关闭顺序扫描：若索引可用，规划器必然选择索引；否则仍会退回 Seq Scan
+        await conn.execute(text("SET enable_seqscan = off"))
+        for name, statement, parameters in captured:
+            result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+            plan = "\n".join(row[0] for row in result.all())
+            ok = all(
+                index in plan and f"Seq Scan on {table}" not in plan
+                for table, index in TABLE_INDEXES.items()
+                if table in statement
+            )
+            print(f"{'✅' if ok else '❌'} {name}")
+            if not ok:
+                print(plan)
+                failures.append(name)
+
+    assert captured, "没有捕获到任何 weather_data 查询"
+    assert not failures, f"以下查询未使用城市索引: {failures}"
+
+    print("\n" + "=" * 60)
+    print("✅ 所有城市查询均使用索引!")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🌤️  城市查询索引测试")
+    print("=" * 60)
+    print()
+
+    asyncio.run(test_city_queries_use_index())
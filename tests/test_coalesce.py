@@ -0,0 +1,46 @@
+﻿"""
+工具调用合并 (single-flight) 测试脚本
+并发发起相同参数的工具调用，确认只执行一次查询、其余调用共享结果
+"""
+import asyncio
+
+from mcp_tools import analysis_agent, data_agent
+from mcp_tools.coalesce import coalesce_stats
+
+
+async def test_concurrent_calls_are_coalesced():
+    """相同参数 (含 Beijing/北京 等不同写法) 的并发调用应合并为一次执行"""
+    print("🧪 并发调用 analysis.describe_timeseries x 9 ...")
+    before = coalesce_stats()["analysis.describe_timeseries"]
+    results = await asyncio.gather(*[
+        analysis_agent.tool_describe_timeseries(city, "temp_max", "2020-01-01", "2020-12-31")
+        for city in ["北京", "Beijing", "beijing"] * 3
+    ])
+    after = coalesce_stats()["analysis.describe_timeseries"]
+
+    executed = after["executed"] - before["executed"]
+    coalesced = after["coalesced"] - before["coalesced"]
+    print(f"   执行 {executed} 次，合并 {coalesced} 次")
+    assert executed == 1 and coalesced == 8
+    assert all(r == results[0] for r in results)
+
+    print("🧪 参数不同的并发调用不应合并 ...")
+    before = coalesce_stats()["data.get_range"]
+    await asyncio.gather(
+        data_agent.tool_get_range("北京", "2020-01-01", "2020-01-31", 10),
+        data_agent.tool_get_range("北京", "2020-01-01", "2020-01-31", 20),
+    )
+    after = coalesce_stats()["data.get_range"]
+    assert after["executed"] - before["executed"] == 2
+
+    print("\n" + "=" * 60)
+    print("✅ 工具调用合并测试通过!")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🌤️  工具调用合并测试")
+    print("=" * 60)
+    print()
+
+    asyncio.run(test_concurrent_calls_are_coalesced())
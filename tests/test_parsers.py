@@ -0,0 +1,180 @@
+﻿"""
+写入时解析函数测试脚本 (纯函数，无需数据库与服务)
+逐条核对天气状况分类、风力风向以及 CSV 导入中日期、气温的解析结果
+"""
+import math
+from datetime import date
+
+import pandas as pd
+
+from app.services.conditions import CONDITION_FLAGS, classify_condition
+from app.services.wind import WIND_DIRECTIONS, parse_wind
+from scripts.import_csv import STAGING_COLUMNS, parse_dates, parse_temperatures, prepare_chunk
+
+
+def _flags(*names: str) -> int:
+    flags = 0
+    for name in names:
+        flags |= CONDITION_FLAGS[name]
+    return flags
+
+
+# (天气状况文本, 期望的类别)
+CONDITION_CASES = [
+    ("晴", ("sunny",)),
+    ("晴 / 多云", ("sunny", "cloudy")),
+    ("阴 / 小雨", ("cloudy", "rain")),
+    ("小到中雨 / 阵雨", ("rain",)),
+    ("大雨 / 暴雨", ("rain", "storm")),
+    ("雷阵雨 / 多云", ("rain", "storm", "cloudy")),
+    ("雨夹雪", ("rain", "snow")),
+    ("雾 / 晴", ("fog", "sunny")),
+    ("霾", ("fog",)),
+    ("晴转多云", ("sunny", "cloudy")),
+    ("小雪转阴", ("snow", "cloudy")),
+    ("冰雹", ("storm",)),
+    ("", ()),
+    (None, ()),
+    ("未知", ()),
+]
+
+
+def _dir(name: str) -> int:
+    return WIND_DIRECTIONS.index(name)
+
+
+# (风力风向文本, 期望的 (白天风向, 白天风力, 夜间风向, 夜间风力))
+WIND_CASES = [
+    ("西北风 5-6级 / 西北风 4-5级", (_dir("NW"), 6, _dir("NW"), 5)),
+    ("东北风 4~5级 / 北风 3-4级", (_dir("NE"), 5, _dir("N"), 4)),
+    ("无持续风向 ≤3级 / 无持续风向 ≤3级", (_dir("calm"), 3, _dir("calm"), 3)),
+    ("东南风 <3级", (_dir("SE"), 3, _dir("SE"), 3)),
+    ("东风 微风", (_dir("E"), 3, _dir("E"), 3)),
+    ("北风 3级", (_dir("N"), 3, _dir("N"), 3)),
+    ("旋转风", (_dir("calm"), None, _dir("calm"), None)),
+    # "转" 过渡取转之前的风向与风力
+    ("南风转东风 3-4级", (_dir("S"), 4, _dir("S"), 4)),
+    ("北风 3-4级转5-6级", (_dir("N"), 4, _dir("N"), 4)),
+    ("南风", (_dir("S"), None, _dir("S"), None)),
+    ("风", (None, None, None, None)),
+    ("", (None, None, None, None)),
+    (None, (None, None, None, None)),
+]
+
+
+# (日期文本, 期望日期)，None 表示无法解析
+DATE_CASES = [
+    ("2016年01月01日", date(2016, 1, 1)),
+    (" 2020年2月29日 ", date(2020, 2, 29)),
+    ("2021年02月29日", None),
+    ("2016-01-01", None),
+    ("", None),
+    (None, None),
+]
+
+# (气温文本, 期望的 (最低温, 最高温))，None 表示无法解析
+TEMPERATURE_CASES = [
+    ("6℃-15℃", (6.0, 15.0)),
+    ("-5℃--1℃", (-5.0, -1.0)),
+    ("-6℃-2℃", (-6.0, 2.0)),
+    ("3.5℃~8℃", (3.5, 8.0)),
+    ("16℃ / 7℃", (7.0, 16.0)),
+    ("5℃", None),
+    ("暂无", None),
+    ("", None),
+    (None, None),
+]
+
+
+def test_classify_condition():
+    """混合 "X / Y"、"转" 过渡与无法识别的文本"""
+    print("🧪 classify_condition ...")
+    for text, names in CONDITION_CASES:
+        assert classify_condition(text) == _flags(*names), (text, classify_condition(text), names)
+    print(f"   {len(CONDITION_CASES)} 条通过")
+
+
+def test_parse_wind():
+    """白天/夜间两段、单段、"<3级" / "≤3级" / 微风、无持续风向、"转" 过渡与无法识别的文本"""
+    print("🧪 parse_wind ...")
+    for text, expected in WIND_CASES:
+        assert parse_wind(text) == expected, (text, parse_wind(text), expected)
+    print(f"   {len(WIND_CASES)} 条通过")
+
+
+def test_parse_dates():
+    """中文日期，补零与否均可；非法日期、其他格式与空值为 NaT"""
+    print("🧪 parse_dates ...")
+    parsed = parse_dates(pd.Series([text for text, _ in DATE_CASES], dtype=object))
+    for (text, expected), value in zip(DATE_CASES, parsed):
+        actual = None if pd.isna(value) else value.date()
+        assert actual == expected, (text, actual, expected)
+    print(f"   {len(DATE_CASES)} 条通过")
+
+
+def test_parse_temperatures():
+    """负温区间 "-5℃--1℃"、小数、"/" 分隔 (顺序颠倒时归位)；单个数值与无法识别的文本为 NaN"""
+    print("🧪 parse_temperatures ...")
+    low, high = parse_temperatures(pd.Series([text for text, _ in TEMPERATURE_CASES], dtype=object))
+    for (text, expected), t_min, t_max in zip(TEMPERATURE_CASES, low, high):
+        if expected is None:
+            assert math.isnan(t_min) and math.isnan(t_max), (text, t_min, t_max)
+        else:
+            assert (t_min, t_max) == expected, (text, t_min, t_max, expected)
+    print(f"   {len(TEMPERATURE_CASES)} 条通过")
+
+
+def test_prepare_chunk():
+    """整块解析：城市为空与无法解析的行被跳过，其余各列可直接交给 COPY，row_no 为 CSV 中的行号"""
+    print("🧪 prepare_chunk ...")
+    chunk = pd.DataFrame(
+        {
+            "城市": [" 北京 ", "上海", "广州", "深圳", None, "  "],
+            "日期": ["2016年01月01日", "无效日期", "2016年01月03日", "2016年01月04日", "2016年01月05日", "2016年01月06日"],
+            "天气状况": ["晴转多云", "晴", "雷阵雨 / 多云", "小雨", "晴", "晴"],
+            "气温": ["-5℃--1℃", "1℃-2℃", "20℃-28℃", "5℃", "1℃-2℃", "1℃-2℃"],
+            "风力风向": ["西北风 5-6级 / 西北风 4-5级", "北风 3级", None, "南风 3级", "北风 3级", "北风 3级"],
+        },
+        index=[10, 11, 12, 13, 14, 15],
+    )
+    records, skipped = prepare_chunk(chunk)
+    # 空城市、只有空格的城市与无法解析的行均被跳过
+    assert skipped.index.tolist() == [11, 12, 13, 14, 15]
+    assert list(records.columns) == list(STAGING_COLUMNS)
+    assert records.to_dict("records") == [
+        {
+            "city": "北京",
+            "date": date(2016, 1, 1),
+            "weather_condition": "晴转多云",
+            "condition_flags": CONDITION_FLAGS["sunny"] | CONDITION_FLAGS["cloudy"],
+            "temp_min": -5.0,
+            "temp_max": -1.0,
+            "temp_raw": "-5℃--1℃",
+            "wind_info": "西北风 5-6级 / 西北风 4-5级",
+            "wind_dir_day": _dir("NW"),
+            "wind_force_day": 6,
+            "wind_dir_night": _dir("NW"),
+            "wind_force_night": 5,
+            "row_no": 10,
+        }
+    ]
+    # 空块 (全部被跳过) 也应返回列齐全的空表
+    records, skipped = prepare_chunk(chunk.loc[[11]])
+    assert records.empty and list(records.columns) == list(STAGING_COLUMNS) and len(skipped) == 1
+    print("   通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🌤️  写入时解析函数测试")
+    print("=" * 60)
+    print()
+
+    test_classify_condition()
+    test_parse_wind()
+    test_parse_dates()
+    test_parse_temperatures()
+    test_prepare_chunk()
+
+    print("\n" + "=" * 60)
+    print("✅ 解析函数测试通过!")
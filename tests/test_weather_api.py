@@ -139,6 +139,68 @@ async def test_weather_api():
                 print(f"   - {city}: {count} 条")
             print()
         
+        # ========== 7. 测试游标翻页 ==========
+        print("7️⃣  游标翻页查询昆明数据 (每页 500 条)")
+        params = {"city": "昆明", "limit": 500}
+        seen_dates = set()
+        pages = 0
+        while True:
+            response = await client.get(
+                f"{BASE_URL}/weather/data",
+                params=params,
+                headers=api_headers
+            )
+            if response.status_code != 200:
+                print(f"❌ 翻页失败: {response.json()}\n")
+                break
+            
+            page = response.json()
+            pages += 1
+            overlap = seen_dates & {item['date'] for item in page}
+            if overlap:
+                print(f"❌ 第 {pages} 页与之前的数据重叠: {sorted(overlap)[:3]}")
+                break
+            seen_dates.update(item['date'] for item in page)
+            
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                print(f"✅ 共 {pages} 页，{len(seen_dates)} 条记录，无重叠\n")
+                break
+            params["cursor"] = next_cursor
+        
+        # ========== 8. 测试条件请求 ==========
+        print("8️⃣  条件请求统计信息 (If-None-Match)")
+        response = await client.get(f"{BASE_URL}/weather/stats", headers=api_headers)
+        etag = response.headers.get("ETag")
+        if not etag:
+            print("⚠️  响应未携带 ETag (数据集版本未加载)\n")
+        else:
+            response = await client.get(
+                f"{BASE_URL}/weather/stats",
+                headers={**api_headers, "If-None-Match": etag}
+            )
+            if response.status_code == 304:
+                print(f"✅ ETag {etag} 命中，返回 304\n")
+            else:
+                print(f"❌ 期望 304，实际 {response.status_code}\n")
+        
+        # ========== 9. 测试批量查询 ==========
+        print("9️⃣  批量查询多个城市 (单次请求)")
+        batch_cities = ["昆明", "北京", "上海", "广州", "深圳"]
+        response = await client.post(
+            f"{BASE_URL}/weather/batch",
+            json={"queries": [{"city": c, "limit": 30} for c in batch_cities]},
+            headers=api_headers
+        )
+        if response.status_code == 200:
+            results = response.json()
+            print(f"✅ 批量查询成功，{len(results)} 组结果:")
+            for item in results[:5]:
+                print(f"   - {item['city']}: {item['count']} 条")
+            print()
+        else:
+            print(f"❌ 批量查询失败: {response.json()}\n")
+        
         print("=" * 60)
         print("✅ 所有测试完成!")
 